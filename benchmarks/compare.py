@@ -0,0 +1,45 @@
+import argparse
+import json
+from typing import Dict
+
+
+def _flatten(node, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    if isinstance(node, dict):
+        for key, value in node.items():
+            flat.update(_flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(node, (int, float)) and not isinstance(node, bool):
+        flat[prefix] = float(node)
+    return flat
+
+
+def compare(baseline_path: str, candidate_path: str, threshold: float = 0.05):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(candidate_path, 'r', encoding='utf-8') as f:
+        candidate = json.load(f)
+
+    print(f"baseline:  {baseline.get('commit', '?')[:12]}  ({baseline_path})")
+    print(f"candidate: {candidate.get('commit', '?')[:12]}  ({candidate_path})")
+    before = _flatten(baseline.get("results", {}))
+    after = _flatten(candidate.get("results", {}))
+    for key in sorted(set(before) & set(after)):
+        old, new = before[key], after[key]
+        change = (new - old) / old if old else 0.0
+        marker = "  " if abs(change) < threshold else ("+ " if change > 0 else "- ")
+        print(f"{marker}{key:<70} {old:>14.3f} -> {new:>14.3f}  ({change:+.1%})")
+    for key in sorted(set(after) - set(before)):
+        print(f"  {key:<70} {'n/a':>14} -> {after[key]:>14.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.05, help="Relative change below which a metric is not marked.")
+    args = parser.parse_args()
+    compare(args.baseline, args.candidate, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List
+
+
+class MockLLMConfig:
+    def __init__(self, latency_ms: float = 300.0, per_token_ms: float = 5.0, completion_tokens: int = 200,
+                 chars_per_token: float = 1.5, intent: str = "policy_inquiry"):
+        self.latency_ms = latency_ms
+        self.per_token_ms = per_token_ms
+        self.completion_tokens = completion_tokens
+        self.chars_per_token = chars_per_token
+        self.intent = intent
+
+
+def _usage(prompt_tokens: int, completion_tokens: int) -> SimpleNamespace:
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, total_tokens=prompt_tokens + completion_tokens)
+
+
+class _MockCompletions:
+    """Mimics `client.chat.completions` for both plain and streamed responses."""
+
+    def __init__(self, config: MockLLMConfig):
+        self.config = config
+        self.calls = 0
+
+    def _plan(self, kwargs: Dict[str, Any]):
+        prompt_chars = sum(len(m.get("content", "")) for m in kwargs.get("messages", []))
+        prompt_tokens = max(1, int(prompt_chars / self.config.chars_per_token))
+        if kwargs.get("response_format", {}).get("type") == "json_object":
+            content = json.dumps({"intent": self.config.intent})
+            completion_tokens = 8
+        else:
+            completion_tokens = min(self.config.completion_tokens, kwargs.get("max_tokens", self.config.completion_tokens))
+            content = "這是基準測試用的模擬回覆。" * max(1, completion_tokens // 12)
+        delay = (self.config.latency_ms + self.config.per_token_ms * completion_tokens) / 1000.0
+        return content, prompt_tokens, completion_tokens, delay
+
+    def _response(self, content: str, prompt_tokens: int, completion_tokens: int) -> SimpleNamespace:
+        choice = SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")
+        return SimpleNamespace(choices=[choice], usage=_usage(prompt_tokens, completion_tokens))
+
+    def _chunks(self, content: str, prompt_tokens: int, completion_tokens: int) -> List[SimpleNamespace]:
+        pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+        chunks = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=p), finish_reason=None)], usage=None)
+            for p in pieces
+        ]
+        chunks.append(SimpleNamespace(choices=[], usage=_usage(prompt_tokens, completion_tokens)))
+        return chunks
+
+    def create(self, **kwargs):
+        self.calls += 1
+        content, prompt_tokens, completion_tokens, delay = self._plan(kwargs)
+        if kwargs.get("stream"):
+            return self._stream(content, prompt_tokens, completion_tokens, delay)
+        time.sleep(delay)
+        return self._response(content, prompt_tokens, completion_tokens)
+
+    def _stream(self, content: str, prompt_tokens: int, completion_tokens: int, delay: float) -> Iterator[SimpleNamespace]:
+        chunks = self._chunks(content, prompt_tokens, completion_tokens)
+        time.sleep(self.config.latency_ms / 1000.0)
+        per_chunk = max(0.0, delay - self.config.latency_ms / 1000.0) / max(1, len(chunks))
+        for chunk in chunks:
+            time.sleep(per_chunk)
+            yield chunk
+
+
+class _MockAsyncCompletions(_MockCompletions):
+    async def create(self, **kwargs):
+        self.calls += 1
+        content, prompt_tokens, completion_tokens, delay = self._plan(kwargs)
+        await asyncio.sleep(delay)
+        return self._response(content, prompt_tokens, completion_tokens)
+
+
+class MockAzureOpenAI:
+    """Drop-in stand-in for `openai.AzureOpenAI` with configurable latency and token counts."""
+
+    def __init__(self, config: MockLLMConfig = None, **_):
+        self.config = config or MockLLMConfig()
+        self.chat = SimpleNamespace(completions=_MockCompletions(self.config))
+
+
+class MockAsyncAzureOpenAI:
+    """Drop-in stand-in for `openai.AsyncAzureOpenAI`."""
+
+    def __init__(self, config: MockLLMConfig = None, **_):
+        self.config = config or MockLLMConfig()
+        self.chat = SimpleNamespace(completions=_MockAsyncCompletions(self.config))
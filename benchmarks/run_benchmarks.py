@@ -0,0 +1,225 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.join(PROJECT_ROOT, "benchmarks")
+sys.path.insert(0, PROJECT_ROOT)
+
+SCENARIOS = ("index_build", "query_latency", "throughput", "ann_recall")
+DEFAULT_SCENARIOS = ("index_build", "query_latency", "throughput")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _load_queries(limit: int) -> List[str]:
+    from config import Settings
+    from src.batch_runner import extract_user_query
+
+    path = Settings.TEST_QUERIES_PATH
+    if not os.path.exists(path):
+        path = os.path.join(PROJECT_ROOT, "data", "test.json")
+    with open(path, 'r', encoding='utf-8') as f:
+        queries = [extract_user_query(obj) for obj in json.load(f)]
+    return (queries * (limit // len(queries) + 1))[:limit]
+
+
+def _benchmark_settings(faq_rows: int, product_rows: int, options: Dict[str, Any]):
+    from config import Settings
+    from benchmarks.synthetic_data import generate_knowledge_csv, generate_products_csv
+
+    data_dir = os.path.join(BENCHMARK_DIR, "data")
+    faq_path = os.path.join(data_dir, f"knowledges-{faq_rows}.csv")
+    product_path = os.path.join(data_dir, f"products-{product_rows}.csv")
+    if not os.path.exists(faq_path):
+        generate_knowledge_csv(faq_path, faq_rows)
+    if not os.path.exists(product_path):
+        generate_products_csv(product_path, product_rows)
+
+    overrides = {
+        "KNOWLEDGE_BASE_PATH": faq_path,
+        "PRODUCTS_PATH": product_path,
+        "INDEX_CACHE_ENABLED": options.get("index_cache", False),
+        "ANSWER_CACHE_ENABLED": False,
+        "TRACING_ENABLED": True,
+        "API_KEY": "benchmark",
+    }
+    if options.get("embedding_model"):
+        overrides["EMBEDDING_MODEL_PATH"] = options["embedding_model"]
+    return type("BenchmarkSettings", (Settings,), overrides)
+
+
+def _build_orchestrator(settings, options: Dict[str, Any]):
+    from benchmarks.mock_llm import MockAsyncAzureOpenAI, MockAzureOpenAI, MockLLMConfig
+    from src.llm_handler import LLMHandler
+    from src.orchestrator import JTCG_RAG_Orchestrator
+
+    config = MockLLMConfig(
+        latency_ms=options["llm_latency_ms"],
+        per_token_ms=options["llm_per_token_ms"],
+        completion_tokens=options["llm_completion_tokens"],
+    )
+    llm_handler = LLMHandler(settings, client=MockAzureOpenAI(config), async_client=MockAsyncAzureOpenAI(config))
+    return JTCG_RAG_Orchestrator(settings, llm_handler=llm_handler)
+
+
+def scenario_index_build(faq_rows: int, options: Dict[str, Any]) -> Dict[str, Any]:
+    from src.data_loader import DataLoader
+    from src.rag_pipeline import HybridRetriever
+
+    settings = _benchmark_settings(faq_rows, options["product_rows"], options)
+    start = time.perf_counter()
+    faq_docs, product_docs = DataLoader(settings).load_and_chunk()
+    loaded = time.perf_counter()
+    HybridRetriever(faq_docs, settings)
+    built = time.perf_counter()
+    # Streaming path used by the orchestrator: chunks are indexed while the CSV is still being parsed.
+    HybridRetriever(DataLoader(settings).iter_knowledge_base(), settings)
+    streamed = time.perf_counter()
+    return {
+        "documents": len(faq_docs),
+        "load_seconds": loaded - start,
+        "index_build_seconds": built - loaded,
+        "streamed_load_and_build_seconds": streamed - built,
+    }
+
+
+def scenario_query_latency(faq_rows: int, options: Dict[str, Any]) -> Dict[str, Any]:
+    from src.utils.tracing import tracer
+
+    settings = _benchmark_settings(faq_rows, options["product_rows"], options)
+    orchestrator = _build_orchestrator(settings, options)
+    queries = _load_queries(options["queries"])
+
+    tracer.reset()
+    start = time.perf_counter()
+    for query in queries:
+        orchestrator.process_query(query)
+    elapsed = time.perf_counter() - start
+    return {"queries": len(queries), "mean_ms": 1000 * elapsed / len(queries), "stages": tracer.snapshot()}
+
+
+def scenario_throughput(faq_rows: int, options: Dict[str, Any]) -> Dict[str, Any]:
+    settings = _benchmark_settings(faq_rows, options["product_rows"], options)
+    orchestrator = _build_orchestrator(settings, options)
+    queries = _load_queries(options["queries"])
+
+    async def run(concurrency: int) -> float:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(query: str):
+            async with semaphore:
+                await orchestrator.aprocess_query(query)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(q) for q in queries))
+        return time.perf_counter() - start
+
+    # One untimed pass takes first-call costs out of the first level; clearing the per-query caches
+    # before each level keeps later levels from being served by what earlier ones cached.
+    warmup_seconds = asyncio.run(run(max(options["concurrency"])))
+    results = {}
+    for concurrency in options["concurrency"]:
+        orchestrator.clear_caches()
+        elapsed = asyncio.run(run(concurrency))
+        results[str(concurrency)] = {"seconds": elapsed, "queries_per_second": len(queries) / elapsed}
+    return {"queries": len(queries), "warmup_seconds": warmup_seconds, "by_concurrency": results}
+
+
+def scenario_ann_recall(faq_rows: int, options: Dict[str, Any]) -> Dict[str, Any]:
+    from src.data_loader import DataLoader
+    from src.rag_pipeline import HybridRetriever
+    from src.vector_index import recall_report
+
+    settings = _benchmark_settings(faq_rows, options["product_rows"], options)
+    retriever = HybridRetriever(DataLoader(settings).load_knowledge_base(), settings)
+    embeddings = retriever.encode_documents(retriever.documents.contents)
+    queries = retriever.encode_documents(_load_queries(options["queries"]))
+    return {"report": recall_report(embeddings, queries, settings, k=settings.HYBRID_SEARCH_TOP_K)}
+
+
+def _run_scenario(name: str, faq_rows: int, options: Dict[str, Any], queue):
+    try:
+        result = globals()[f"scenario_{name}"](faq_rows, options)
+        result["peak_rss_mb"] = _peak_rss_mb()
+        queue.put({"ok": True, "result": result})
+    except Exception as e:
+        queue.put({"ok": False, "error": f"{type(e).__name__}: {e}"})
+
+
+def run_isolated(name: str, faq_rows: int, options: Dict[str, Any]) -> Dict[str, Any]:
+    # Each scenario runs in a fresh process so peak RSS and model/index state do not leak between runs.
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run_scenario, args=(name, faq_rows, options, queue))
+    process.start()
+    outcome = queue.get()
+    process.join()
+    return outcome["result"] if outcome["ok"] else {"error": outcome["error"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the JTCG RAG pipeline (Azure calls are mocked).")
+    parser.add_argument("--scenarios", default=",".join(DEFAULT_SCENARIOS), help=f"Comma-separated subset of {SCENARIOS}.")
+    parser.add_argument("--sizes", default="1000", help="Comma-separated synthetic FAQ corpus sizes, e.g. 1000,10000,100000,1000000.")
+    parser.add_argument("--product-rows", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-per-token-ms", type=float, default=5.0)
+    parser.add_argument("--llm-completion-tokens", type=int, default=200)
+    parser.add_argument("--embedding-model", default=None, help="Override Settings.EMBEDDING_MODEL_PATH.")
+    parser.add_argument("--output", default=None, help="Result JSON path (defaults to benchmarks/results/<commit>.json).")
+    args = parser.parse_args()
+
+    options = {
+        "product_rows": args.product_rows,
+        "queries": args.queries,
+        "concurrency": [int(c) for c in args.concurrency.split(",")],
+        "llm_latency_ms": args.llm_latency_ms,
+        "llm_per_token_ms": args.llm_per_token_ms,
+        "llm_completion_tokens": args.llm_completion_tokens,
+        "embedding_model": args.embedding_model,
+    }
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": options,
+        "results": {},
+    }
+    for name in args.scenarios.split(","):
+        for size in [int(s) for s in args.sizes.split(",")]:
+            print(f"Running {name} on {size} FAQ rows...", flush=True)
+            report["results"].setdefault(name, {})[str(size)] = run_isolated(name, size, options)
+
+    output = args.output or os.path.join(BENCHMARK_DIR, "results", f"{commit[:12]}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Benchmark results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import csv
+import os
+import random
+import re
+from typing import Dict, List
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+SEED_KNOWLEDGE_PATH = os.path.join(DATA_DIR, "ai-eng-test-sample-knowledges.csv")
+SEED_PRODUCTS_PATH = os.path.join(DATA_DIR, "ai-eng-test-sample-products.csv")
+
+_SENTENCE_RE = re.compile(r"[^。！？]+[。！？]?")
+
+
+def _read_rows(path: str) -> List[Dict[str, str]]:
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def generate_knowledge_csv(path: str, rows: int, seed: int = 0):
+    """Writes `rows` FAQ entries in the knowledge-base CSV schema, recombining sentences from the sample FAQ."""
+    rng = random.Random(seed)
+    seed_rows = _read_rows(SEED_KNOWLEDGE_PATH)
+    sentences = [s for row in seed_rows for s in _SENTENCE_RE.findall(row["content"]) if s.strip()]
+    fieldnames = list(seed_rows[0].keys())
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for i in range(rows):
+            base = seed_rows[i % len(seed_rows)]
+            extra = rng.sample(sentences, k=min(len(sentences), rng.randint(1, 4)))
+            row = dict(base)
+            row["id"] = f"FAQ-SYN-{i:07d}"
+            row["title"] = f"{base['title']}（{i}）" if i >= len(seed_rows) else base["title"]
+            row["content"] = base["content"] + "".join(extra)
+            writer.writerow(row)
+
+
+def generate_products_csv(path: str, rows: int, seed: int = 0):
+    """Writes `rows` products in the product CSV schema with randomized sizes and VESA patterns."""
+    rng = random.Random(seed)
+    seed_rows = _read_rows(SEED_PRODUCTS_PATH)
+    fieldnames = list(seed_rows[0].keys())
+    vesa_patterns = ["75x75", "100x100", "200x100", "200x200", "300x300"]
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for i in range(rows):
+            base = seed_rows[i % len(seed_rows)]
+            row = dict(base)
+            if i >= len(seed_rows):
+                row["sku"] = f"{base['sku']}-S{i:07d}"
+                row["name"] = f"{base['name']} S{i}"
+                if base.get("specs/size_max_inch"):
+                    row["specs/size_max_inch"] = str(rng.choice([24, 27, 32, 34, 43, 49]))
+                if base.get("specs/vesa/0"):
+                    row["specs/vesa/0"], row["specs/vesa/1"] = rng.sample(vesa_patterns, 2)
+            writer.writerow(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic FAQ/product CSVs for benchmarks.")
+    parser.add_argument("--faq-rows", type=int, default=1000)
+    parser.add_argument("--product-rows", type=int, default=100)
+    parser.add_argument("--output-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_knowledge_csv(os.path.join(args.output_dir, f"knowledges-{args.faq_rows}.csv"), args.faq_rows, args.seed)
+    generate_products_csv(os.path.join(args.output_dir, f"products-{args.product_rows}.csv"), args.product_rows, args.seed)
+
+
+if __name__ == "__main__":
+    main()
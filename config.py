@@ -1,28 +1,133 @@
 import os
-import torch
 from dotenv import load_dotenv
 
+
+class _LazyDevice:
+    """Resolves DEVICE on first access, so importing config does not import torch."""
+
+    def __init__(self):
+        self._device = None
+
+    def __get__(self, obj, owner):
+        if self._device is None:
+            import torch
+            self._device = "cuda:0" if torch.cuda.is_available() else "cpu"
+        return self._device
+
+
 class Settings:
     PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
     LOGS_DIR = os.path.join(PROJECT_ROOT, "logs")
     CONVERSATION_LOGS_DIR = os.path.join(LOGS_DIR, "conversations")
+    CONVERSATION_STORE_PATH = os.path.join(CONVERSATION_LOGS_DIR, "conversations.sqlite3")
     PROMPT_PATH = os.path.join(PROJECT_ROOT, "prompts", "system_prompt.txt")
+    INTENT_EXAMPLES_PATH = os.path.join(PROJECT_ROOT, "prompts", "intent_examples.json")
     KNOWLEDGE_BASE_PATH = "/data/jp-storage/Peter/agent/data/ai-eng-test-sample-knowledges.csv"
     PRODUCTS_PATH = "/data/jp-storage/Peter/agent/data/ai-eng-test-sample-products.csv"
     TEST_QUERIES_PATH = "/data/jp-storage/Peter/agent/data/test.json"
+    JIEBA_DICT_PATH = os.path.join(PROJECT_ROOT, "src", "dict.txt.big")
+    JIEBA_CACHE_DIR = os.path.join(PROJECT_ROOT, "index_cache", "jieba")
+    FAQ_QUESTION_VARIANTS_PATH = None  # optional JSON: {"<FAQ id>": ["question variant", ...]}
     
     AZURE_ENDPOINT = ""
     API_KEY = ""
+    AZURE_API_VERSION = "2024-10-21"
     MODEL_TYPE = "gpt-4.1"
     MAX_RETRIES = 1
     PROMPT_PRICE_PER_1K_TOKENS = 0.03 
     COMPLETION_PRICE_PER_1K_TOKENS = 0.06
+    LLM_MAX_CONCURRENCY = 8
+    LLM_REQUESTS_PER_MINUTE = 0
+    TOKENIZER_FALLBACK_ENCODING = "o200k_base"  # used when tiktoken does not know MODEL_TYPE
+
+    PROMPT_CONTEXT_TOKEN_BUDGET = 1500  # retrieved documents in the user prompt
+    PROMPT_MIN_EXCERPT_TOKENS = 48
+    PROMPT_BOILERPLATE_MIN_CHARS = 20
+
+    BATCH_CONCURRENCY = 8
+    BATCH_OUTPUT_PATH = os.path.join(PROJECT_ROOT, "output", "batch_results.jsonl")
+
+    SERVER_HOST = "0.0.0.0"
+    SERVER_PORT = 8000
+    SERVER_WORKERS = 2
+    SERVER_PRELOAD = True  # load models once in the parent and fork; ignored on CUDA
+    SERVER_THREADS_PER_WORKER = 8
+    SERVER_BACKLOG = 1024
+    SERVER_KEEPALIVE_TIMEOUT = 5
+    SERVER_SHUTDOWN_TIMEOUT = 30
+    SERVER_MIN_WORKER_UPTIME = 5
+    WARMUP_QUERY = "請問產品保固多久？"
+
+    PARALLEL_STARTUP = True
+    STARTUP_WORKERS = 6
+    STARTUP_WARMUP = False
 
-    DEVICE = "cuda:0" if torch.cuda.is_available() else "cpu"
+    DEVICE = _LazyDevice()
     EMBEDDING_MODEL_PATH = "/data/jp-storage/model/embedding_model/bge-m3"
     RERANKER_MODEL_NAME = 'BAAI/bge-reranker-large'
+    RERANKER_BACKEND = "torch"  # torch | torch_int8 (CPU dynamic quantization) | onnx
+    RERANKER_ONNX_FILE = "onnx/model.onnx"
+
+    INTENT_HANDOFF_PATTERNS = [r"真人", r"人工客服", r"轉人工", r"转人工", r"human agent", r"connect to (an )?agent", r"real person"]
+    INTENT_PRODUCT_PATTERNS = [r"jtcg-[a-z]+-[a-z0-9-]+"]
+    INTENT_CENTROID_MIN_SIMILARITY = 0.55
+    INTENT_CENTROID_MIN_MARGIN = 0.08
+    INTENT_CACHE_SIZE = 10000
+    INTENT_STATS_LOG_INTERVAL = 100
+    SPECULATIVE_RETRIEVAL = True  # retrieve FAQs while the intent is being classified
+    SPECULATIVE_INTENT_WORKERS = 16
+    QUERY_EMBEDDING_CACHE_SIZE = 1024
+    QUERY_TOKEN_CACHE_SIZE = 4096
+
+    ANSWER_CACHE_ENABLED = True
+    ANSWER_CACHE_SIZE = 5000
+    ANSWER_CACHE_TTL_SECONDS = 24 * 60 * 60
+    ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.95
+
+    MICRO_BATCH_ENABLED = True
+    MICRO_BATCH_MAX_SIZE = 64
+    MICRO_BATCH_WINDOW_MS = 5
+
+    TRACING_ENABLED = True
+    TRACING_WINDOW_SIZE = 2048
+    TRACING_EXPORT_INTERVAL = 50
+    METRICS_PROMETHEUS_PATH = os.path.join(LOGS_DIR, "metrics.prom")
+    METRICS_JSON_PATH = os.path.join(LOGS_DIR, "metrics.json")
+
+    RAG_LOG_LEVEL = "DEBUG"
+    # Billing records: 0 never rotates cost_usage.log; otherwise it rotates at this size and only
+    # COST_LOG_BACKUP_COUNT old files are kept, older ones being deleted.
+    COST_LOG_MAX_BYTES = 0
+    COST_LOG_BACKUP_COUNT = 0
+    RAG_LOG_PROMPTS = False
+    CONVERSATION_STORE_BATCH_SIZE = 256
+    CONVERSATION_STORE_MAX_BYTES = 256 * 1024 * 1024  # per segment file; 0 keeps a single file
+
+    INDEX_CACHE_ENABLED = True
+    INDEX_CACHE_DIR = os.path.join(PROJECT_ROOT, "index_cache")
+
+    DATA_LOADER_CHUNK_SIZE = 50000
+
+    # flat | hnsw | ivf_flat | ivf_pq, stored as float32 | float16 | int8 (ignored by ivf_pq)
+    FAISS_INDEX_TYPE = "flat"
+    FAISS_STORAGE = "float32"
+    FAISS_HNSW_M = 32
+    FAISS_HNSW_EF_CONSTRUCTION = 200
+    FAISS_HNSW_EF_SEARCH = 64
+    FAISS_IVF_NLIST = 0  # 0 = 4 * sqrt(number of documents)
+    FAISS_IVF_NPROBE = 16
+    FAISS_PQ_M = 64
+    FAISS_PQ_NBITS = 8
+    FAISS_TRAIN_SAMPLE_SIZE = 100000
 
     HYBRID_SEARCH_TOP_K = 10
     RERANK_TOP_N = 3
+    PRODUCT_TOP_K = 3
     FAQ_CONFIDENCE_THRESHOLD = 0.5
-    BM25_CONFIDENCE_THRESHOLD = 12.0
\ No newline at end of file
+    BM25_CONFIDENCE_THRESHOLD = 12.0
+    RERANK_BATCH_SIZE = 16
+    RERANK_CACHE_SIZE = 20000
+    RERANK_CASCADE_ENABLED = True
+    RERANK_CASCADE_MIN_BM25 = 18.0
+    RERANK_CASCADE_BM25_RATIO = 1.5
+    RERANK_CASCADE_SCORE = 1.0
\ No newline at end of file
@@ -1,65 +1,73 @@
+import argparse
 import json
 import os
 import pandas as pd
 from config import Settings
+from src.batch_runner import BatchRunner, extract_user_query
 from src.orchestrator import JTCG_RAG_Orchestrator
 from src.utils.logger import app_logger
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="JTCG RAG batch processing")
+    parser.add_argument("--concurrent", action="store_true", help="Process queries concurrently and stream results to a JSONL file.")
+    parser.add_argument("--output", default=None, help="JSONL output path for --concurrent mode (defaults to Settings.BATCH_OUTPUT_PATH).")
+    parser.add_argument("--warmup", action="store_true", help="Run a warm-up query through the local models before processing.")
+    parser.add_argument("--sequential-startup", action="store_true", help="Initialize components one after another instead of in parallel.")
+    return parser.parse_args()
+
+def run_sequential(orchestrator: JTCG_RAG_Orchestrator, test_data: list):
+    results = []
+    for i, conversation_obj in enumerate(test_data):
+        user_content = "INVALID_QUERY_FORMAT"
+        try:
+            user_content = extract_user_query(conversation_obj)
+
+            app_logger.info(f"--- Processing query {i+1}/{len(test_data)}: '{user_content}' ---")
+
+            bot_response = orchestrator.process_query(user_content)
+
+            result = {
+                "query": user_content,
+                "response": bot_response
+            }
+            results.append(result)
+
+            print("="*80)
+            print(f"Query ({i+1}/{len(test_data)}): {user_content}")
+            print(f"Response: {bot_response}")
+            print("="*80 + "\n")
+
+        except (KeyError, IndexError, ValueError) as e:
+            app_logger.warning(f"Skipping malformed entry #{i+1} in test.json. Error: {e}. Data: {conversation_obj}")
+            print(f"\nWARNING: Skipped malformed entry #{i+1}. Check app.log for details.\n")
+            continue
+
 def main():
     """
     Main execution function, reads a test queries JSON file and performs batch processing.
     This version is updated to parse the {"messages": [...]} structure.
+    With --concurrent, queries run through the async pipeline and resume from the last completed index.
     """
+    args = parse_args()
     app_logger.info("=============================================")
     app_logger.info("=== JTCG RAG Batch Processing Job Started ===")
     app_logger.info("=============================================")
 
     try:
         settings = Settings()
+        settings.STARTUP_WARMUP = settings.STARTUP_WARMUP or args.warmup
+        settings.PARALLEL_STARTUP = settings.PARALLEL_STARTUP and not args.sequential_startup
         orchestrator = JTCG_RAG_Orchestrator(settings)
         
         app_logger.info(f"Loading test queries from {settings.TEST_QUERIES_PATH}")
         with open(settings.TEST_QUERIES_PATH, 'r', encoding='utf-8') as f:
             test_data = json.load(f)
 
-        results = []
-        for i, conversation_obj in enumerate(test_data):
-            user_content = "INVALID_QUERY_FORMAT"
-            try:
-                if not isinstance(conversation_obj, dict) or "messages" not in conversation_obj or not conversation_obj["messages"]:
-                    raise ValueError("Invalid conversation object format: missing 'messages' key or empty messages list.")
-                
-                first_user_message = None
-                for message in conversation_obj["messages"]:
-                    if message.get("role") == "user":
-                        first_user_message = message
-                        break 
-                
-                if not first_user_message or "content" not in first_user_message:
-                     raise ValueError("No valid user message found in this conversation object.")
-
-                user_content = first_user_message["content"]
-
-
-                app_logger.info(f"--- Processing query {i+1}/{len(test_data)}: '{user_content}' ---")
-                
-                bot_response = orchestrator.process_query(user_content)
-                
-                result = {
-                    "query": user_content,
-                    "response": bot_response
-                }
-                results.append(result)
-                
-                print("="*80)
-                print(f"Query ({i+1}/{len(test_data)}): {user_content}")
-                print(f"Response: {bot_response}")
-                print("="*80 + "\n")
-
-            except (KeyError, IndexError, ValueError) as e:
-                app_logger.warning(f"Skipping malformed entry #{i+1} in test.json. Error: {e}. Data: {conversation_obj}")
-                print(f"\nWARNING: Skipped malformed entry #{i+1}. Check app.log for details.\n")
-                continue
+        if args.concurrent:
+            written = BatchRunner(orchestrator, settings, args.output).run(test_data)
+            print(f"Concurrent batch run finished: {written} entries written to {args.output or settings.BATCH_OUTPUT_PATH}")
+        else:
+            run_sequential(orchestrator, test_data)
     
     except Exception as e:
         app_logger.critical(f"A critical error occurred during initialization or file loading: {e}", exc_info=True)
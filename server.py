@@ -0,0 +1,21 @@
+import argparse
+from config import Settings
+from src.server import PreforkServer
+from src.utils.logger import app_logger
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="JTCG RAG HTTP server")
+    parser.add_argument("--host", default=None, help="Bind address (defaults to Settings.SERVER_HOST).")
+    parser.add_argument("--port", type=int, default=None, help="Bind port (defaults to Settings.SERVER_PORT).")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (defaults to Settings.SERVER_WORKERS).")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    app_logger.info("=== JTCG RAG Server Starting ===")
+    PreforkServer(Settings(), host=args.host, port=args.port, workers=args.workers).serve()
+    app_logger.info("=== JTCG RAG Server Stopped ===")
+
+
+if __name__ == "__main__":
+    main()
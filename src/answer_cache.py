@@ -0,0 +1,122 @@
+import re
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Callable, List, NamedTuple, Optional
+from config import Settings
+
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+class _CacheEntry(NamedTuple):
+    answer: str
+    slot: int
+    numbers: frozenset
+    created_at: float
+
+
+class CachedAnswer(NamedTuple):
+    answer: str
+    match_type: str
+    similarity: float
+
+
+class AnswerCache:
+    """
+    Two-level answer cache: exact match on the normalized query, then cosine similarity
+    over query embeddings. Entries expire after a TTL, are evicted LRU, and the whole
+    cache is dropped when the knowledge version changes.
+    """
+
+    def __init__(self, settings: Settings, normalize: Callable[[str], str], encode_query: Callable[[str], np.ndarray], knowledge_version: str):
+        self.settings = settings
+        self.normalize = normalize
+        self.encode_query = encode_query
+        self.knowledge_version = knowledge_version
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._slot_keys: List[Optional[str]] = []
+        self._free_slots: List[int] = []
+        # Embeddings live in a preallocated matrix (one row per slot) so lookups are a single matvec.
+        self._matrix: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _is_expired(self, entry: _CacheEntry, now: float) -> bool:
+        return now - entry.created_at > self.settings.ANSWER_CACHE_TTL_SECONDS
+
+    def _embed(self, query: str) -> np.ndarray:
+        return np.asarray(self.encode_query(query), dtype=np.float32).reshape(-1)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._matrix[entry.slot] = 0.0
+        self._slot_keys[entry.slot] = None
+        self._free_slots.append(entry.slot)
+
+    def _allocate_slot(self, dimension: int) -> int:
+        if self._matrix is None:
+            capacity = self.settings.ANSWER_CACHE_SIZE
+            self._matrix = np.zeros((capacity, dimension), dtype=np.float32)
+            self._slot_keys = [None] * capacity
+            self._free_slots = list(range(capacity - 1, -1, -1))
+        if not self._free_slots:
+            self._remove(next(iter(self._entries)))
+        return self._free_slots.pop()
+
+    def lookup(self, query: str) -> Optional[CachedAnswer]:
+        key = self.normalize(query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._is_expired(entry, now):
+                    self._entries.move_to_end(key)
+                    return CachedAnswer(entry.answer, "exact", 1.0)
+                self._remove(key)
+            if not self._entries:
+                return None
+
+        query_embedding = self._embed(query)
+        numbers = frozenset(_NUMBER_RE.findall(key))
+        with self._lock:
+            if not self._entries:
+                return None
+            similarities = self._matrix @ query_embedding
+            candidates = np.flatnonzero(similarities >= self.settings.ANSWER_CACHE_SIMILARITY_THRESHOLD)
+            for slot in candidates[np.argsort(similarities[candidates])[::-1]]:
+                cached_key = self._slot_keys[slot]
+                entry = self._entries.get(cached_key) if cached_key is not None else None
+                if entry is None:
+                    continue
+                if self._is_expired(entry, now):
+                    self._remove(cached_key)
+                    continue
+                # Queries that differ only in a size, VESA pattern or weight must not share an answer.
+                if entry.numbers != numbers:
+                    continue
+                self._entries.move_to_end(cached_key)
+                return CachedAnswer(entry.answer, "semantic", float(similarities[slot]))
+        return None
+
+    def store(self, query: str, answer: str):
+        key = self.normalize(query)
+        embedding = self._embed(query)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            slot = self._allocate_slot(len(embedding))
+            self._matrix[slot] = embedding
+            self._slot_keys[slot] = key
+            self._entries[key] = _CacheEntry(answer, slot, frozenset(_NUMBER_RE.findall(key)), time.monotonic())
+
+    def invalidate(self, knowledge_version: str = None):
+        with self._lock:
+            self._entries.clear()
+            self._slot_keys = []
+            self._free_slots = []
+            self._matrix = None
+            if knowledge_version is not None:
+                self.knowledge_version = knowledge_version
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import os
+from typing import Any, Dict, List
+from config import Settings
+from src.utils.logger import app_logger
+
+
+def extract_user_query(conversation_obj: Any) -> str:
+    if not isinstance(conversation_obj, dict) or "messages" not in conversation_obj or not conversation_obj["messages"]:
+        raise ValueError("Invalid conversation object format: missing 'messages' key or empty messages list.")
+
+    first_user_message = None
+    for message in conversation_obj["messages"]:
+        if message.get("role") == "user":
+            first_user_message = message
+            break
+
+    if not first_user_message or "content" not in first_user_message:
+        raise ValueError("No valid user message found in this conversation object.")
+
+    return first_user_message["content"]
+
+
+class BatchRunner:
+    """
+    Processes conversations concurrently through `JTCG_RAG_Orchestrator.aprocess_query`
+    and streams results to a JSONL file in input order. Each line carries its input index,
+    so an interrupted run resumes after the last completed line.
+    """
+
+    def __init__(self, orchestrator, settings: Settings, output_path: str = None):
+        self.orchestrator = orchestrator
+        self.settings = settings
+        self.output_path = output_path or self.settings.BATCH_OUTPUT_PATH
+
+    def run(self, test_data: List[Any]) -> int:
+        return asyncio.run(self._run(test_data))
+
+    def _resume_index(self) -> int:
+        if not os.path.exists(self.output_path):
+            return 0
+
+        completed = 0
+        valid_bytes = 0
+        with open(self.output_path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n") or record.get("index") != completed:
+                    break
+                completed += 1
+                valid_bytes += len(line)
+
+        # Drop a partially written trailing line left behind by a crash.
+        if valid_bytes != os.path.getsize(self.output_path):
+            app_logger.warning(f"Truncating incomplete tail of {self.output_path} at entry #{completed + 1}.")
+            with open(self.output_path, 'r+b') as f:
+                f.truncate(valid_bytes)
+        return completed
+
+    async def _process_entry(self, index: int, conversation_obj: Any, total: int, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                user_content = extract_user_query(conversation_obj)
+            except (KeyError, IndexError, ValueError) as e:
+                app_logger.warning(f"Skipping malformed entry #{index+1} in test.json. Error: {e}. Data: {conversation_obj}")
+                return {"index": index, "status": "skipped", "error": str(e)}
+
+            app_logger.info(f"--- Processing query {index+1}/{total}: '{user_content}' ---")
+            try:
+                bot_response = await self.orchestrator.aprocess_query(user_content)
+            except Exception as e:
+                app_logger.error(f"Query {index+1}/{total} failed: {e}", exc_info=True)
+                return {"index": index, "status": "error", "query": user_content, "error": str(e)}
+            return {"index": index, "status": "ok", "query": user_content, "response": bot_response}
+
+    async def _run(self, test_data: List[Any]) -> int:
+        total = len(test_data)
+        start_index = self._resume_index()
+        if start_index >= total:
+            app_logger.info(f"All {total} entries already present in {self.output_path}. Nothing to do.")
+            return 0
+        if start_index:
+            app_logger.info(f"Resuming batch run from entry #{start_index+1}/{total}.")
+
+        os.makedirs(os.path.dirname(self.output_path) or ".", exist_ok=True)
+        semaphore = asyncio.Semaphore(self.settings.BATCH_CONCURRENCY)
+        tasks = [
+            asyncio.create_task(self._process_entry(i, test_data[i], total, semaphore))
+            for i in range(start_index, total)
+        ]
+
+        finished: Dict[int, Dict[str, Any]] = {}
+        next_index = start_index
+        with open(self.output_path, 'a', encoding='utf-8') as out:
+            for task in asyncio.as_completed(tasks):
+                record = await task
+                finished[record["index"]] = record
+                while next_index in finished:
+                    out.write(json.dumps(finished.pop(next_index), ensure_ascii=False) + "\n")
+                    next_index += 1
+                out.flush()
+
+        app_logger.info(f"Batch run wrote {next_index - start_index} entries to {self.output_path}.")
+        return next_index - start_index
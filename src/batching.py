@@ -0,0 +1,144 @@
+import os
+import queue
+import threading
+import time
+import weakref
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, NamedTuple, Sequence
+
+
+def _restart_after_fork(batcher_ref: "weakref.ref[MicroBatcher]") -> Callable[[], None]:
+    def restart():
+        batcher = batcher_ref()
+        if batcher is not None:
+            batcher._reset_after_fork()
+    return restart
+
+
+class _BatchRequest(NamedTuple):
+    items: Sequence[Any]
+    future: Future
+    enqueued_at: float
+
+
+class MicroBatcher:
+    """
+    Runs `batch_fn` once on the concatenated items of requests from concurrent callers and
+    hands every caller back the slice of results that belongs to it. Requests that queued up
+    while the previous batch ran are always taken along (up to `max_batch_size` items); the
+    batcher only waits up to `max_wait_ms` for more callers while traffic is concurrent, i.e.
+    while the previous batch served more than one request, so a lone caller is never delayed.
+    `batch_fn` must return one result per input item, in order.
+    """
+
+    def __init__(self, name: str, batch_fn: Callable[[List[Any]], Sequence[Any]], max_batch_size: int, max_wait_ms: float):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[_BatchRequest]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._items = 0
+        self._max_queue_depth = 0
+        self._total_wait = 0.0
+        self._batch_sizes = Counter()
+        self._concurrent = False
+        self._closed = False
+        self._start_worker()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=_restart_after_fork(weakref.ref(self)))
+
+    def _start_worker(self):
+        self._worker = threading.Thread(target=self._run, name=f"micro-batcher-{self.name}", daemon=True)
+        self._worker.start()
+
+    def _reset_after_fork(self):
+        # The worker thread does not exist in a forked child; start a fresh one with an empty queue.
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        if not self._closed:
+            self._start_worker()
+
+    def submit(self, items: Sequence[Any]) -> Future:
+        if self._closed:
+            raise RuntimeError(f"MicroBatcher '{self.name}' is closed.")
+        future = Future()
+        if not items:
+            future.set_result([])
+            return future
+        self._queue.put(_BatchRequest(items, future, time.monotonic()))
+        with self._stats_lock:
+            self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        return future
+
+    def __call__(self, items: Sequence[Any]) -> Sequence[Any]:
+        return self.submit(items).result()
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join(timeout=5)
+
+    def _collect(self, first: _BatchRequest) -> List[_BatchRequest]:
+        batch = [first]
+        size = len(first.items)
+        deadline = time.monotonic() + (self.max_wait if self._concurrent else 0.0)
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                # Re-queue the shutdown marker so the worker exits after this batch.
+                self._queue.put(None)
+                break
+            batch.append(request)
+            size += len(request.items)
+        self._concurrent = len(batch) > 1
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            flat_items = [item for request in batch for item in request.items]
+            started_at = time.monotonic()
+
+            try:
+                results = self.batch_fn(flat_items)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            offset = 0
+            for request in batch:
+                request.future.set_result(results[offset:offset + len(request.items)])
+                offset += len(request.items)
+
+            with self._stats_lock:
+                self._requests += len(batch)
+                self._batches += 1
+                self._items += len(flat_items)
+                self._batch_sizes[len(flat_items)] += 1
+                self._total_wait += sum(started_at - request.enqueued_at for request in batch)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "name": self.name,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "requests": self._requests,
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": self._items / self._batches if self._batches else 0.0,
+                "avg_queue_wait_ms": 1000.0 * self._total_wait / self._requests if self._requests else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+            }
@@ -0,0 +1,182 @@
+import numpy as np
+from collections import Counter
+from typing import Dict, List, NamedTuple, Tuple
+from scipy import sparse
+
+
+class BM25Result(NamedTuple):
+    scores: np.ndarray
+    top_indices: np.ndarray
+    top_scores: np.ndarray
+
+    @property
+    def top_index(self) -> int:
+        return int(self.top_indices[0]) if len(self.top_indices) else -1
+
+    @property
+    def top_score(self) -> float:
+        return float(self.top_scores[0]) if len(self.top_scores) else 0.0
+
+    def as_pairs(self) -> List[tuple]:
+        return list(zip(self.top_indices.tolist(), self.top_scores.tolist()))
+
+
+class SparseBM25:
+    """
+    Okapi BM25 over a precomputed sparse document-term weight matrix.
+    Scores are identical to `rank_bm25.BM25Okapi`, but a query only touches the
+    columns of its own terms instead of looping over every document in Python.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.vocabulary: Dict[str, int] = {}
+        self.doc_len = np.zeros(0, dtype=np.int32)
+        self.doc_freqs = np.zeros(0, dtype=np.int32)
+        self.term_freqs = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.weights = sparse.csc_matrix((0, 0), dtype=np.float32)
+
+    @property
+    def corpus_size(self) -> int:
+        return len(self.doc_len)
+
+    @staticmethod
+    def _count_terms(tokenized_corpus: List[List[str]], vocabulary: Dict[str, int]) -> Tuple[sparse.csr_matrix, np.ndarray]:
+        """Builds the raw term-frequency matrix, adding unseen terms to `vocabulary` in place."""
+        rows, cols, counts = [], [], []
+        doc_len = np.zeros(len(tokenized_corpus), dtype=np.int32)
+        for doc_id, tokens in enumerate(tokenized_corpus):
+            doc_len[doc_id] = len(tokens)
+            for term, count in Counter(tokens).items():
+                term_id = vocabulary.setdefault(term, len(vocabulary))
+                rows.append(doc_id)
+                cols.append(term_id)
+                counts.append(count)
+        term_freqs = sparse.csr_matrix(
+            (np.asarray(counts, dtype=np.float32), (np.asarray(rows, dtype=np.int32), np.asarray(cols, dtype=np.int32))),
+            shape=(len(tokenized_corpus), len(vocabulary)),
+        )
+        return term_freqs, doc_len
+
+    def fit(self, tokenized_corpus: List[List[str]]) -> "SparseBM25":
+        term_freqs, doc_len = self._count_terms(tokenized_corpus, self.vocabulary)
+        self.doc_len = doc_len
+        self.doc_freqs = np.bincount(term_freqs.indices, minlength=len(self.vocabulary)).astype(np.int32)
+        self.term_freqs = term_freqs
+        self.weights = self._compute_weights(term_freqs)
+        return self
+
+    def updated(self, keep: np.ndarray, added_corpus: List[List[str]]) -> "SparseBM25":
+        """
+        Returns a new index containing the documents selected by the boolean mask `keep`
+        followed by `added_corpus`, leaving this one untouched so it can keep serving queries.
+        Document frequencies are adjusted by the removed and added rows only; terms that no
+        longer occur are pruned so the result scores exactly like a fresh `fit()`.
+        """
+        vocabulary = dict(self.vocabulary)
+        added_tf, added_len = self._count_terms(added_corpus, vocabulary)
+        num_terms = len(vocabulary)
+
+        removed_tf = self.term_freqs[~keep]
+        doc_freqs = np.zeros(num_terms, dtype=np.int32)
+        doc_freqs[:len(self.doc_freqs)] = self.doc_freqs
+        doc_freqs -= np.bincount(removed_tf.indices, minlength=num_terms).astype(np.int32)
+        doc_freqs += np.bincount(added_tf.indices, minlength=num_terms).astype(np.int32)
+
+        kept_tf = self.term_freqs[keep]
+        kept_tf.resize((kept_tf.shape[0], num_terms))
+        term_freqs = sparse.vstack([kept_tf, added_tf], format="csr")
+
+        live_terms = doc_freqs > 0
+        if not live_terms.all():
+            terms = np.empty(num_terms, dtype=object)
+            for term, term_id in vocabulary.items():
+                terms[term_id] = term
+            vocabulary = {term: i for i, term in enumerate(terms[live_terms])}
+            term_freqs = term_freqs[:, live_terms]
+            doc_freqs = doc_freqs[live_terms]
+
+        bm25 = SparseBM25(k1=self.k1, b=self.b, epsilon=self.epsilon)
+        bm25.vocabulary = vocabulary
+        bm25.doc_len = np.concatenate([self.doc_len[keep], added_len]).astype(np.int32)
+        bm25.doc_freqs = doc_freqs
+        bm25.term_freqs = term_freqs.tocsr()
+        bm25.weights = bm25._compute_weights(bm25.term_freqs)
+        return bm25
+
+    def _compute_idf(self) -> np.ndarray:
+        if not len(self.doc_freqs):
+            return np.zeros(0, dtype=np.float32)
+        idf = np.log(self.corpus_size - self.doc_freqs + 0.5) - np.log(self.doc_freqs + 0.5)
+        average_idf = idf.sum() / len(idf)
+        idf[idf < 0] = self.epsilon * average_idf
+        return idf.astype(np.float32)
+
+    def _compute_weights(self, term_freqs: sparse.spmatrix) -> sparse.csc_matrix:
+        avgdl = self.doc_len.sum() / self.corpus_size if self.corpus_size else 0.0
+        weights = term_freqs.tocoo()
+        tf = weights.data
+        if avgdl > 0:
+            length_norm = self.k1 * (1 - self.b + self.b * self.doc_len[weights.row] / avgdl)
+        else:
+            length_norm = np.full_like(tf, self.k1)
+        idf = self._compute_idf()
+        weights.data = (idf[weights.col] * tf * (self.k1 + 1) / (tf + length_norm)).astype(np.float32)
+        return weights.tocsc()
+
+    def get_scores(self, tokenized_query: List[str]) -> np.ndarray:
+        query_terms = Counter(term for term in tokenized_query if term in self.vocabulary)
+        if not query_terms:
+            return np.zeros(self.corpus_size, dtype=np.float32)
+        term_ids = np.fromiter((self.vocabulary[term] for term in query_terms), dtype=np.int64)
+        multiplicity = np.fromiter(query_terms.values(), dtype=np.float32)
+        return np.asarray(self.weights[:, term_ids] @ multiplicity).ravel()
+
+    def search(self, tokenized_query: List[str], top_k: int) -> BM25Result:
+        scores = self.get_scores(tokenized_query)
+        top_k = min(top_k, len(scores))
+        if top_k <= 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return BM25Result(scores, empty, empty.astype(np.float32))
+        if top_k < len(scores):
+            candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            candidates = np.arange(len(scores))
+        order = np.lexsort((candidates, -scores[candidates]))
+        top_indices = candidates[order]
+        return BM25Result(scores, top_indices, scores[top_indices])
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "weights_data": self.weights.data,
+            "weights_indices": self.weights.indices,
+            "weights_indptr": self.weights.indptr,
+            "term_freqs_data": self.term_freqs.data,
+            "term_freqs_indices": self.term_freqs.indices,
+            "term_freqs_indptr": self.term_freqs.indptr,
+            "doc_len": self.doc_len,
+            "doc_freqs": self.doc_freqs,
+        }
+
+    def state(self) -> Dict:
+        return {"k1": self.k1, "b": self.b, "epsilon": self.epsilon, "vocabulary": self.vocabulary}
+
+    @classmethod
+    def from_arrays(cls, state: Dict, arrays: Dict[str, np.ndarray]) -> "SparseBM25":
+        bm25 = cls(k1=state["k1"], b=state["b"], epsilon=state["epsilon"])
+        bm25.vocabulary = state["vocabulary"]
+        bm25.doc_len = arrays["doc_len"]
+        bm25.doc_freqs = arrays["doc_freqs"]
+        bm25.weights = sparse.csc_matrix(
+            (arrays["weights_data"], arrays["weights_indices"], arrays["weights_indptr"]),
+            shape=(len(bm25.doc_len), len(bm25.vocabulary)),
+            copy=False,
+        )
+        bm25.term_freqs = sparse.csr_matrix(
+            (arrays["term_freqs_data"], arrays["term_freqs_indices"], arrays["term_freqs_indptr"]),
+            shape=(len(bm25.doc_len), len(bm25.vocabulary)),
+            copy=False,
+        )
+        return bm25
@@ -1,45 +1,98 @@
 import pandas as pd
-from typing import List, Dict, Tuple
+from typing import Any, Dict, Iterator, List, Tuple
 from config import Settings
+from src.document_store import DocumentStore
 from src.utils.logger import app_logger
 
+
+def _text(df: pd.DataFrame, column: str, default: str) -> pd.Series:
+    if column not in df:
+        return pd.Series(default, index=df.index, dtype=object)
+    return df[column].fillna(default).astype(str)
+
+
+def _optional(df: pd.DataFrame, column: str) -> List[Any]:
+    if column not in df:
+        return [None] * len(df)
+    series = df[column].astype(object)
+    return series.where(series.notna(), None).tolist()
+
+
 class DataLoader:
     def __init__(self, settings: Settings):
         self.settings = settings
         app_logger.info(f"DataLoader initialized with knowledge_base: {self.settings.KNOWLEDGE_BASE_PATH} and products: {self.settings.PRODUCTS_PATH}")
 
-    def load_and_chunk(self) -> Tuple[List[Dict], List[Dict]]:
+    def load_and_chunk(self) -> Tuple[DocumentStore, DocumentStore]:
         app_logger.info("Starting data loading and chunking process...")
-        product_documents = self._chunk_products()
-        faq_documents = self._chunk_knowledge_base()
+        product_documents = self.load_products()
+        faq_documents = self.load_knowledge_base()
         app_logger.info(f"Chunking complete. Loaded {len(faq_documents)} FAQ documents and {len(product_documents)} product documents.")
         return faq_documents, product_documents
 
-    def _chunk_products(self) -> List[Dict]:
-        documents = []
-        try:
-            df_products = pd.read_csv(self.settings.PRODUCTS_PATH)
-            for _, row in df_products.iterrows():
-                specs = f"- 類型: {row.get('specs/arm_type', 'N/A')}\n" \
-                        f"- 最大支援尺寸: {row.get('specs/size_max_inch', 'N/A')} 吋\n" \
-                        f"- VESA: {row.get('specs/vesa/0', 'N/A')}\n"
-                content = f"產品名稱: {row['name']}\nSKU: {row['sku']}\n核心規格:\n{specs}相容性說明: {row.get('compatibility_notes', '無')}"
-                metadata = {"source": "product", "sku": row['sku'], "name": row['name'], "url": f"/products/{row['sku']}", "image": row.get('images/0')}
-                documents.append({"content": content, "metadata": metadata})
-        except FileNotFoundError:
-            app_logger.error(f"Product data file not found at {self.settings.PRODUCTS_PATH}")
-            raise
-        return documents
-    
-    def _chunk_knowledge_base(self) -> List[Dict]:
-        documents = []
+    def load_products(self) -> DocumentStore:
+        return DocumentStore.concat("product", self.iter_products())
+
+    def load_knowledge_base(self) -> DocumentStore:
+        return DocumentStore.concat("faq", self.iter_knowledge_base())
+
+    def documents_from_records(self, source: str, records: List[Dict[str, Any]]) -> DocumentStore:
+        """Builds documents from CSV-shaped row dicts, e.g. for incremental knowledge-base updates."""
+        df = pd.DataFrame(records, dtype=object)
+        return self._chunk_knowledge_base(df) if source == "faq" else self._chunk_products(df)
+
+    def _read_csv_chunks(self, path: str, description: str) -> Iterator[pd.DataFrame]:
+        # Everything is read as text so document content reproduces the CSV verbatim (e.g. "32", not "32.0").
         try:
-            df_kb = pd.read_csv(self.settings.KNOWLEDGE_BASE_PATH)
-            for _, row in df_kb.iterrows():
-                content = f"問題分類: {row['title']}\n詳細內容: {row['content']}"
-                metadata = {"source": "faq", "title": row['title'], "url": row.get('urls/0/href'), "image": row.get('images/0')}
-                documents.append({"content": content, "metadata": metadata})
+            reader = pd.read_csv(path, dtype=str, chunksize=self.settings.DATA_LOADER_CHUNK_SIZE)
         except FileNotFoundError:
-            app_logger.error(f"Knowledge base file not found at {self.settings.KNOWLEDGE_BASE_PATH}")
+            app_logger.error(f"{description} file not found at {path}")
             raise
-        return documents
\ No newline at end of file
+        with reader:
+            yield from reader
+
+    def iter_products(self) -> Iterator[DocumentStore]:
+        for df in self._read_csv_chunks(self.settings.PRODUCTS_PATH, "Product data"):
+            yield self._chunk_products(df)
+
+    def iter_knowledge_base(self) -> Iterator[DocumentStore]:
+        for df in self._read_csv_chunks(self.settings.KNOWLEDGE_BASE_PATH, "Knowledge base"):
+            yield self._chunk_knowledge_base(df)
+
+    def _chunk_products(self, df: pd.DataFrame) -> DocumentStore:
+        sku = _text(df, 'sku', '')
+        specs = (
+            "- 類型: " + _text(df, 'specs/arm_type', 'N/A') + "\n"
+            + "- 最大支援尺寸: " + _text(df, 'specs/size_max_inch', 'N/A') + " 吋\n"
+            + "- VESA: " + _text(df, 'specs/vesa/0', 'N/A') + "\n"
+        )
+        content = (
+            "產品名稱: " + _text(df, 'name', '') + "\nSKU: " + sku + "\n核心規格:\n" + specs
+            + "相容性說明: " + _text(df, 'compatibility_notes', '無')
+        )
+        size_max_inch = pd.to_numeric(df['specs/size_max_inch'], errors='coerce').astype(float) if 'specs/size_max_inch' in df else None
+        vesa_columns = [_optional(df, 'specs/vesa/0'), _optional(df, 'specs/vesa/1')]
+        metadata = {
+            "sku": sku.tolist(),
+            "name": _optional(df, 'name'),
+            "url": ("/products/" + sku).tolist(),
+            "image": _optional(df, 'images/0'),
+            "arm_type": _optional(df, 'specs/arm_type'),
+            "size_max_inch": (
+                size_max_inch.astype(object).where(size_max_inch.notna(), None).tolist()
+                if size_max_inch is not None else [None] * len(df)
+            ),
+            "vesa": [[v for v in patterns if v is not None] for patterns in zip(*vesa_columns)],
+            "compatibility_notes": _optional(df, 'compatibility_notes'),
+        }
+        return DocumentStore("product", content.tolist(), metadata)
+
+    def _chunk_knowledge_base(self, df: pd.DataFrame) -> DocumentStore:
+        content = "問題分類: " + _text(df, 'title', '') + "\n詳細內容: " + _text(df, 'content', '')
+        metadata = {
+            "id": _optional(df, 'id'),
+            "title": _optional(df, 'title'),
+            "url": _optional(df, 'urls/0/href'),
+            "image": _optional(df, 'images/0'),
+        }
+        return DocumentStore("faq", content.tolist(), metadata)
@@ -0,0 +1,63 @@
+from typing import Any, Dict, Iterator, List, Sequence
+
+
+class DocumentStore(Sequence):
+    """
+    Columnar document collection: one list of contents plus one list per metadata field,
+    instead of a `{"content", "metadata"}` dict per document. Indexing materializes that
+    dict on demand, so callers that expect the list-of-dicts interface keep working.
+    """
+
+    def __init__(self, source: str, contents: List[str] = None, metadata: Dict[str, List[Any]] = None):
+        self.source = source
+        self.contents: List[str] = list(contents) if contents is not None else []
+        self.metadata_columns: Dict[str, List[Any]] = {name: list(values) for name, values in (metadata or {}).items()}
+        for name, values in self.metadata_columns.items():
+            if len(values) != len(self.contents):
+                raise ValueError(f"Metadata column '{name}' has {len(values)} values for {len(self.contents)} documents.")
+
+    def __len__(self) -> int:
+        return len(self.contents)
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        if isinstance(index, slice):
+            raise TypeError("DocumentStore does not support slicing; use column() for bulk access.")
+        metadata = {"source": self.source}
+        for name, values in self.metadata_columns.items():
+            metadata[name] = values[index]
+        return {"content": self.contents[index], "metadata": metadata}
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self.contents)):
+            yield self[i]
+
+    def column(self, name: str) -> List[Any]:
+        if name == "source":
+            return [self.source] * len(self.contents)
+        return self.metadata_columns[name]
+
+    def take(self, indices: Sequence[int]) -> "DocumentStore":
+        """Returns a new store with the documents at `indices`, in that order."""
+        return DocumentStore(
+            self.source,
+            [self.contents[i] for i in indices],
+            {name: [values[i] for i in indices] for name, values in self.metadata_columns.items()},
+        )
+
+    def extend(self, other: "DocumentStore"):
+        if other.source != self.source:
+            raise ValueError(f"Cannot extend '{self.source}' documents with '{other.source}' documents.")
+        if not self.contents and not self.metadata_columns:
+            self.metadata_columns = {name: [] for name in other.metadata_columns}
+        if set(other.metadata_columns) != set(self.metadata_columns):
+            raise ValueError("Cannot extend a DocumentStore with a different set of metadata columns.")
+        self.contents.extend(other.contents)
+        for name, values in other.metadata_columns.items():
+            self.metadata_columns[name].extend(values)
+
+    @classmethod
+    def concat(cls, source: str, chunks: Sequence["DocumentStore"]) -> "DocumentStore":
+        store = cls(source)
+        for chunk in chunks:
+            store.extend(chunk)
+        return store
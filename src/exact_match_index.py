@@ -0,0 +1,50 @@
+import json
+import os
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence
+from src.document_store import DocumentStore
+from src.utils.logger import app_logger
+from src.utils.text import normalize_query
+
+
+def load_question_variants(path: Optional[str]) -> Dict[str, List[str]]:
+    """Reads the optional `{"<FAQ id>": ["question variant", ...]}` file; a missing path means no variants."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        variants = json.load(f)
+    app_logger.info(f"Loaded question variants for {len(variants)} FAQs from {path}")
+    return variants
+
+
+class ExactMatchIndex:
+    """
+    Precomputed structures for the golden-ticket path of one FAQ snapshot: a hash map from
+    normalized titles and known question variants to document positions (a key shared by
+    several documents is ambiguous and left out), and every document's content lowercased
+    once at build time for keyword verification. `normalize` must be the same function that
+    produces the normalized queries passed to lookup().
+    """
+
+    def __init__(self, documents: DocumentStore, variants: Dict[str, List[str]] = None,
+                 normalize: Callable[[str], str] = normalize_query):
+        self.lowered_contents = [content.lower() for content in documents.contents]
+        candidates = []
+        if "title" in documents.metadata_columns:
+            candidates += [(normalize(title), position) for position, title in enumerate(documents.column("title")) if title]
+        if variants and "id" in documents.metadata_columns:
+            positions = {str(doc_id): position for position, doc_id in enumerate(documents.column("id")) if doc_id is not None}
+            for doc_id, questions in variants.items():
+                if str(doc_id) in positions:
+                    candidates += [(normalize(question), positions[str(doc_id)]) for question in questions]
+
+        owners = Counter(key for key, _ in set(candidates))
+        self.positions: Dict[str, int] = {key: position for key, position in candidates if key and owners[key] == 1}
+
+    def lookup(self, normalized_query: str) -> Optional[int]:
+        return self.positions.get(normalized_query)
+
+    def contains_all(self, position: int, keywords: Sequence[str]) -> bool:
+        """Whether every (lowercased) keyword occurs in the document; False for no keywords."""
+        content = self.lowered_contents[position]
+        return bool(keywords) and all(keyword in content for keyword in keywords)
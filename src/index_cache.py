@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import faiss
+from typing import Any, Dict, Optional
+from config import Settings
+from src.bm25_index import SparseBM25
+from src.vector_index import index_spec
+from src.utils.logger import app_logger
+
+INDEX_CACHE_VERSION = 6
+
+
+class IndexCache:
+    """
+    On-disk cache of the retrieval artifacts a warm start needs (BM25 matrices and statistics,
+    FAISS index); the BM25 arrays and the FAISS index are memory-mapped on load. The cache key
+    is derived from the source files of the cached namespace (for FAQs the knowledge-base CSV
+    and the jieba dictionary), the embedding model path and the index configuration, so any
+    change to them forces a rebuild.
+    """
+
+    MANIFEST_FILE = "manifest.json"
+    BM25_STATE_FILE = "bm25_state.json"
+    BM25_ARRAY_PREFIX = "bm25_"
+    FAISS_FILE = "faiss.index"
+    # Settings naming the source files of each namespace's indices.
+    NAMESPACE_SOURCES = {
+        "faq": ("KNOWLEDGE_BASE_PATH", "JIEBA_DICT_PATH"),
+        "products": ("PRODUCTS_PATH",),
+    }
+
+    def __init__(self, settings: Settings, namespace: str = "faq"):
+        self.settings = settings
+        self.namespace = namespace
+        self.key = self._compute_key()
+        self.path = os.path.join(self.settings.INDEX_CACHE_DIR, f"{self.namespace}-v{INDEX_CACHE_VERSION}-{self.key[:16]}")
+
+    def _compute_key(self) -> str:
+        hasher = hashlib.sha256()
+        hasher.update(f"version={INDEX_CACHE_VERSION};namespace={self.namespace}".encode("utf-8"))
+        for setting in self.NAMESPACE_SOURCES[self.namespace]:
+            path = getattr(self.settings, setting)
+            hasher.update(path.encode("utf-8"))
+            self._update_with_file(hasher, path)
+        hasher.update(self.settings.EMBEDDING_MODEL_PATH.encode("utf-8"))
+        hasher.update(index_spec(self.settings).encode("utf-8"))
+        return hasher.hexdigest()
+
+    @staticmethod
+    def _update_with_file(hasher, path: str):
+        if not os.path.exists(path):
+            hasher.update(b"<missing>")
+            return
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(block)
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        manifest_path = os.path.join(self.path, self.MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def is_valid(self, num_documents: Optional[int] = None) -> bool:
+        manifest = self._read_manifest()
+        return (
+            manifest is not None
+            and manifest.get("key") == self.key
+            and manifest.get("version") == INDEX_CACHE_VERSION
+            and (num_documents is None or manifest.get("num_documents") == num_documents)
+        )
+
+    def load(self) -> Dict[str, Any]:
+        app_logger.info(f"Loading cached indices from {self.path}")
+        with open(os.path.join(self.path, self.BM25_STATE_FILE), 'r', encoding='utf-8') as f:
+            bm25_state = json.load(f)
+        bm25_arrays = {
+            name: np.load(os.path.join(self.path, f"{self.BM25_ARRAY_PREFIX}{name}.npy"), mmap_mode='r')
+            for name in bm25_state["arrays"]
+        }
+        bm25 = SparseBM25.from_arrays(bm25_state, bm25_arrays)
+        faiss_index = self._read_faiss_index(os.path.join(self.path, self.FAISS_FILE))
+        return {"bm25": bm25, "faiss_index": faiss_index}
+
+    @staticmethod
+    def _read_faiss_index(path: str):
+        # IO_FLAG_MMAP only maps inverted lists; IO_FLAG_MMAP_IFC also maps flat codes and HNSW graphs,
+        # so the vectors stay file-backed pages shared by every process that loads the same cache.
+        mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        try:
+            return faiss.read_index(path, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            # Not every index type supports memory mapping; fall back to a regular read.
+            return faiss.read_index(path)
+
+    def save(self, bm25: SparseBM25, faiss_index):
+        os.makedirs(self.settings.INDEX_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        bm25_arrays = bm25.to_arrays()
+        for name, array in bm25_arrays.items():
+            np.save(os.path.join(tmp_path, f"{self.BM25_ARRAY_PREFIX}{name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(tmp_path, self.BM25_STATE_FILE), 'w', encoding='utf-8') as f:
+            json.dump(dict(bm25.state(), arrays=list(bm25_arrays)), f, ensure_ascii=False)
+        faiss.write_index(faiss_index, os.path.join(tmp_path, self.FAISS_FILE))
+
+        manifest = {
+            "key": self.key,
+            "version": INDEX_CACHE_VERSION,
+            "namespace": self.namespace,
+            "num_documents": bm25.corpus_size,
+            "embedding_model": self.settings.EMBEDDING_MODEL_PATH,
+            "dimension": int(faiss_index.d),
+        }
+        with open(os.path.join(tmp_path, self.MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(tmp_path, self.path)
+        app_logger.info(f"Saved index cache to {self.path}")
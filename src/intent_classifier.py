@@ -0,0 +1,133 @@
+import asyncio
+import json
+import re
+import threading
+import numpy as np
+from collections import Counter
+from typing import Callable, Dict, Optional
+from config import Settings
+from src.llm_handler import LLMHandler
+from src.utils.logger import app_logger
+from src.utils.lru import LRUCache
+from src.utils.text import normalize_query
+
+
+class IntentClassifier:
+    """
+    Tiered intent classification in front of `LLMHandler.classify_intent`:
+    1. explicit keyword/regex rules,
+    2. nearest-centroid over bge-m3 embeddings of seed examples,
+    3. the LLM, only when the first two tiers are not confident.
+    Results are cached per normalized query.
+    """
+
+    def __init__(self, settings: Settings, llm_handler: LLMHandler, encode_query: Callable[[str], np.ndarray]):
+        self.settings = settings
+        self.llm_handler = llm_handler
+        self.encode_query = encode_query
+        self.handoff_patterns = [re.compile(p, re.IGNORECASE) for p in self.settings.INTENT_HANDOFF_PATTERNS]
+        self.product_patterns = [re.compile(p, re.IGNORECASE) for p in self.settings.INTENT_PRODUCT_PATTERNS]
+        self.intents, self.centroids = self._build_centroids()
+        self._cache = LRUCache(self.settings.INTENT_CACHE_SIZE)
+        self._lock = threading.Lock()
+        self._counters = Counter()
+        app_logger.info(f"IntentClassifier initialized with {len(self.intents)} intent centroids.")
+
+    def _build_centroids(self):
+        with open(self.settings.INTENT_EXAMPLES_PATH, 'r', encoding='utf-8') as f:
+            examples = json.load(f)
+        intents = list(examples.keys())
+        centroids = []
+        for intent in intents:
+            embeddings = np.vstack([self.encode_query(text) for text in examples[intent]])
+            centroid = embeddings.mean(axis=0)
+            centroids.append(centroid / np.linalg.norm(centroid))
+        return intents, np.vstack(centroids).astype(np.float32)
+
+    def _match_rules(self, normalized_query: str) -> Optional[str]:
+        if any(p.search(normalized_query) for p in self.handoff_patterns):
+            return "handoff"
+        if any(p.search(normalized_query) for p in self.product_patterns):
+            return "product_inquiry"
+        return None
+
+    def _match_centroid(self, query: str) -> Optional[Dict[str, str]]:
+        query_embedding = np.asarray(self.encode_query(query), dtype=np.float32).reshape(-1)
+        similarities = self.centroids @ query_embedding
+        order = np.argsort(similarities)[::-1]
+        best, runner_up = similarities[order[0]], similarities[order[1]] if len(order) > 1 else -1.0
+        if best >= self.settings.INTENT_CENTROID_MIN_SIMILARITY and best - runner_up >= self.settings.INTENT_CENTROID_MIN_MARGIN:
+            return {"intent": self.intents[order[0]], "source": "centroid", "confidence": f"{best:.4f}"}
+        return None
+
+    def _classify_locally(self, query: str, normalized_query: str) -> Optional[Dict[str, str]]:
+        intent = self._match_rules(normalized_query)
+        if intent is not None:
+            return {"intent": intent, "source": "rule"}
+        return self._match_centroid(query)
+
+    def _cache_get(self, key: str) -> Optional[Dict[str, str]]:
+        result = self._cache.get(key)
+        with self._lock:
+            self._counters["total"] += 1
+            if result is not None:
+                self._counters["cache"] += 1
+        return result
+
+    def _record(self, key: str, result: Dict[str, str]):
+        with self._lock:
+            self._counters[result.get("source", "llm")] += 1
+            total = self._counters["total"]
+        if result.get("fallback"):
+            # The LLM call failed; do not pin the default intent for this query.
+            return
+        self._cache.put(key, result)
+        if total % self.settings.INTENT_STATS_LOG_INTERVAL == 0:
+            app_logger.info(f"Intent classifier stats: {self.stats()}")
+
+    def needs_llm(self, query: str) -> bool:
+        """True when classify() would have to call the LLM (no cache entry, rule or centroid match)."""
+        key = normalize_query(query)
+        if key in self._cache:
+            return False
+        return self._classify_locally(query, key) is None
+
+    def classify(self, query: str) -> Dict[str, str]:
+        key = normalize_query(query)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return dict(cached)
+
+        result = self._classify_locally(query, key)
+        if result is None:
+            result = dict(self.llm_handler.classify_intent(query), source="llm")
+        else:
+            app_logger.info(f"Query '{query}' classified locally ({result['source']}) with intent: {result['intent']}")
+        self._record(key, result)
+        return dict(result)
+
+    async def aclassify(self, query: str) -> Dict[str, str]:
+        key = normalize_query(query)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return dict(cached)
+
+        result = await asyncio.to_thread(self._classify_locally, query, key)
+        if result is None:
+            result = dict(await self.llm_handler.aclassify_intent(query), source="llm")
+        else:
+            app_logger.info(f"Query '{query}' classified locally ({result['source']}) with intent: {result['intent']}")
+        self._record(key, result)
+        return dict(result)
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self._counters["total"]
+            stats = {"total": total, "cache_size": len(self._cache)}
+            for source in ("cache", "rule", "centroid", "llm"):
+                stats[f"{source}_hits"] = self._counters[source]
+                stats[f"{source}_hit_rate"] = round(self._counters[source] / total, 4) if total else 0.0
+            return stats
@@ -1,23 +1,65 @@
+import asyncio
 import openai
 import time
 import json
-from typing import Tuple, Dict, Any
+import weakref
+from typing import Tuple, Dict, Any, Iterator, Optional
 from config import Settings
 from src.utils.logger import app_logger, cost_logger
+from src.utils.rate_limiter import AsyncRateLimiter
+from src.utils.tokens import TokenCounter
+from src.utils.tracing import tracer
+
+class StreamingResponse:
+    """
+    Iterable over the text deltas of a streamed completion. Usage, time to first token
+    and total latency become available once iteration has finished.
+    """
+
+    def __init__(self, handler: "LLMHandler", request: Dict[str, Any], conversation_id: str):
+        self._handler = handler
+        self._request = request
+        self.conversation_id = conversation_id
+        self.usage = None
+        self.time_to_first_token: Optional[float] = None
+        self.total_latency: Optional[float] = None
+        self.failed = False
+
+    def __iter__(self) -> Iterator[str]:
+        return self._handler._iterate_stream(self, self._request)
+
 
 class LLMHandler:
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, client=None, async_client=None):
         self.settings = settings
-        if not self.settings.API_KEY:
-            raise ValueError("Azure OpenAI API Key is not set in environment variables.")
-        self.client = openai.AzureOpenAI(
+        if client is None or async_client is None:
+            if not self.settings.API_KEY:
+                raise ValueError("Azure OpenAI API Key is not set in environment variables.")
+        self.client = client or openai.AzureOpenAI(
+            azure_endpoint=self.settings.AZURE_ENDPOINT,
+            api_key=self.settings.API_KEY,
+            api_version=self.settings.AZURE_API_VERSION
+        )
+        self.async_client = async_client or openai.AsyncAzureOpenAI(
             azure_endpoint=self.settings.AZURE_ENDPOINT,
             api_key=self.settings.API_KEY,
-            api_version="2024-02-01"
+            api_version=self.settings.AZURE_API_VERSION
         )
+        self._async_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._rate_limiter = AsyncRateLimiter(self.settings.LLM_REQUESTS_PER_MINUTE)
+        self.token_counter = TokenCounter(self.settings.MODEL_TYPE, self.settings.TOKENIZER_FALLBACK_ENCODING)
         app_logger.info(f"LLMHandler initialized for model '{self.settings.MODEL_TYPE}'.")
 
-    def classify_intent(self, query: str) -> Dict[str, str]:
+    def _async_semaphore(self) -> asyncio.Semaphore:
+        # An asyncio.Semaphore binds to the first loop that waits on it, and every asyncio.run() starts
+        # a new loop, so each loop gets its own.
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._async_semaphores[loop] = asyncio.Semaphore(self.settings.LLM_MAX_CONCURRENCY)
+        return semaphore
+
+    def _build_intent_request(self, query: str) -> Dict[str, Any]:
         intent_prompt = f"""
         Analyze the user's query and classify it into ONE of the following intents.
         Respond ONLY with a valid JSON object.
@@ -31,56 +73,64 @@ class LLMHandler:
 
         JSON Response:
         """
-        
+        return dict(
+            model=self.settings.MODEL_TYPE,
+            messages=[
+                {"role": "system", "content": "You are an expert in classifying user intent."},
+                {"role": "user", "content": intent_prompt}
+            ],
+            temperature=0.0,
+            max_tokens=50,
+            response_format={"type": "json_object"}
+        )
+
+    def _build_generation_request(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        return dict(
+            model=self.settings.MODEL_TYPE,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=0.3,
+            max_tokens=1024
+        )
+
+    def classify_intent(self, query: str) -> Dict[str, str]:
+        try:
+            with tracer.span("llm.classify_intent"):
+                response = self.client.chat.completions.create(**self._build_intent_request(query))
+            intent_json = json.loads(response.choices[0].message.content)
+            app_logger.info(f"Query '{query}' classified with intent: {intent_json.get('intent')}")
+            return intent_json
+
+        except Exception as e:
+            app_logger.error(f"Intent classification failed for query '{query}'. Error: {e}", exc_info=True)
+            return {"intent": "policy_inquiry", "fallback": True}
+
+    async def aclassify_intent(self, query: str) -> Dict[str, str]:
         try:
-            response = self.client.chat.completions.create(
-                model=self.settings.MODEL_TYPE,
-                messages=[
-                    {"role": "system", "content": "You are an expert in classifying user intent."},
-                    {"role": "user", "content": intent_prompt}
-                ],
-                temperature=0.0,
-                max_tokens=50,
-                response_format={"type": "json_object"} 
-            )
-            
+            async with self._async_semaphore():
+                await self._rate_limiter.acquire()
+                with tracer.span("llm.classify_intent"):
+                    response = await self.async_client.chat.completions.create(**self._build_intent_request(query))
             intent_json = json.loads(response.choices[0].message.content)
             app_logger.info(f"Query '{query}' classified with intent: {intent_json.get('intent')}")
             return intent_json
 
         except Exception as e:
             app_logger.error(f"Intent classification failed for query '{query}'. Error: {e}", exc_info=True)
-            return {"intent": "policy_inquiry"}
+            return {"intent": "policy_inquiry", "fallback": True}
     
     def generate_response(self, system_prompt: str, user_prompt: str, conversation_id: str) -> Tuple[str, Dict[str, Any]]:
+        request = self._build_generation_request(system_prompt, user_prompt)
         for attempt in range(self.settings.MAX_RETRIES + 1):
             try:
-                response = self.client.chat.completions.create(
-                    model=self.settings.MODEL_TYPE,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    temperature=0.3,
-                    max_tokens=1024
-                )
-
-                if response.choices[0].finish_reason == 'content_filter':
-                    raise openai.APIError("Response flagged by content filter.", response=None, body=None)
-
-                content = response.choices[0].message.content
-                usage = response.usage
-                
-                self._log_usage(conversation_id, usage)
-                return content, usage
+                with tracer.span("llm.generate"):
+                    response = self.client.chat.completions.create(**request)
+                return self._handle_completion(response, conversation_id, request)
 
             except openai.APIError as e:
-                app_logger.warning(f"CONV_ID: {conversation_id} - OpenAI APIError on attempt {attempt + 1}: {e}. Retrying...")
-                if "content filter" in str(e):
-                    
-                    app_logger.error(f"CONV_ID: {conversation_id} - Content filter triggered. The prompt may contain sensitive words.")
-                if attempt >= self.settings.MAX_RETRIES:
-                    app_logger.error(f"CONV_ID: {conversation_id} - Max retries reached. Failing.")
+                if not self._should_retry(e, attempt, conversation_id):
                     return "抱歉，系統暫時無法處理您的請求。請稍後再試或調整您的問題。", None
                 time.sleep(1) 
             except Exception as e:
@@ -89,7 +139,100 @@ class LLMHandler:
         
         return "抱歉，系統目前無法回應，請稍後再試。", None 
 
-    def _log_usage(self, conversation_id: str, usage: Dict[str, Any]):
+    async def agenerate_response(self, system_prompt: str, user_prompt: str, conversation_id: str) -> Tuple[str, Dict[str, Any]]:
+        request = self._build_generation_request(system_prompt, user_prompt)
+        for attempt in range(self.settings.MAX_RETRIES + 1):
+            try:
+                async with self._async_semaphore():
+                    await self._rate_limiter.acquire()
+                    with tracer.span("llm.generate"):
+                        response = await self.async_client.chat.completions.create(**request)
+                return self._handle_completion(response, conversation_id, request)
+
+            except openai.APIError as e:
+                if not self._should_retry(e, attempt, conversation_id):
+                    return "抱歉，系統暫時無法處理您的請求。請稍後再試或調整您的問題。", None
+                await asyncio.sleep(1)
+            except Exception as e:
+                app_logger.error(f"CONV_ID: {conversation_id} - An unexpected error occurred: {e}")
+                return "抱歉，系統發生未預期的錯誤，請稍後再試。", None
+
+        return "抱歉，系統目前無法回應，請稍後再試。", None
+
+    def stream_response(self, system_prompt: str, user_prompt: str, conversation_id: str) -> StreamingResponse:
+        request = dict(
+            self._build_generation_request(system_prompt, user_prompt),
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        return StreamingResponse(self, request, conversation_id)
+
+    def _iterate_stream(self, stream: StreamingResponse, request: Dict[str, Any]) -> Iterator[str]:
+        conversation_id = stream.conversation_id
+        start_time = time.perf_counter()
+        for attempt in range(self.settings.MAX_RETRIES + 1):
+            try:
+                for chunk in self.client.chat.completions.create(**request):
+                    if getattr(chunk, "usage", None):
+                        stream.usage = chunk.usage
+                    if not chunk.choices:
+                        continue
+                    choice = chunk.choices[0]
+                    if choice.finish_reason == 'content_filter':
+                        raise openai.APIError("Response flagged by content filter.", response=None, body=None)
+                    delta = choice.delta.content if choice.delta else None
+                    if delta:
+                        if stream.time_to_first_token is None:
+                            stream.time_to_first_token = time.perf_counter() - start_time
+                        yield delta
+                break
+
+            except openai.APIError as e:
+                # Once tokens have reached the caller the stream cannot be replayed, so only retry before that.
+                if stream.time_to_first_token is not None or not self._should_retry(e, attempt, conversation_id):
+                    stream.failed = True
+                    yield "抱歉，系統暫時無法處理您的請求。請稍後再試或調整您的問題。"
+                    break
+                time.sleep(1)
+            except Exception as e:
+                app_logger.error(f"CONV_ID: {conversation_id} - An unexpected error occurred while streaming: {e}")
+                stream.failed = True
+                yield "抱歉，系統發生未預期的錯誤，請稍後再試。"
+                break
+
+        stream.total_latency = time.perf_counter() - start_time
+        if tracer.enabled:
+            tracer.observe("llm.stream", stream.total_latency)
+            if stream.time_to_first_token is not None:
+                tracer.observe("llm.ttft", stream.time_to_first_token)
+        ttft_ms = f"{stream.time_to_first_token * 1000:.1f}" if stream.time_to_first_token is not None else "N/A"
+        app_logger.info(f"CONV_ID: {conversation_id} - Streamed response. TTFT_MS: {ttft_ms}, TOTAL_LATENCY_MS: {stream.total_latency * 1000:.1f}")
+        if stream.usage is not None:
+            self._log_usage(conversation_id, stream.usage, request)
+
+    def _handle_completion(self, response, conversation_id: str, request: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        if response.choices[0].finish_reason == 'content_filter':
+            raise openai.APIError("Response flagged by content filter.", response=None, body=None)
+
+        content = response.choices[0].message.content
+        usage = response.usage
+
+        self._log_usage(conversation_id, usage, request)
+        return content, usage
+
+    def _should_retry(self, error: Exception, attempt: int, conversation_id: str) -> bool:
+        app_logger.warning(f"CONV_ID: {conversation_id} - OpenAI APIError on attempt {attempt + 1}: {error}. Retrying...")
+        if "content filter" in str(error):
+            app_logger.error(f"CONV_ID: {conversation_id} - Content filter triggered. The prompt may contain sensitive words.")
+        if attempt >= self.settings.MAX_RETRIES:
+            app_logger.error(f"CONV_ID: {conversation_id} - Max retries reached. Failing.")
+            return False
+        return True
+
+    def _log_usage(self, conversation_id: str, usage: Dict[str, Any], request: Dict[str, Any]):
+        # The local count is what prompt packing budgets against; logging it next to the billed
+        # count shows how far off the estimate is.
+        projected_prompt_tokens = self.token_counter.count_messages(request["messages"])
         prompt_tokens = usage.prompt_tokens
         completion_tokens = usage.completion_tokens
         total_tokens = usage.total_tokens
@@ -100,6 +243,7 @@ class LLMHandler:
 
         cost_logger.info(
             f"CONV_ID: {conversation_id}, "
+            f"PROJECTED_PROMPT_TOKENS: {projected_prompt_tokens}, "
             f"PROMPT_TOKENS: {prompt_tokens}, COMPLETION_TOKENS: {completion_tokens}, TOTAL_TOKENS: {total_tokens}, "
             f"ESTIMATED_COST_USD: {total_cost:.6f}"
         )
\ No newline at end of file
@@ -1,31 +1,185 @@
-import random
+import asyncio
+import contextvars
+import hashlib
+import importlib
+import itertools
+import os
 import uuid
 import json
-import jieba
 import jieba.posseg as pseg 
-import numpy as np
 import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from opencc import OpenCC
-from typing import List, Dict
+from typing import Iterator, List, Dict, NamedTuple, Optional, Tuple
 from config import Settings
+from src.answer_cache import AnswerCache
 from src.data_loader import DataLoader
-from src.rag_pipeline import HybridRetriever, Reranker
+from src.document_store import DocumentStore
+from src.rag_pipeline import HybridRetriever, Reranker, load_embedding_model
 from src.llm_handler import LLMHandler
+from src.intent_classifier import IntentClassifier
+from src.product_index import ProductIndex
+from src.prompt_packer import PromptPacker
 from src.utils.logger import app_logger, rag_logger, log_conversation
+from src.utils.lru import LRUCache
+from src.utils.startup import StartupProfiler
+from src.utils.text import IncrementalConverter, load_jieba, normalize_query
+from src.utils.tokens import TokenCounter
+from src.utils.tracing import gauges_to_prometheus, tracer
+
+class FAQRetrieval(NamedTuple):
+    faq_results: List[Dict]
+    top_score: float
+
 
 class JTCG_RAG_Orchestrator:
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, llm_handler: LLMHandler = None):
         self.settings = settings
+        # The tracer is shared by the whole process and follows the settings of its orchestrator.
+        tracer.configure(self.settings)
+        self._intent_pool = None
+        self._intent_pool_pid = None
+        self._intent_pool_lock = threading.Lock()
+        self._query_features_cache = LRUCache(self.settings.QUERY_TOKEN_CACHE_SIZE)
         app_logger.info("Initializing JTCG RAG Orchestrator...")
+        startup = StartupProfiler(self.settings.PARALLEL_STARTUP, self.settings.STARTUP_WORKERS)
+        try:
+            self._initialize_components(startup, llm_handler)
+            if self.settings.STARTUP_WARMUP:
+                startup.run("warmup", self.warmup)
+        finally:
+            self.startup_seconds = startup.close()
+        self.startup_timings = startup.timings
+        app_logger.info("Orchestrator initialized successfully.")
+
+    def _initialize_components(self, startup: StartupProfiler, llm_handler: LLMHandler = None):
         with open(self.settings.PROMPT_PATH, 'r', encoding='utf-8') as f:
             self.system_prompt = f.read()
-        self.s2t_converter = OpenCC('s2t.json')
-        loader = DataLoader(self.settings)
-        self.faq_docs, self.product_docs = loader.load_and_chunk()
-        self.faq_retriever = HybridRetriever(self.faq_docs, self.settings)
-        self.reranker = Reranker(self.settings)
-        self.llm_handler = LLMHandler(self.settings)
-        app_logger.info("Orchestrator initialized successfully.")
+        self.data_loader = DataLoader(self.settings)
+        # Steps that do not depend on each other overlap; only the indices wait for the embedding model.
+        s2t_converter = startup.submit("opencc", OpenCC, 's2t.json')
+        jieba_ready = startup.submit("jieba", load_jieba, self.settings.JIEBA_DICT_PATH, self.settings.JIEBA_CACHE_DIR)
+        product_docs = startup.submit("products_csv", self.data_loader.load_products)
+        llm = startup.submit("llm_client", LLMHandler, self.settings) if llm_handler is None else None
+        # torch is imported once here; importing it from two loader threads at once is not safe.
+        startup.run("import_models", importlib.import_module, "sentence_transformers")
+        embedding_model = startup.submit("embedding_model", load_embedding_model, self.settings)
+        reranker = startup.submit("reranker", Reranker, self.settings)
+
+        jieba_ready.result()
+        # Exact-match keys are normalized exactly like incoming queries, so the converter is needed first.
+        self.s2t_converter = s2t_converter.result()
+        # FAQ chunks are indexed as they are parsed instead of after the whole CSV has been read.
+        self.faq_retriever = startup.run(
+            "faq_index", HybridRetriever, self.data_loader.iter_knowledge_base(), self.settings, embedding_model.result(),
+            self._normalize_for_cache
+        )
+        self.product_index = startup.run(
+            "product_index", ProductIndex,
+            product_docs.result(), self.settings, self.faq_retriever.encode_documents, self.faq_retriever.encode_query
+        )
+        app_logger.info(f"Loaded {len(self.faq_docs)} FAQ documents and {len(self.product_docs)} product documents.")
+        self._update_lock = threading.Lock()
+        self.reranker = reranker.result()
+        self.llm_handler = llm_handler or llm.result()
+        self.token_counter = TokenCounter(self.settings.MODEL_TYPE, self.settings.TOKENIZER_FALLBACK_ENCODING)
+        self.prompt_packer = PromptPacker(self.settings, self.token_counter)
+        self.intent_classifier = startup.run(
+            "intent_classifier", IntentClassifier, self.settings, self.llm_handler, self.faq_retriever.encode_query
+        )
+        self.answer_cache = None
+        if self.settings.ANSWER_CACHE_ENABLED:
+            self.answer_cache = AnswerCache(
+                self.settings, self._normalize_for_cache, self.faq_retriever.encode_query, self._knowledge_version()
+            )
+
+    @property
+    def faq_docs(self) -> DocumentStore:
+        return self.faq_retriever.snapshot.documents
+
+    @property
+    def product_docs(self) -> DocumentStore:
+        return self.product_index.product_docs
+
+    def update_knowledge(self, faq_upserts: List[Dict] = None, faq_deletes: List[str] = None,
+                         product_upserts: List[Dict] = None, product_deletes: List[str] = None):
+        """
+        Adds, edits or deletes FAQ and product documents without a restart. Records use the CSV
+        column names; FAQs are matched by `id` and products by `sku`, so an upsert with an existing
+        key replaces that document. Queries already in flight finish on the previous indices.
+        """
+        with self._update_lock:
+            if faq_upserts or faq_deletes:
+                upserts = self.data_loader.documents_from_records("faq", faq_upserts or [])
+                self.faq_retriever.apply_updates(upserts, faq_deletes or [], key="id")
+            if product_upserts or product_deletes:
+                upserts = self.data_loader.documents_from_records("product", product_upserts or [])
+                self.product_index = self.product_index.updated(upserts, product_deletes or [], key="sku")
+                app_logger.info(f"Product index updated; now serving {len(self.product_docs)} products.")
+            self.refresh_answer_cache()
+
+    def _normalize_for_cache(self, query: str) -> str:
+        return normalize_query(self.s2t_converter.convert(query))
+
+    def _knowledge_version(self) -> str:
+        hasher = hashlib.sha256()
+        for content in itertools.chain(self.faq_docs.contents, self.product_docs.contents):
+            hasher.update(content.encode('utf-8'))
+        return hasher.hexdigest()
+
+    def refresh_answer_cache(self):
+        if self.answer_cache is None:
+            return
+        knowledge_version = self._knowledge_version()
+        if knowledge_version != self.answer_cache.knowledge_version:
+            app_logger.info(f"Knowledge base changed ({knowledge_version[:16]}). Invalidating {len(self.answer_cache)} cached answers.")
+            self.answer_cache.invalidate(knowledge_version)
+
+    def get_batching_stats(self) -> List[Dict]:
+        batchers = [self.faq_retriever.query_batcher, self.reranker.batcher]
+        return [batcher.stats() for batcher in batchers if batcher is not None]
+
+    def prometheus_metrics(self) -> str:
+        """Component statistics in Prometheus text format, to be served next to the tracer's stage latencies."""
+        rows = []
+        for stats in self.get_batching_stats():
+            stats = dict(stats)
+            labels = {"batcher": stats.pop("name")}
+            histogram = stats.pop("batch_size_histogram")
+            rows.append((labels, stats))
+            rows += [(dict(labels, size=str(size)), {"batches_by_size": count}) for size, count in histogram.items()]
+        return (
+            gauges_to_prometheus("jtcg_rag_micro_batch", rows)
+            + gauges_to_prometheus("jtcg_rag_reranker", [({}, self.reranker.stats())])
+        )
+
+    def clear_caches(self):
+        """Empties every per-query cache (answers, intents, embeddings, tokens, rerank scores)."""
+        self.faq_retriever.clear_query_caches()
+        self.reranker.clear_cache()
+        self.intent_classifier.clear_cache()
+        self._query_features_cache.clear()
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate()
+
+    def warmup(self, query: str = None):
+        """
+        Runs one query through every local stage (no LLM call) so lazy initialization, first-call
+        allocations and jieba's POS model happen before traffic arrives instead of on a user request.
+        """
+        query = query or self.settings.WARMUP_QUERY
+        app_logger.info(f"Warming up retrieval pipeline with query: '{query}'")
+        snapshot = self.faq_retriever.snapshot
+        bm25_result = self.faq_retriever.bm25_search(query, snapshot)
+        hybrid = self.faq_retriever.hybrid_search(query, bm25_result, snapshot)
+        self.reranker.rerank(query, snapshot.documents, hybrid.indices[:2])
+        self._get_product_samples(query)
+        self._normalized_query(query)
+        self._critical_keywords(query)
+        # Warm-up timings would skew the latency percentiles of real traffic.
+        tracer.reset()
+        app_logger.info("Warm-up complete.")
 
     def _extract_critical_keywords(self, query: str) -> List[str]:
         allowed_pos = {'n', 'nr', 'ns', 'nt', 'eng'}
@@ -35,99 +189,302 @@ class JTCG_RAG_Orchestrator:
         ]
         return list(dict.fromkeys(keywords)) 
 
+    def _query_feature(self, kind: str, query: str, compute):
+        # OpenCC conversion and POS tagging dominate the golden-ticket check, and queries repeat a lot.
+        return self._query_features_cache.get_or_compute((kind, query), lambda: compute(query))
+
+    def _normalized_query(self, query: str) -> str:
+        return self._query_feature("normalized", query, self._normalize_for_cache)
+
+    def _critical_keywords(self, query: str) -> Tuple[str, ...]:
+        # Only needed once BM25 clears the confidence threshold, so it is computed on demand.
+        return self._query_feature("keywords", query, lambda q: tuple(self._extract_critical_keywords(q)))
+
     def process_query(self, query: str) -> str:
         conversation_id = uuid.uuid4()
-        rag_log_extra = {'conv_id': conversation_id}
-        
-        app_logger.info(f"CONV_ID: {conversation_id} - Processing new query: '{query}'")
+        with tracer.trace(conversation_id):
+            app_logger.info(f"CONV_ID: {conversation_id} - Processing new query: '{query}'")
 
-        intent_result = self.llm_handler.classify_intent(query)
-        intent = intent_result.get("intent", "policy_inquiry")
-        rag_logger.debug(f"Classified intent: '{intent}'", extra=rag_log_extra)
+            cached = self._lookup_cached_answer(query, conversation_id)
+            if cached is not None:
+                return self._finish(conversation_id, query, cached.answer, cache_marker=cached.match_type)
+
+            intent, retrieval = self._classify_and_retrieve(query, conversation_id)
+
+            if intent == "handoff":
+                final_answer = self._handoff_answer(conversation_id)
+            else:
+                user_prompt = self._build_user_prompt(query, intent, retrieval, conversation_id)
+                raw_answer, usage = self.llm_handler.generate_response(self.system_prompt, user_prompt, conversation_id)
+                final_answer = self._to_traditional(raw_answer)
+                self._store_cached_answer(query, final_answer, usage)
+
+            return self._finish(conversation_id, query, final_answer)
+
+    async def aprocess_query(self, query: str) -> str:
+        conversation_id = uuid.uuid4()
+        with tracer.trace(conversation_id):
+            app_logger.info(f"CONV_ID: {conversation_id} - Processing new query: '{query}'")
+
+            cached = await asyncio.to_thread(self._lookup_cached_answer, query, conversation_id)
+            if cached is not None:
+                return self._finish(conversation_id, query, cached.answer, cache_marker=cached.match_type)
+
+            intent, retrieval = await self._aclassify_and_retrieve(query, conversation_id)
+
+            if intent == "handoff":
+                final_answer = self._handoff_answer(conversation_id)
+            else:
+                user_prompt = await asyncio.to_thread(self._build_user_prompt, query, intent, retrieval, conversation_id)
+                raw_answer, usage = await self.llm_handler.agenerate_response(self.system_prompt, user_prompt, conversation_id)
+                final_answer = self._to_traditional(raw_answer)
+                await asyncio.to_thread(self._store_cached_answer, query, final_answer, usage)
+
+            return self._finish(conversation_id, query, final_answer)
+
+    def process_query_stream(self, query: str) -> Iterator[str]:
+        conversation_id = uuid.uuid4()
+        with tracer.trace(conversation_id):
+            app_logger.info(f"CONV_ID: {conversation_id} - Processing new streaming query: '{query}'")
+
+            cached = self._lookup_cached_answer(query, conversation_id)
+            if cached is not None:
+                yield cached.answer
+                self._finish(conversation_id, query, cached.answer, cache_marker=cached.match_type)
+                return
+
+            intent, retrieval = self._classify_and_retrieve(query, conversation_id)
+
+            if intent == "handoff":
+                final_answer = self._handoff_answer(conversation_id)
+                yield final_answer
+            else:
+                user_prompt = self._build_user_prompt(query, intent, retrieval, conversation_id)
+                stream = self.llm_handler.stream_response(self.system_prompt, user_prompt, conversation_id)
+                converter = IncrementalConverter(self.s2t_converter)
+                parts = []
+                for delta in stream:
+                    converted = converter.feed(delta)
+                    if converted:
+                        parts.append(converted)
+                        yield converted
+                tail = converter.flush()
+                if tail:
+                    parts.append(tail)
+                    yield tail
+                final_answer = "".join(parts)
+                if not stream.failed:
+                    self._store_cached_answer(query, final_answer, stream.usage)
 
+            self._finish(conversation_id, query, final_answer)
+
+    def _to_traditional(self, raw_answer: str) -> str:
+        with tracer.span("opencc"):
+            return self.s2t_converter.convert(raw_answer) if raw_answer else raw_answer
+
+    def _classify(self, query: str, conversation_id: uuid.UUID) -> str:
+        with tracer.span("intent"):
+            intent_result = self.intent_classifier.classify(query)
+        return self._resolve_intent(intent_result, conversation_id)
+
+    async def _aclassify(self, query: str, conversation_id: uuid.UUID) -> str:
+        with tracer.span("intent"):
+            intent_result = await self.intent_classifier.aclassify(query)
+        return self._resolve_intent(intent_result, conversation_id)
+
+    def _intent_executor(self) -> ThreadPoolExecutor:
+        # Created per process: the threads of an executor created before fork() do not exist in the child.
+        with self._intent_pool_lock:
+            if self._intent_pool is None or self._intent_pool_pid != os.getpid():
+                self._intent_pool = ThreadPoolExecutor(self.settings.SPECULATIVE_INTENT_WORKERS, thread_name_prefix="intent")
+                self._intent_pool_pid = os.getpid()
+            return self._intent_pool
+
+    def _classify_and_retrieve(self, query: str, conversation_id: uuid.UUID) -> Tuple[str, Optional[FAQRetrieval]]:
+        """
+        Returns the intent and, unless it is a handoff, the FAQ retrieval. With SPECULATIVE_RETRIEVAL
+        the intent is classified on a helper thread while retrieval runs here, so the intent LLM
+        round trip overlaps BM25, FAISS and reranking; a handoff stops the retrieval at its next stage.
+        """
+        # Locally classified intents (cache, rules, centroids) are immediate; there is nothing to overlap.
+        if not self.settings.SPECULATIVE_RETRIEVAL or not self.intent_classifier.needs_llm(query):
+            intent = self._classify(query, conversation_id)
+            return intent, None if intent == "handoff" else self._retrieve_faqs(query, conversation_id)
+
+        cancelled = threading.Event()
+
+        def cancel_on_handoff(future: Future):
+            if future.exception() is None and future.result() == "handoff":
+                cancelled.set()
+
+        intent_future = self._intent_executor().submit(contextvars.copy_context().run, self._classify, query, conversation_id)
+        intent_future.add_done_callback(cancel_on_handoff)
+        retrieval = self._retrieve_faqs(query, conversation_id, cancelled)
+        intent = intent_future.result()
+        if intent == "handoff":
+            app_logger.info(f"CONV_ID: {conversation_id} - Discarding speculative retrieval for handoff.")
+            return intent, None
+        return intent, retrieval
+
+    async def _aclassify_and_retrieve(self, query: str, conversation_id: uuid.UUID) -> Tuple[str, Optional[FAQRetrieval]]:
+        if not self.settings.SPECULATIVE_RETRIEVAL or not await asyncio.to_thread(self.intent_classifier.needs_llm, query):
+            intent = await self._aclassify(query, conversation_id)
+            if intent == "handoff":
+                return intent, None
+            return intent, await asyncio.to_thread(self._retrieve_faqs, query, conversation_id)
+
+        cancelled = threading.Event()
+        retrieval = asyncio.create_task(asyncio.to_thread(self._retrieve_faqs, query, conversation_id, cancelled))
+        try:
+            intent = await self._aclassify(query, conversation_id)
+        except BaseException:
+            cancelled.set()
+            retrieval.cancel()
+            raise
         if intent == "handoff":
-            app_logger.info(f"CONV_ID: {conversation_id} - Handoff intent detected. Skipping RAG.")
-            final_answer = "已為您轉接真人客服，請稍候。"
+            cancelled.set()
+            retrieval.cancel()
+            app_logger.info(f"CONV_ID: {conversation_id} - Discarding speculative retrieval for handoff.")
+            return intent, None
+        return intent, await retrieval
+
+    def _resolve_intent(self, intent_result: Dict, conversation_id: uuid.UUID) -> str:
+        intent = intent_result.get("intent", "policy_inquiry")
+        rag_logger.debug(f"Classified intent: '{intent}' (source: {intent_result.get('source', 'llm')})", extra={'conv_id': conversation_id})
+        return intent
+
+    def _handoff_answer(self, conversation_id: uuid.UUID) -> str:
+        app_logger.info(f"CONV_ID: {conversation_id} - Handoff intent detected. Skipping RAG.")
+        return "已為您轉接真人客服，請稍候。"
+
+    def _lookup_cached_answer(self, query: str, conversation_id: uuid.UUID):
+        if self.answer_cache is None:
+            return None
+        with tracer.span("answer_cache"):
+            cached = self.answer_cache.lookup(query)
+        if cached is not None:
+            app_logger.info(f"CONV_ID: {conversation_id} - [CACHED:{cached.match_type}] Serving cached answer (similarity: {cached.similarity:.4f}).")
+        return cached
+
+    def _store_cached_answer(self, query: str, final_answer: str, usage):
+        # Only successful generations are cached; error messages come back with usage=None.
+        if self.answer_cache is not None and final_answer and usage is not None:
+            self.answer_cache.store(query, final_answer)
+
+    def _finish(self, conversation_id: uuid.UUID, query: str, final_answer: str, cache_marker: str = None) -> str:
+        log_conversation(conversation_id, query, final_answer, cache_marker=cache_marker)
+        app_logger.info(f"CONV_ID: {conversation_id} - Successfully processed query.")
+        return final_answer
+
+    def _retrieve_faqs(self, query: str, conversation_id: uuid.UUID, cancelled: threading.Event = None) -> Optional[FAQRetrieval]:
+        """
+        Golden-ticket check, then hybrid search and reranking. None of this depends on the intent,
+        so it can run speculatively; if `cancelled` gets set it stops between stages and returns None.
+        """
+        rag_log_extra = {'conv_id': conversation_id}
+        app_logger.info(f"CONV_ID: {conversation_id} - Executing Verified Golden Ticket RAG flow.")
+
+        # One snapshot for the whole request, so a concurrent knowledge update cannot mix indices.
+        snapshot = self.faq_retriever.snapshot
+        faq_docs = snapshot.documents
+
+        with tracer.span("exact_match"):
+            exact_position = snapshot.exact.lookup(self._normalized_query(query))
+        if exact_position is not None:
+            app_logger.info(f"CONV_ID: {conversation_id} - Query matches the question of FAQ #{exact_position} exactly. Skipping retrieval.")
+            return FAQRetrieval([faq_docs[exact_position]], 1.0)
+
+        bm25_result = self.faq_retriever.bm25_search(query, snapshot)
+        top_bm25_index = bm25_result.top_index
+        top_bm25_score = bm25_result.top_score
+
+        rag_logger.debug(f"Top BM25 candidate index: {top_bm25_index}, Score: {top_bm25_score:.4f}", extra=rag_log_extra)
+
+        if top_bm25_score > self.settings.BM25_CONFIDENCE_THRESHOLD:
+            with tracer.span("golden_ticket"):
+                critical_keywords = list(self._critical_keywords(query))
+                verified = snapshot.exact.contains_all(top_bm25_index, critical_keywords)
+            rag_logger.debug(f"Extracted critical keywords for verification: {critical_keywords}", extra=rag_log_extra)
+
+            if verified:
+                app_logger.info(f"CONV_ID: {conversation_id} - Verified Golden Ticket MATCH! BM25 score ({top_bm25_score:.4f}) is above threshold AND all keywords found.")
+                return FAQRetrieval([faq_docs[top_bm25_index]], 1.0)
+
+        if cancelled is not None and cancelled.is_set():
+            return None
+        app_logger.info(f"CONV_ID: {conversation_id} - No Golden Ticket. Proceeding with full hybrid search and reranking.")
+        hybrid = self.faq_retriever.hybrid_search(query, bm25_result, snapshot)
+        if cancelled is not None and cancelled.is_set():
+            return None
+        final_candidate_indices = list(dict.fromkeys([top_bm25_index] + hybrid.indices))
+        ranked = self.reranker.rerank(query, faq_docs, final_candidate_indices, hybrid)
+        if ranked and ranked[0].source == "cascade":
+            app_logger.info(f"CONV_ID: {conversation_id} - BM25 and dense retrieval agree decisively; cross-encoder skipped.")
+        return FAQRetrieval([result.document for result in ranked], ranked[0].score if ranked else 0)
+
+    def _build_user_prompt(self, query: str, intent: str, retrieval: FAQRetrieval, conversation_id: uuid.UUID) -> str:
+        rag_log_extra = {'conv_id': conversation_id}
+        faq_results, top_score = retrieval
+        if faq_results:
+            rag_logger.debug(f"Reranked Top-{len(faq_results)} FAQ(s). Top score: {top_score:.4f}", extra=rag_log_extra)
+            rag_logger.debug(f"Top reranked doc content: {faq_results[0]['content'][:200]}...", extra=rag_log_extra)
         else:
-            app_logger.info(f"CONV_ID: {conversation_id} - Executing Verified Golden Ticket RAG flow.")
-
-            tokenized_query_for_bm25 = list(jieba.cut_for_search(query))
-            bm25_scores = self.faq_retriever.bm25.get_scores(tokenized_query_for_bm25)
-            
-            top_bm25_index = np.argmax(bm25_scores)
-            top_bm25_score = bm25_scores[top_bm25_index]
-            
-            rag_logger.debug(f"Top BM25 candidate index: {top_bm25_index}, Score: {top_bm25_score:.4f}", extra=rag_log_extra)
-            
-            golden_ticket_doc = None
-            
-            if top_bm25_score > self.settings.BM25_CONFIDENCE_THRESHOLD:
-                critical_keywords = self._extract_critical_keywords(query)
-                rag_logger.debug(f"Extracted critical keywords for verification: {critical_keywords}", extra=rag_log_extra)
-                
-                top_doc_content = self.faq_docs[top_bm25_index]['content'].lower()
-
-                if critical_keywords and all(keyword in top_doc_content for keyword in critical_keywords):
-                    app_logger.info(f"CONV_ID: {conversation_id} - Verified Golden Ticket MATCH! BM25 score ({top_bm25_score:.4f}) is above threshold AND all keywords found.")
-                    golden_ticket_doc = self.faq_docs[top_bm25_index]
-                    top_score = 1.0 
-                    faq_results = [golden_ticket_doc]
-            
-            if golden_ticket_doc is None:
-                app_logger.info(f"CONV_ID: {conversation_id} - No Golden Ticket. Proceeding with full hybrid search and reranking.")
-                hybrid_indices = self.faq_retriever.search(query)
-                final_candidate_indices = list(dict.fromkeys([top_bm25_index] + hybrid_indices))
-                faq_results = self.reranker.rerank(query, self.faq_docs, final_candidate_indices)
-                top_score = faq_results[0].get('rerank_score', 0) if faq_results else 0
-
-            if faq_results:
-                rag_logger.debug(f"Reranked Top-{len(faq_results)} FAQ(s). Top score: {top_score:.4f}", extra=rag_log_extra)
-                rag_logger.debug(f"Top reranked doc content: {faq_results[0]['content'][:200]}...", extra=rag_log_extra)
-            else:
-                rag_logger.debug("No relevant FAQs found after reranking.", extra=rag_log_extra)
-            
-            if top_score >= self.settings.FAQ_CONFIDENCE_THRESHOLD:
-                app_logger.info(f"CONV_ID: {conversation_id} - High confidence path triggered. Top score: {top_score:.4f}")
-                user_prompt = self._build_direct_prompt(query, faq_results)
+            rag_logger.debug("No relevant FAQs found after reranking.", extra=rag_log_extra)
+
+        if top_score >= self.settings.FAQ_CONFIDENCE_THRESHOLD:
+            app_logger.info(f"CONV_ID: {conversation_id} - High confidence path triggered. Top score: {top_score:.4f}")
+            with tracer.span("prompt_build"):
+                user_prompt = self._build_direct_prompt(query, faq_results, conversation_id)
+            if self.settings.RAG_LOG_PROMPTS:
                 rag_logger.debug(f"Final User Prompt (Direct):\n{user_prompt}", extra=rag_log_extra)
-            else:
-                app_logger.info(f"CONV_ID: {conversation_id} - Low confidence path triggered. Top score: {top_score:.4f}")
+        else:
+            app_logger.info(f"CONV_ID: {conversation_id} - Low confidence path triggered. Top score: {top_score:.4f}")
+            with tracer.span("prompt_build"):
                 if intent == "product_inquiry":
-                    user_prompt = self._build_product_fallback_prompt(query)
+                    user_prompt = self._build_product_fallback_prompt(query, conversation_id)
                 else: 
                     user_prompt = self._build_generic_fallback_prompt(query)
+            if self.settings.RAG_LOG_PROMPTS:
                 rag_logger.debug(f"Final User Prompt (Fallback):\n{user_prompt}", extra=rag_log_extra)
 
-            raw_answer, _ = self.llm_handler.generate_response(self.system_prompt, user_prompt, conversation_id)
-            final_answer = self.s2t_converter.convert(raw_answer) if raw_answer else raw_answer
+        return user_prompt
 
-        log_conversation(conversation_id, query, final_answer)
-        app_logger.info(f"CONV_ID: {conversation_id} - Successfully processed query.")
+    def _get_product_samples(self, query: str) -> List[Dict]:
+        return self.product_index.search(query, self.settings.PRODUCT_TOP_K)
         
-        return final_answer
+    def _pack_context(self, docs: List[Dict], wrappers: List[str], label: str, conversation_id: uuid.UUID = None) -> List[Tuple[Dict, str]]:
+        # `wrappers` are the formatted sections without their content, to account for their tokens.
+        packed = self.prompt_packer.pack(
+            [doc['content'] for doc in docs], [self.token_counter.count(wrapper) for wrapper in wrappers], label
+        )
+        rag_logger.debug(
+            f"Packed {len(packed.items)}/{len(docs)} {label} into {packed.tokens} tokens "
+            f"(budget: {self.settings.PROMPT_CONTEXT_TOKEN_BUDGET}, truncated: {packed.truncated}, dropped: {packed.dropped}).",
+            extra={'conv_id': conversation_id}
+        )
+        return [(docs[position], content) for position, content in packed.items]
 
-    def _get_product_samples(self, count=3) -> List[Dict]:
-        return random.sample(self.product_docs, min(count, len(self.product_docs)))
-        
-    def _build_direct_prompt(self, query: str, context_docs: List[Dict]) -> str:
-        context = ""
-        for i, doc in enumerate(context_docs):
-            metadata = doc['metadata']
-            context += f"--- 參考資料 {i+1} ---\n"
-            context += f"內容: {doc['content']}\n"
-            if metadata.get('url'):
-                context += f"參考連結: {metadata['url']}\n"
-            context += "-----------------\n\n"
+    def _build_direct_prompt(self, query: str, context_docs: List[Dict], conversation_id: uuid.UUID = None) -> str:
+        def section(i: int, doc: Dict, content: str) -> str:
+            text = f"--- 參考資料 {i+1} ---\n"
+            text += f"內容: {content}\n"
+            if doc['metadata'].get('url'):
+                text += f"參考連結: {doc['metadata']['url']}\n"
+            return text + "-----------------\n\n"
+
+        wrappers = [section(i, doc, "") for i, doc in enumerate(context_docs)]
+        packed = self._pack_context(context_docs, wrappers, "參考資料", conversation_id)
+        context = "".join(section(i, doc, content) for i, (doc, content) in enumerate(packed))
         return f"情境模式: 直接回答模式\n\n[參考資料]\n{context}\n\n[提問]\n{query}"
         
-    def _build_product_fallback_prompt(self, query: str) -> str:
-        product_samples = self._get_product_samples()
-        context = ""
-        for i, doc in enumerate(product_samples):
-            context += f"--- 產品範例 {i+1} ---\n"
-            context += f"{doc['content']}\n"
-            context += f"參考連結: {doc['metadata']['url']}\n"
-            context += "-----------------\n\n"
+    def _build_product_fallback_prompt(self, query: str, conversation_id: uuid.UUID = None) -> str:
+        def section(i: int, doc: Dict, content: str) -> str:
+            return f"--- 產品範例 {i+1} ---\n{content}\n參考連結: {doc['metadata']['url']}\n-----------------\n\n"
+
+        product_samples = self._get_product_samples(query)
+        wrappers = [section(i, doc, "") for i, doc in enumerate(product_samples)]
+        packed = self._pack_context(product_samples, wrappers, "產品範例", conversation_id)
+        context = "".join(section(i, doc, content) for i, (doc, content) in enumerate(packed))
         return f"情境模式: 購物引導模式\n\n使用者的原始問題是：「{query}」。\n由於在 FAQ 中找不到直接答案，請根據以下「產品範例」，生成一段友善的回應，向使用者介紹我們產品的大致方向，並引導他們提供更具體的需求。\n\n[產品範例]\n{context}"
         
     def _build_generic_fallback_prompt(self, query: str) -> str:
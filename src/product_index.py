@@ -0,0 +1,136 @@
+import re
+import numpy as np
+from typing import Callable, Dict, List, NamedTuple, Optional
+from config import Settings
+from src.document_store import DocumentStore
+from src.utils.logger import app_logger
+
+_SIZE_RE = re.compile(r"(\d{2}(?:\.\d)?)\s*(?:吋|寸|inch|in\b|\"|”)", re.IGNORECASE)
+_VESA_PAIR_RE = re.compile(r"(\d{2,3})\s*[x×*]\s*(\d{2,3})", re.IGNORECASE)
+_VESA_SINGLE_RE = re.compile(r"vesa\s*(\d{2,3})(?!\s*[x×*\d])", re.IGNORECASE)
+
+# Query keywords mapped to substrings of the `specs/arm_type` column.
+ARM_TYPE_KEYWORDS = {
+    "dual": ("雙螢幕", "雙臂", "双屏", "双臂", "dual"),
+    "single": ("單臂", "单臂", "single"),
+    "wall": ("壁掛", "壁挂", "wall"),
+    "heavy": ("重載", "重载", "超寬", "超宽", "ultrawide", "heavy"),
+    "accessory": ("筆電", "笔电", "laptop", "走線", "走线", "cable", "配件", "accessor"),
+}
+
+
+class ProductFilters(NamedTuple):
+    min_size_inch: Optional[float]
+    vesa: Optional[str]
+    arm_types: List[str]
+
+
+class ProductIndex:
+    """
+    Columnar index over product attributes (max screen size, VESA patterns, arm type)
+    for vectorized filtering, combined with embedding similarity over the product text.
+    """
+
+    def __init__(self, product_docs: DocumentStore, settings: Settings, encode_documents: Callable[[List[str]], np.ndarray], encode_query: Callable[[str], np.ndarray],
+                 embeddings: Optional[np.ndarray] = None):
+        self.product_docs = product_docs
+        self.settings = settings
+        self.encode_documents = encode_documents
+        self.encode_query = encode_query
+
+        self.size_max_inch = np.array(
+            [size if size is not None else np.nan for size in product_docs.column('size_max_inch')], dtype=np.float32
+        )
+        arm_types = [(arm_type or "").lower() for arm_type in product_docs.column('arm_type')]
+        self.arm_type_categories = sorted(set(arm_types))
+        category_codes = {value: code for code, value in enumerate(self.arm_type_categories)}
+        self.arm_type_codes = np.array([category_codes[t] for t in arm_types], dtype=np.int32)
+        self.vesa_vocabulary: Dict[str, int] = {}
+        vesa_patterns = product_docs.column('vesa')
+        for patterns in vesa_patterns:
+            for pattern in patterns:
+                self.vesa_vocabulary.setdefault(self._normalize_vesa(pattern), len(self.vesa_vocabulary))
+        self.vesa_support = np.zeros((len(product_docs), len(self.vesa_vocabulary)), dtype=bool)
+        for i, patterns in enumerate(vesa_patterns):
+            for pattern in patterns:
+                self.vesa_support[i, self.vesa_vocabulary[self._normalize_vesa(pattern)]] = True
+
+        if embeddings is not None:
+            self.embeddings = embeddings
+        elif product_docs:
+            self.embeddings = np.asarray(encode_documents(product_docs.contents), dtype=np.float32)
+        else:
+            self.embeddings = np.zeros((0, 0), dtype=np.float32)
+        app_logger.info(f"ProductIndex built for {len(product_docs)} products ({len(self.vesa_vocabulary)} VESA patterns).")
+
+    @staticmethod
+    def _normalize_vesa(pattern: str) -> str:
+        return re.sub(r"\s*[x×*]\s*", "x", str(pattern).strip().lower())
+
+    def parse_filters(self, query: str) -> ProductFilters:
+        size_match = _SIZE_RE.search(query)
+        min_size = float(size_match.group(1)) if size_match else None
+
+        vesa = None
+        pair_match = _VESA_PAIR_RE.search(query)
+        if pair_match:
+            vesa = f"{pair_match.group(1)}x{pair_match.group(2)}"
+        else:
+            single_match = _VESA_SINGLE_RE.search(query)
+            if single_match:
+                vesa = f"{single_match.group(1)}x{single_match.group(1)}"
+
+        lowered = query.lower()
+        arm_types = [arm_type for arm_type, keywords in ARM_TYPE_KEYWORDS.items() if any(k in lowered for k in keywords)]
+        return ProductFilters(min_size, vesa, arm_types)
+
+    def _filter_mask(self, filters: ProductFilters) -> np.ndarray:
+        mask = np.ones(len(self.product_docs), dtype=bool)
+        if filters.min_size_inch is not None:
+            mask &= self.size_max_inch >= filters.min_size_inch
+        if filters.vesa is not None:
+            column = self.vesa_vocabulary.get(filters.vesa)
+            if column is None:
+                mask[:] = False
+            else:
+                mask &= self.vesa_support[:, column]
+        if filters.arm_types:
+            matching_codes = [
+                code for code, value in enumerate(self.arm_type_categories)
+                if any(arm_type in value for arm_type in filters.arm_types)
+            ]
+            mask &= np.isin(self.arm_type_codes, matching_codes)
+        return mask
+
+    def search(self, query: str, top_k: int) -> List[Dict]:
+        if not self.product_docs:
+            return []
+        filters = self.parse_filters(query)
+        mask = self._filter_mask(filters)
+        if not mask.any():
+            app_logger.info(f"No product satisfies filters {filters}; ranking all products by similarity.")
+            mask[:] = True
+
+        candidates = np.flatnonzero(mask)
+        query_embedding = np.asarray(self.encode_query(query), dtype=np.float32).reshape(-1)
+        scores = self.embeddings[candidates] @ query_embedding
+        top_k = min(top_k, len(candidates))
+        top = np.argpartition(-scores, top_k - 1)[:top_k] if top_k < len(candidates) else np.arange(len(candidates))
+        ranked = candidates[top[np.argsort(-scores[top])]]
+        return [self.product_docs[i] for i in ranked]
+
+    def updated(self, upserts: DocumentStore, deletes: List[str] = (), key: str = "sku") -> "ProductIndex":
+        """
+        Returns a new index with `upserts` added or replacing products with the same `key`, and
+        `deletes` removed. Embeddings of unchanged products are reused; only upserts are encoded.
+        """
+        replaced = set(deletes) | set(upserts.column(key))
+        keep = np.flatnonzero([value not in replaced for value in self.product_docs.column(key)])
+        documents = self.product_docs.take(keep.tolist())
+        documents.extend(upserts)
+
+        parts = [self.embeddings[keep]] if len(keep) else []
+        if len(upserts):
+            parts.append(np.asarray(self.encode_documents(upserts.contents), dtype=np.float32))
+        embeddings = np.vstack(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+        return ProductIndex(documents, self.settings, self.encode_documents, self.encode_query, embeddings=embeddings)
@@ -0,0 +1,78 @@
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+from config import Settings
+from src.utils.tokens import TokenCounter
+
+
+class PackedContext(NamedTuple):
+    items: List[Tuple[int, str]]  # (position in the input, packed text)
+    tokens: int
+    truncated: int
+    dropped: int
+
+
+class PromptPacker:
+    """
+    Fits retrieved documents into a token budget for the prompt context. Documents are taken in
+    the given (rerank) order; an exact duplicate is skipped, and a line already sent with an
+    earlier document (shared boilerplate) is replaced by a short back-reference. The first
+    document that does not fit is cut at a sentence boundary if enough budget is left for a
+    useful excerpt, and everything after it is dropped. The top-ranked document is cut mid-sentence
+    rather than dropped when not even its first sentence fits.
+    """
+
+    def __init__(self, settings: Settings, token_counter: TokenCounter):
+        self.settings = settings
+        self.token_counter = token_counter
+
+    def _dedupe_lines(self, text: str, seen_lines: Dict[str, int], label: str) -> Tuple[str, List[str]]:
+        """
+        Replaces lines already sent with an earlier document by a back-reference. Returns the text
+        and the boilerplate-sized lines it introduces; a line repeated within this document stays.
+        """
+        lines, new_lines = [], []
+        for line in text.split("\n"):
+            key = line.strip()
+            if len(key) < self.settings.PROMPT_BOILERPLATE_MIN_CHARS:
+                lines.append(line)
+            elif key in seen_lines:
+                lines.append(f"（同{label} {seen_lines[key]}）")
+            else:
+                new_lines.append(key)
+                lines.append(line)
+        return "\n".join(lines), new_lines
+
+    def pack(self, texts: Sequence[str], overheads: Sequence[int] = None, label: str = "參考資料", budget: int = None) -> PackedContext:
+        """
+        `overheads[i]` is the token cost of the formatting wrapped around `texts[i]`; `label` is how
+        the prompt numbers the documents, used in back-references to repeated lines.
+        """
+        remaining = self.settings.PROMPT_CONTEXT_TOKEN_BUDGET if budget is None else budget
+        overheads = overheads or [0] * len(texts)
+        items: List[Tuple[int, str]] = []
+        seen_texts, seen_lines = set(), {}
+        used = truncated = 0
+        for position, (text, overhead) in enumerate(zip(texts, overheads)):
+            if text in seen_texts:
+                continue
+            seen_texts.add(text)
+            packed, new_lines = self._dedupe_lines(text, seen_lines, label)
+            tokens = self.token_counter.count(packed) + overhead
+            if tokens > remaining:
+                room = remaining - overhead
+                excerpt = self.token_counter.truncate(packed, room) if room >= self.settings.PROMPT_MIN_EXCERPT_TOKENS else ""
+                if not excerpt and not items:
+                    # Without the top-ranked document the prompt would carry no context at all.
+                    excerpt = self.token_counter.truncate_tokens(packed, room)
+                packed = excerpt
+                if not packed:
+                    break
+                tokens = self.token_counter.count(packed) + overhead
+                truncated += 1
+            items.append((position, packed))
+            for line in new_lines:
+                seen_lines.setdefault(line, len(items))
+            remaining -= tokens
+            used += tokens
+            if truncated:
+                break
+        return PackedContext(items, used, truncated, len(set(texts)) - len(items))
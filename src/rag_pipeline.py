@@ -1,42 +1,178 @@
 import numpy as np
-import faiss
 import jieba 
-import os
-from typing import List, Dict, Tuple
-from sentence_transformers import SentenceTransformer, CrossEncoder
-from rank_bm25 import BM25Okapi
+import threading
+from typing import Any, Callable, Iterable, List, Dict, NamedTuple, Optional, Sequence, Tuple, Union
 from config import Settings
+from src.batching import MicroBatcher
+from src.bm25_index import BM25Result, SparseBM25
+from src.document_store import DocumentStore
+from src.exact_match_index import ExactMatchIndex, load_question_variants
+from src.index_cache import IndexCache
+from src.vector_index import build_index, configure_search, copy_index, remove_ids
 from src.utils.logger import app_logger
+from src.utils.lru import LRUCache
+from src.utils.text import load_jieba, normalize_query
+from src.utils.tracing import tracer
+
+class RetrievalSnapshot(NamedTuple):
+    """
+    Immutable view of the FAQ indices. Row i of the BM25 matrix and `documents[i]` describe the
+    same document, whose FAISS id is `doc_ids[i]`; ids only ever grow, so `doc_ids` stays sorted.
+    """
+    documents: DocumentStore
+    doc_ids: np.ndarray
+    bm25: SparseBM25
+    faiss_index: Any
+    exact: ExactMatchIndex
+
+    def positions(self, ids: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.doc_ids, ids)
+
+
+class HybridResult(NamedTuple):
+    indices: List[int]
+    bm25: BM25Result
+    dense_top: int
+
+
+def load_embedding_model(settings: Settings):
+    # sentence_transformers (and with it torch) is imported on first use, not when this module is imported.
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(settings.EMBEDDING_MODEL_PATH, device=settings.DEVICE)
+
 
 class HybridRetriever:
-    def __init__(self, documents: List[Dict], settings: Settings):
-        self.documents = documents
+    def __init__(self, documents: Union[DocumentStore, Iterable[DocumentStore]], settings: Settings, embedding_model=None,
+                 normalize_query: Callable[[str], str] = normalize_query):
+        # `documents` may also be an iterator of chunks (e.g. DataLoader.iter_knowledge_base()),
+        # in which case each chunk is tokenized and encoded as soon as it has been parsed.
+        # `normalize_query` builds the exact-match keys and must match how callers normalize queries.
+        if isinstance(documents, DocumentStore):
+            store = documents
+            chunks = [documents]
+        else:
+            store = DocumentStore("faq")
+            chunks = documents
         self.settings = settings
-        self.corpus = [doc['content'] for doc in documents]
         
         app_logger.info("Initializing Jieba for Chinese tokenization...")
-        jieba.set_dictionary(os.path.join(settings.PROJECT_ROOT,'src','dict.txt.big'))
-        jieba.initialize()
+        load_jieba(self.settings.JIEBA_DICT_PATH, self.settings.JIEBA_CACHE_DIR)
 
-        self.embedding_model = SentenceTransformer(self.settings.EMBEDDING_MODEL_PATH, device=self.settings.DEVICE)
-        self.bm25 = None
-        self.faiss_index = None
-        self._build_indices()
+        self.embedding_model = embedding_model if embedding_model is not None else load_embedding_model(self.settings)
+        self.query_batcher = None
+        if self.settings.MICRO_BATCH_ENABLED:
+            self.query_batcher = MicroBatcher(
+                "query-encoder", self._encode_queries,
+                self.settings.MICRO_BATCH_MAX_SIZE, self.settings.MICRO_BATCH_WINDOW_MS
+            )
+        self._query_embedding_cache = LRUCache(self.settings.QUERY_EMBEDDING_CACHE_SIZE)
+        self._query_token_cache = LRUCache(self.settings.QUERY_TOKEN_CACHE_SIZE)
+        self.question_variants = load_question_variants(self.settings.FAQ_QUESTION_VARIANTS_PATH)
+        self.normalize_query = normalize_query
+        self._update_lock = threading.Lock()
+        self.index_cache = IndexCache(self.settings) if self.settings.INDEX_CACHE_ENABLED else None
+        self.snapshot: RetrievalSnapshot = self._build_indices(store, chunks)
+        self._next_doc_id = len(store)
 
-    def _build_indices(self):
-        app_logger.info(f"Building BM25 and FAISS indices for {len(self.corpus)} documents...")
-        
-        app_logger.info("Tokenizing corpus with Jieba for BM25...")
-        tokenized_corpus = [list(jieba.cut_for_search(doc)) for doc in self.corpus]
-        self.bm25 = BM25Okapi(tokenized_corpus)
-        # ------------------------------------
-        
-        app_logger.info("Encoding documents for FAISS index...")
-        embeddings = self.embedding_model.encode(self.corpus, show_progress_bar=True, normalize_embeddings=True)
-        dimension = embeddings.shape[1]
-        self.faiss_index = faiss.IndexFlatIP(dimension)
-        self.faiss_index.add(embeddings.astype(np.float32))
-        app_logger.info("Indices built successfully.")
+    @property
+    def documents(self) -> DocumentStore:
+        return self.snapshot.documents
+
+    @property
+    def bm25(self) -> SparseBM25:
+        return self.snapshot.bm25
+
+    @property
+    def faiss_index(self):
+        return self.snapshot.faiss_index
+
+    @staticmethod
+    def _collect(store: DocumentStore, chunks: Iterable[DocumentStore]) -> Iterable[DocumentStore]:
+        for chunk in chunks:
+            if chunk is not store:
+                store.extend(chunk)
+            yield chunk
+
+    def _build_indices(self, store: DocumentStore, chunks: Iterable[DocumentStore]) -> RetrievalSnapshot:
+        if self.index_cache is not None and self.index_cache.is_valid():
+            # The cache key covers the source CSVs, so parsing is all that is left to do.
+            for _ in self._collect(store, chunks):
+                pass
+            chunks = [store]
+            if self.index_cache.is_valid(len(store)):
+                try:
+                    artifacts = self.index_cache.load()
+                    faiss_index = configure_search(artifacts["faiss_index"], self.settings)
+                    app_logger.info(f"Indices for {len(store)} documents loaded from cache (key: {self.index_cache.key[:16]}).")
+                    return RetrievalSnapshot(
+                        store, np.arange(len(store), dtype=np.int64), artifacts["bm25"], faiss_index,
+                        ExactMatchIndex(store, self.question_variants, self.normalize_query)
+                    )
+                except Exception as e:
+                    app_logger.warning(f"Failed to load index cache from {self.index_cache.path}: {e}. Rebuilding indices.")
+
+        app_logger.info("Building BM25 and FAISS indices (tokenizing with Jieba and encoding documents chunk by chunk)...")
+        tokenized_corpus = []
+        embedding_chunks = []
+        for chunk in self._collect(store, chunks):
+            if not chunk.contents:
+                continue
+            tokenized_corpus.extend(self._tokenize_documents(chunk.contents))
+            embedding_chunks.append(self.encode_documents(chunk.contents))
+            app_logger.info(f"Processed {len(tokenized_corpus)} documents...")
+        bm25 = SparseBM25().fit(tokenized_corpus)
+
+        embeddings = np.vstack(embedding_chunks).astype(np.float32)
+        doc_ids = np.arange(len(store), dtype=np.int64)
+        faiss_index = build_index(embeddings, doc_ids, self.settings)
+        app_logger.info(f"Indices for {len(store)} documents built successfully.")
+
+        if self.index_cache is not None:
+            try:
+                self.index_cache.save(bm25, faiss_index)
+            except OSError as e:
+                app_logger.warning(f"Failed to write index cache to {self.index_cache.path}: {e}")
+        return RetrievalSnapshot(store, doc_ids, bm25, faiss_index, ExactMatchIndex(store, self.question_variants, self.normalize_query))
+
+    @staticmethod
+    def _tokenize_documents(contents: List[str]) -> List[List[str]]:
+        return [list(jieba.cut_for_search(doc)) for doc in contents]
+
+    def apply_updates(self, upserts: DocumentStore = None, deletes: List[str] = (), key: str = "id") -> RetrievalSnapshot:
+        """
+        Adds, replaces (same `key` metadata value) or deletes FAQ documents. Only the upserted
+        documents are tokenized and embedded; the new indices are built beside the current ones
+        and published with a single reference swap, so in-flight queries keep their snapshot.
+        """
+        with self._update_lock:
+            current = self.snapshot
+            if upserts is None:
+                upserts = DocumentStore(current.documents.source, [], {name: [] for name in current.documents.metadata_columns})
+            replaced = set(deletes) | set(upserts.column(key))
+            keep = np.array([value not in replaced for value in current.documents.column(key)], dtype=bool)
+
+            added_ids = np.arange(self._next_doc_id, self._next_doc_id + len(upserts), dtype=np.int64)
+            documents = current.documents.take(np.flatnonzero(keep).tolist())
+            documents.extend(upserts)
+            bm25 = current.bm25.updated(keep, self._tokenize_documents(upserts.contents))
+
+            faiss_index = configure_search(copy_index(current.faiss_index), self.settings)
+            removed_ids = current.doc_ids[~keep]
+            if len(removed_ids):
+                faiss_index = remove_ids(faiss_index, removed_ids, self.settings)
+            if len(upserts):
+                faiss_index.add_with_ids(np.asarray(self.encode_documents(upserts.contents), dtype=np.float32), added_ids)
+
+            snapshot = RetrievalSnapshot(
+                documents, np.concatenate([current.doc_ids[keep], added_ids]), bm25, faiss_index,
+                ExactMatchIndex(documents, self.question_variants, self.normalize_query)
+            )
+            self.snapshot = snapshot
+            self._next_doc_id += len(upserts)
+        app_logger.info(
+            f"FAQ indices updated: {len(removed_ids)} removed, {len(upserts)} added; now serving {len(documents)} documents."
+        )
+        return snapshot
 
     def _reciprocal_rank_fusion(self, results: List[List[Tuple[int, float]]], k=60) -> Dict[int, float]:
         fused_scores = {}
@@ -49,44 +185,174 @@ class HybridRetriever:
         reranked_results = {k: v for k, v in sorted(fused_scores.items(), key=lambda item: item[1], reverse=True)}
         return reranked_results
 
-    def search(self, query: str) -> List[int]:
-        tokenized_query = list(jieba.cut_for_search(query))
-        
-        bm25_scores = self.bm25.get_scores(tokenized_query)
-        bm25_results = sorted(
-            [(i, score) for i, score in enumerate(bm25_scores)], 
-            key=lambda x: x[1], 
-            reverse=True
-        )[:self.settings.HYBRID_SEARCH_TOP_K]
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        return self.embedding_model.encode(queries, normalize_embeddings=True, show_progress_bar=False)
+
+    def encode_documents(self, texts: List[str]) -> np.ndarray:
+        return self.embedding_model.encode(texts, normalize_embeddings=True, show_progress_bar=False)
+
+    def encode_query(self, query: str) -> np.ndarray:
+        if self.query_batcher is not None:
+            return self._query_embedding_cache.get_or_compute(query, lambda: self.query_batcher([query]))
+        return self._query_embedding_cache.get_or_compute(query, lambda: self._encode_queries([query]))
+
+    def tokenize_query(self, query: str) -> List[str]:
+        return self._query_token_cache.get_or_compute(query, lambda: list(jieba.cut_for_search(query)))
+
+    def clear_query_caches(self):
+        self._query_embedding_cache.clear()
+        self._query_token_cache.clear()
+
+    def bm25_search(self, query: str, snapshot: RetrievalSnapshot = None) -> BM25Result:
+        if snapshot is None:
+            snapshot = self.snapshot
+        with tracer.span("jieba"):
+            tokenized_query = self.tokenize_query(query)
+        with tracer.span("bm25"):
+            return snapshot.bm25.search(tokenized_query, self.settings.HYBRID_SEARCH_TOP_K)
 
-        query_embedding = self.embedding_model.encode([query], normalize_embeddings=True)
-        scores, indices = self.faiss_index.search(query_embedding.astype(np.float32), self.settings.HYBRID_SEARCH_TOP_K)
-        faiss_results = list(zip(indices[0], scores[0]))
+    def search(self, query: str, bm25_result: BM25Result = None, snapshot: RetrievalSnapshot = None) -> List[int]:
+        """Returns positions in `snapshot.documents`; pass the same snapshot used for `bm25_search`."""
+        return self.hybrid_search(query, bm25_result, snapshot).indices
+
+    def hybrid_search(self, query: str, bm25_result: BM25Result = None, snapshot: RetrievalSnapshot = None) -> "HybridResult":
+        if snapshot is None:
+            snapshot = self.snapshot
+        if bm25_result is None:
+            bm25_result = self.bm25_search(query, snapshot)
+        bm25_results = bm25_result.as_pairs()
+
+        with tracer.span("embedding"):
+            query_embedding = self.encode_query(query)
+        with tracer.span("faiss"):
+            scores, ids = snapshot.faiss_index.search(query_embedding.astype(np.float32), self.settings.HYBRID_SEARCH_TOP_K)
+        found = ids[0] >= 0
+        faiss_results = list(zip(snapshot.positions(ids[0][found]).tolist(), scores[0][found].tolist()))
 
         fused_results = self._reciprocal_rank_fusion([bm25_results, faiss_results])
         
         final_indices = list(fused_results.keys())
-        return final_indices[:self.settings.HYBRID_SEARCH_TOP_K]
+        dense_top = faiss_results[0][0] if faiss_results else -1
+        return HybridResult(final_indices[:self.settings.HYBRID_SEARCH_TOP_K], bm25_result, dense_top)
+
+
+class RerankResult(NamedTuple):
+    """Per-request ranking entry; shared document dicts are never annotated in place."""
+    index: int
+    document: Dict
+    score: float
+    source: str  # "model", "cache" or "cascade"
 
 
 class Reranker:
     def __init__(self, settings: Settings):
         self.settings = settings
-        self.model = CrossEncoder(self.settings.RERANKER_MODEL_NAME, device=self.settings.DEVICE)
-        app_logger.info(f"Reranker model '{self.settings.RERANKER_MODEL_NAME}' loaded on device '{self.settings.DEVICE}'.")
-    
-    def rerank(self, query: str, documents: List[Dict], original_indices: List[int]) -> List[Dict]:
-        pairs = [[query, documents[i]['content']] for i in original_indices]
-        if not pairs:
+        self.model = self._load_model()
+        self.batcher = None
+        if self.settings.MICRO_BATCH_ENABLED:
+            self.batcher = MicroBatcher(
+                "reranker", self._predict,
+                self.settings.MICRO_BATCH_MAX_SIZE, self.settings.MICRO_BATCH_WINDOW_MS
+            )
+        self._score_cache = LRUCache(self.settings.RERANK_CACHE_SIZE)
+        self._stats_lock = threading.Lock()
+        self._stats = {"pairs": 0, "cache_hits": 0, "cascade_skips": 0}
+        app_logger.info(
+            f"Reranker model '{self.settings.RERANKER_MODEL_NAME}' loaded on device '{self.settings.DEVICE}' "
+            f"(backend: {self.settings.RERANKER_BACKEND})."
+        )
+
+    def _load_model(self):
+        from sentence_transformers import CrossEncoder
+        backend = self.settings.RERANKER_BACKEND
+        if backend == "onnx":
+            try:
+                return CrossEncoder(
+                    self.settings.RERANKER_MODEL_NAME, device=self.settings.DEVICE, backend="onnx",
+                    model_kwargs={"file_name": self.settings.RERANKER_ONNX_FILE},
+                )
+            except Exception as e:
+                app_logger.warning(f"Failed to load ONNX reranker ({e}); falling back to the PyTorch model.")
+        model = CrossEncoder(self.settings.RERANKER_MODEL_NAME, device=self.settings.DEVICE)
+        if backend == "torch_int8":
+            if str(self.settings.DEVICE).startswith("cuda"):
+                app_logger.warning("Dynamic int8 quantization only applies on CPU; using the unquantized model.")
+            else:
+                import torch
+                model.model = torch.quantization.quantize_dynamic(model.model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    def _predict(self, pairs: List[List[str]]) -> np.ndarray:
+        # Sorting by length keeps each model batch to similarly sized pairs, minimizing padding.
+        lengths = np.fromiter((len(q) + len(d) for q, d in pairs), dtype=np.int64, count=len(pairs))
+        order = np.argsort(lengths, kind="stable")
+        sorted_scores = self.model.predict(
+            [pairs[i] for i in order], batch_size=self.settings.RERANK_BATCH_SIZE, show_progress_bar=False
+        )
+        scores = np.empty(len(pairs), dtype=np.float32)
+        scores[order] = sorted_scores
+        return scores
+
+    def _cascade_winner(self, original_indices: List[int], hybrid: Optional[HybridResult]) -> Optional[int]:
+        """
+        Returns the candidate to accept without the cross-encoder when BM25 and dense retrieval
+        agree on the top document and its BM25 score clearly beats the runner-up.
+        """
+        if not self.settings.RERANK_CASCADE_ENABLED or hybrid is None:
+            return None
+        bm25_top = hybrid.bm25.top_index
+        if bm25_top < 0 or bm25_top != hybrid.dense_top or bm25_top not in original_indices:
+            return None
+        top_scores = hybrid.bm25.top_scores
+        first = float(top_scores[0])
+        second = float(top_scores[1]) if len(top_scores) > 1 else 0.0
+        if first >= self.settings.RERANK_CASCADE_MIN_BM25 and first >= self.settings.RERANK_CASCADE_BM25_RATIO * second:
+            return bm25_top
+        return None
+
+    def rerank(self, query: str, documents: Sequence[Dict], original_indices: List[int],
+               hybrid: Optional[HybridResult] = None) -> List[RerankResult]:
+        if not original_indices:
             return []
-            
-        scores = self.model.predict(pairs, show_progress_bar=False)
-        
-        reranked_docs = []
-        for i, score in enumerate(scores):
-            doc = documents[original_indices[i]]
-            doc['rerank_score'] = score
-            reranked_docs.append(doc)
-            
-        reranked_docs.sort(key=lambda x: x['rerank_score'], reverse=True)
-        return reranked_docs[:self.settings.RERANK_TOP_N]
\ No newline at end of file
+
+        winner = self._cascade_winner(original_indices, hybrid)
+        if winner is not None:
+            with self._stats_lock:
+                self._stats["cascade_skips"] += 1
+            return [RerankResult(winner, documents[winner], self.settings.RERANK_CASCADE_SCORE, "cascade")]
+
+        candidates = [(i, documents[i]) for i in original_indices]
+        scores: Dict[int, float] = {}
+        missing = []
+        for i, doc in candidates:
+            cached = self._score_cache.get((query, doc['content']))
+            if cached is not None:
+                scores[i] = cached
+            else:
+                missing.append((i, doc))
+        with self._stats_lock:
+            self._stats["pairs"] += len(candidates)
+            self._stats["cache_hits"] += len(candidates) - len(missing)
+
+        if missing:
+            pairs = [[query, doc['content']] for _, doc in missing]
+            with tracer.span("rerank"):
+                predicted = self.batcher(pairs) if self.batcher is not None else self._predict(pairs)
+            for (i, doc), score in zip(missing, predicted):
+                scores[i] = float(score)
+                self._score_cache.put((query, doc['content']), float(score))
+
+        missed = {i for i, _ in missing}
+        results = [RerankResult(i, doc, scores[i], "model" if i in missed else "cache") for i, doc in candidates]
+        results.sort(key=lambda result: result.score, reverse=True)
+        return results[:self.settings.RERANK_TOP_N]
+
+    def clear_cache(self):
+        self._score_cache.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["cache_size"] = len(self._score_cache)
+        stats["cache_hit_rate"] = stats["cache_hits"] / stats["pairs"] if stats["pairs"] else 0.0
+        return stats
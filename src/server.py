@@ -0,0 +1,294 @@
+import gc
+import itertools
+import json
+import os
+import signal
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+from config import Settings
+from src.orchestrator import JTCG_RAG_Orchestrator
+from src.utils.logger import app_logger, shutdown_logging, use_process_log_files
+from src.utils.tracing import tracer
+
+
+class _WorkerHTTPServer(ThreadingHTTPServer):
+    # Non-daemon request threads plus block_on_close let server_close() wait for in-flight requests.
+    daemon_threads = False
+    block_on_close = True
+
+    def get_request(self):
+        # The listening socket is shared by every worker and non-blocking, so accept() may lose the race.
+        conn, addr = self.socket.accept()
+        conn.setblocking(True)
+        return conn, addr
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    worker: "Worker" = None
+
+    def log_message(self, format, *args):
+        app_logger.debug(f"[worker {os.getpid()}] {self.address_string()} - {format % args}")
+
+    def end_headers(self):
+        if self.worker.draining:
+            # Do not keep connections alive past shutdown; block_on_close would wait for them.
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        super().end_headers()
+
+    def _send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._send_json(200, {"status": "ok", "pid": os.getpid()})
+        elif self.path == "/readyz":
+            ready = self.worker.ready and not self.worker.draining
+            self._send_json(200 if ready else 503, {"ready": ready, "pid": os.getpid()})
+        elif self.path == "/metrics":
+            body = (tracer.to_prometheus() + self.worker.orchestrator.prometheus_metrics()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/query":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            query = payload["query"]
+            if not isinstance(query, str) or not query.strip():
+                raise ValueError("'query' must be a non-empty string")
+        except (KeyError, ValueError, TypeError) as e:
+            self._send_json(400, {"error": f"invalid request: {e}"})
+            return
+
+        with self.worker.slots:
+            try:
+                if payload.get("stream"):
+                    self._stream_answer(query)
+                else:
+                    self._send_json(200, {"answer": self.worker.orchestrator.process_query(query)})
+            except Exception as e:
+                app_logger.error(f"[worker {os.getpid()}] Failed to process query '{query}': {e}", exc_info=True)
+                self._send_json(500, {"error": "internal error"})
+
+    def _stream_answer(self, query: str):
+        chunks = self.worker.orchestrator.process_query_stream(query)
+        # Pull the first chunk before sending headers so failures before any output still get a 500.
+        first = next(chunks, "")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for chunk in itertools.chain([first], chunks):
+                data = chunk.encode("utf-8")
+                if data:
+                    self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+        except Exception as e:
+            # The 200 status line is already out, so no error response can follow. Closing without the
+            # terminating chunk tells the client that the body is incomplete.
+            app_logger.error(f"[worker {os.getpid()}] Streaming failed for query '{query}': {e}", exc_info=True)
+            self.close_connection = True
+            return
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class Worker:
+    """One serving process: a threaded HTTP server on the listening socket shared with its siblings."""
+
+    def __init__(self, settings: Settings, listen_socket: socket.socket, orchestrator_factory: Callable[[], JTCG_RAG_Orchestrator]):
+        self.settings = settings
+        self.listen_socket = listen_socket
+        self.orchestrator_factory = orchestrator_factory
+        self.orchestrator: Optional[JTCG_RAG_Orchestrator] = None
+        self.slots = threading.BoundedSemaphore(settings.SERVER_THREADS_PER_WORKER)
+        self.ready = False
+        self.draining = False
+        self.httpd: Optional[_WorkerHTTPServer] = None
+
+    def _handle_sigterm(self, signum, frame):
+        if self.draining:
+            return
+        self.draining = True
+        app_logger.info(f"[worker {os.getpid()}] Draining: no new connections, finishing in-flight requests.")
+        # shutdown() blocks until serve_forever() returns, so it cannot run on the serving thread.
+        threading.Thread(target=self.httpd.shutdown, daemon=True).start()
+
+    def run(self, ready_fd: int) -> int:
+        signal.signal(signal.SIGTERM, self._handle_sigterm)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        self.orchestrator = self.orchestrator_factory()
+
+        # The socket timeout also closes idle keep-alive connections, so draining cannot hang on them.
+        handler = type("Handler", (_RequestHandler,), {"worker": self, "timeout": self.settings.SERVER_KEEPALIVE_TIMEOUT})
+        self.httpd = _WorkerHTTPServer(self.listen_socket.getsockname()[:2], handler, bind_and_activate=False)
+        self.httpd.socket.close()
+        self.httpd.socket = self.listen_socket
+        self.ready = True
+        os.write(ready_fd, b"1")
+        os.close(ready_fd)
+        app_logger.info(f"[worker {os.getpid()}] Ready.")
+
+        try:
+            self.httpd.serve_forever(poll_interval=0.5)
+        finally:
+            self.httpd.server_close()
+            app_logger.info(f"[worker {os.getpid()}] Stopped.")
+        return 0
+
+
+class PreforkServer:
+    """
+    Pre-forking HTTP server for the RAG pipeline.
+
+    With SERVER_PRELOAD the parent loads the models and indices and warms them up once, then
+    forks the workers, which share those pages copy-on-write (the indices loaded from the index
+    cache are additionally file-backed memory maps). Without it (required for CUDA, which does
+    not survive fork) every worker builds its own orchestrator; the memory-mapped index cache
+    is then what keeps the indices shared. The parent restarts crashed workers and, on
+    SIGTERM/SIGINT, lets workers drain before exiting.
+    """
+
+    def __init__(self, settings: Settings, host: str = None, port: int = None, workers: int = None):
+        self.settings = settings
+        self.host = host or settings.SERVER_HOST
+        self.port = port if port is not None else settings.SERVER_PORT
+        self.num_workers = workers or settings.SERVER_WORKERS
+        self.preload = settings.SERVER_PRELOAD and not str(settings.DEVICE).startswith("cuda")
+        self.orchestrator: Optional[JTCG_RAG_Orchestrator] = None
+        # pid -> (slot, start time); a restarted worker takes over the slot, and with it the log files, of the one it replaces.
+        self.workers: Dict[int, Tuple[int, float]] = {}
+        self.stopping = False
+        self.shutdown_deadline: Optional[float] = None
+        self.listen_socket: Optional[socket.socket] = None
+
+    def _build_orchestrator(self) -> JTCG_RAG_Orchestrator:
+        if self.orchestrator is not None:
+            return self.orchestrator
+        orchestrator = JTCG_RAG_Orchestrator(self.settings)
+        if not self.settings.STARTUP_WARMUP:
+            orchestrator.warmup()
+        return orchestrator
+
+    def _spawn_worker(self, slot: int) -> int:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            use_process_log_files(f"worker-{slot}")
+            exit_code = 1
+            try:
+                exit_code = Worker(self.settings, self.listen_socket, self._build_orchestrator).run(write_fd)
+            except Exception as e:
+                app_logger.critical(f"[worker {os.getpid()}] Crashed: {e}", exc_info=True)
+            finally:
+                shutdown_logging()
+                os._exit(exit_code)
+        os.close(write_fd)
+        self.workers[pid] = (slot, time.monotonic())
+        self._await_ready(pid, read_fd)
+        return pid
+
+    def _await_ready(self, pid: int, read_fd: int):
+        try:
+            if os.read(read_fd, 1) == b"1":
+                app_logger.info(f"Worker {pid} is ready.")
+            else:
+                app_logger.error(f"Worker {pid} exited before becoming ready.")
+        finally:
+            os.close(read_fd)
+
+    def _handle_signal(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        self.shutdown_deadline = time.monotonic() + self.settings.SERVER_SHUTDOWN_TIMEOUT
+        app_logger.info(f"Received signal {signum}; shutting down {len(self.workers)} worker(s) gracefully.")
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self, deadline: Optional[float] = None):
+        """
+        Reaps exited workers (restarting them unless shutting down). Returns once no workers are
+        left; before shutdown also as soon as it starts, and during shutdown once `deadline` passes.
+        """
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                return
+            except InterruptedError:
+                continue
+            if pid == 0:
+                if (self.stopping and deadline is None) or (deadline is not None and time.monotonic() >= deadline):
+                    return
+                time.sleep(0.1)
+                continue
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            slot, started_at = worker
+            if self.stopping:
+                app_logger.info(f"Worker {pid} exited.")
+                continue
+            app_logger.warning(f"Worker {pid} exited unexpectedly (status {status}); restarting.")
+            if time.monotonic() - started_at < self.settings.SERVER_MIN_WORKER_UPTIME:
+                # Avoid a tight crash loop when workers die during startup.
+                time.sleep(self.settings.SERVER_MIN_WORKER_UPTIME)
+            if not self.stopping:
+                self._spawn_worker(slot)
+
+    def serve(self):
+        self.listen_socket = socket.create_server((self.host, self.port), backlog=self.settings.SERVER_BACKLOG, reuse_port=False)
+        self.listen_socket.setblocking(False)
+
+        if self.preload:
+            app_logger.info("Preloading models and indices in the parent process before forking workers...")
+            self.orchestrator = self._build_orchestrator()
+            # Keep the cyclic GC from touching (and thereby copying) preloaded objects in the workers.
+            gc.collect()
+            gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+        for slot in range(self.num_workers):
+            if self.stopping:
+                break
+            self._spawn_worker(slot)
+        app_logger.info(f"Serving on http://{self.host}:{self.port} with {len(self.workers)} worker(s) (preload: {self.preload}).")
+        print(f"JTCG RAG server ready on http://{self.host}:{self.port} ({len(self.workers)} workers)")
+
+        while self.workers and not self.stopping:
+            self._reap()
+        if self.workers:
+            self._reap(deadline=self.shutdown_deadline)
+        for pid in list(self.workers):
+            app_logger.warning(f"Worker {pid} did not finish within {self.settings.SERVER_SHUTDOWN_TIMEOUT}s; killing it.")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.listen_socket.close()
+        app_logger.info("Server stopped.")
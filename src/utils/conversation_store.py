@@ -0,0 +1,146 @@
+import glob
+import logging
+import os
+import re
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+_STOP = object()
+
+
+class ConversationStore:
+    """
+    Append-only conversation store in SQLite files (WAL mode), keyed by conversation ID.
+    `append()` only enqueues; a background thread writes records in batched transactions so
+    request threads never touch the disk. Records go to numbered segments next to `path`
+    (`conversations.000001.sqlite3`, ...): once the newest segment reaches `max_bytes` (0 for no
+    limit) the writer starts the next one. Segments are never deleted; archiving old ones is left
+    to the operator.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS conversations ("
+        "conversation_id TEXT PRIMARY KEY, "
+        "created_at REAL NOT NULL, "
+        "user_query TEXT, "
+        "bot_response TEXT, "
+        "cache_marker TEXT)"
+    )
+
+    def __init__(self, path: str, batch_size: int = 256, max_bytes: int = 0):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self._queue: queue.Queue = queue.Queue()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        root, ext = os.path.splitext(path)
+        self._segment_re = re.compile(re.escape(os.path.basename(root)) + r"\.(\d{6})" + re.escape(ext) + "$")
+        self._open_segment(max(self._segment_numbers(), default=1)).close()
+        self._thread = threading.Thread(target=self._run, name="conversation-store", daemon=True)
+        self._thread.start()
+
+    def segment_path(self, number: int) -> str:
+        root, ext = os.path.splitext(self.path)
+        return f"{root}.{number:06d}{ext}"
+
+    def _segment_numbers(self) -> List[int]:
+        root, ext = os.path.splitext(self.path)
+        matches = (self._segment_re.search(name) for name in glob.glob(f"{glob.escape(root)}.*{ext}"))
+        return sorted(int(match.group(1)) for match in matches if match)
+
+    def segment_paths(self) -> List[str]:
+        """Existing segment files, oldest first."""
+        return [self.segment_path(number) for number in self._segment_numbers()]
+
+    def _segment_size(self, number: int) -> int:
+        path = self.segment_path(number)
+        return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+    def _connect(self, path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _open_segment(self, number: int) -> sqlite3.Connection:
+        conn = self._connect(self.segment_path(number))
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute(self.SCHEMA)
+        return conn
+
+    def append(self, conversation_id, user_query: str, bot_response: str, cache_marker: Optional[str] = None):
+        self._queue.put((str(conversation_id), time.time(), user_query, bot_response, cache_marker))
+
+    def _run(self):
+        number = max(self._segment_numbers(), default=1)
+        conn = self._open_segment(number)
+        stopping = False
+        while not stopping:
+            batch: List[tuple] = []
+            item = self._queue.get()
+            # Drain whatever accumulated while the previous batch was being written.
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                # Another process sharing the store may already have started a newer segment.
+                newest = max(self._segment_numbers(), default=number)
+                if newest > number or (self.max_bytes and self._segment_size(number) >= self.max_bytes):
+                    conn.close()
+                    number = newest if newest > number else number + 1
+                    conn = self._open_segment(number)
+                self._write(conn, batch)
+        conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: List[tuple]):
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO conversations "
+                    "(conversation_id, created_at, user_query, bot_response, cache_marker) VALUES (?, ?, ?, ?, ?)",
+                    batch,
+                )
+        except sqlite3.Error as e:
+            logging.getLogger("app").error(f"Failed to write {len(batch)} conversation(s) to {self.path}: {e}")
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self):
+        """Blocks until every queued conversation has been written."""
+        self._queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def get(self, conversation_id) -> Optional[Dict]:
+        for path in reversed(self.segment_paths()):
+            with self._connect(path) as conn:
+                conn.row_factory = sqlite3.Row
+                row = conn.execute(
+                    "SELECT * FROM conversations WHERE conversation_id = ?", (str(conversation_id),)
+                ).fetchone()
+            if row is not None:
+                return dict(row)
+        return None
+
+    def __len__(self) -> int:
+        total = 0
+        for path in self.segment_paths():
+            with self._connect(path) as conn:
+                total += conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+        return total
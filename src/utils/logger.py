@@ -1,48 +1,147 @@
+import atexit
 import logging
 import os
+import queue
+import threading
 import uuid
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from config import Settings
+from src.utils.conversation_store import ConversationStore
+
+_log_listener: QueueListener = None
+_queue_handlers = []
+_file_handlers = []
+_conversation_store: ConversationStore = None
+_conversation_store_lock = threading.Lock()
+
+
+def _file_handler(logger_name: str, path: str, formatter: logging.Formatter, max_bytes: int, backup_count: int) -> logging.Handler:
+    # Without backups a rollover would just empty the file, so a file without backups never rotates.
+    handler = RotatingFileHandler(path, maxBytes=max_bytes if backup_count else 0, backupCount=backup_count, encoding='utf-8')
+    handler.setFormatter(formatter)
+    # All loggers share one queue; the filter routes each record to its own file.
+    handler.addFilter(logging.Filter(logger_name))
+    return handler
+
+
+def _start_log_listener():
+    """Creates the shared log queue and the background thread draining it into the file handlers."""
+    global _log_listener
+    log_queue = queue.SimpleQueue()
+    for handler in _queue_handlers:
+        handler.queue = log_queue
+    _log_listener = QueueListener(log_queue, *_file_handlers, respect_handler_level=True)
+    _log_listener.start()
+
+
+def _stop_log_listener():
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+    for handler in _file_handlers:
+        handler.close()
+
+
+def _log_specs():
+    return [
+        ("app", logging.INFO, "app.log", '%(asctime)s - %(name)s - %(levelname)s - %(message)s', 5*1024*1024, 2),
+        ("cost", logging.INFO, "cost_usage.log", '%(asctime)s - %(message)s', Settings.COST_LOG_MAX_BYTES, Settings.COST_LOG_BACKUP_COUNT),
+        ("rag", getattr(logging, Settings.RAG_LOG_LEVEL), "rag_details.log", '%(asctime)s - CONV_ID: %(conv_id)s - %(message)s', 50*1024*1024, 5),
+        ("trace", logging.INFO, "traces.jsonl", '%(message)s', 20*1024*1024, 2),
+    ]
+
+
+def _log_path(filename: str, suffix: str = None) -> str:
+    if suffix:
+        root, ext = os.path.splitext(filename)
+        filename = f"{root}.{suffix}{ext}"
+    return os.path.join(Settings.LOGS_DIR, filename)
+
+
+def _pause_log_listener():
+    # A listener thread caught mid-write by fork() would leave the child a file stream whose lock is never released.
+    if _log_listener is not None:
+        _log_listener.stop()
+
+
+def _resume_log_listener():
+    if _log_listener is not None:
+        _log_listener.start()
+
+
+def _reinit_after_fork():
+    # Background threads do not survive fork(); give child workers their own writer threads.
+    global _conversation_store, _conversation_store_lock
+    _conversation_store = None
+    _conversation_store_lock = threading.Lock()
+    _start_log_listener()
+
 
 def setup_loggers():
     os.makedirs(Settings.LOGS_DIR, exist_ok=True)
     os.makedirs(Settings.CONVERSATION_LOGS_DIR, exist_ok=True)
 
-    app_logger = logging.getLogger("app")
-    app_logger.setLevel(logging.INFO)
-    app_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    app_handler = RotatingFileHandler(os.path.join(Settings.LOGS_DIR, "app.log"), maxBytes=5*1024*1024, backupCount=2)
-    app_handler.setFormatter(app_formatter)
-    if not app_logger.handlers:
-        app_logger.addHandler(app_handler)
-
-    cost_logger = logging.getLogger("cost")
-    cost_logger.setLevel(logging.INFO)
-    cost_formatter = logging.Formatter('%(asctime)s - %(message)s')
-    cost_handler = logging.FileHandler(os.path.join(Settings.LOGS_DIR, "cost_usage.log"))
-    cost_handler.setFormatter(cost_formatter)
-    if not cost_logger.handlers:
-        cost_logger.addHandler(cost_handler)
-
-    rag_logger = logging.getLogger("rag")
-    rag_logger.setLevel(logging.DEBUG)
-    rag_formatter = logging.Formatter('%(asctime)s - CONV_ID: %(conv_id)s - %(message)s')
-    rag_handler = logging.FileHandler(os.path.join(Settings.LOGS_DIR, "rag_details.log"))
-    rag_handler.setFormatter(rag_formatter)
-    if not rag_logger.handlers:
-        rag_logger.addHandler(rag_handler)
-
-    return app_logger, cost_logger, rag_logger
-
-def log_conversation(conversation_id: uuid.UUID, user_query: str, bot_response: str):
-    log_path = os.path.join(Settings.CONVERSATION_LOGS_DIR, f"{conversation_id}.log")
-    with open(log_path, 'w', encoding='utf-8') as f:
-        f.write(f"--- Conversation ID: {conversation_id} ---\n")
-        f.write(f"Timestamp: {logging.Formatter().formatTime(logging.makeLogRecord({}))}\n")
-        f.write("="*50 + "\n")
-        f.write(f"User Query:\n{user_query}\n")
-        f.write("="*50 + "\n")
-        f.write(f"Bot Response:\n{bot_response}\n")
-        f.write("="*50 + "\n")
-
-app_logger, cost_logger, rag_logger = setup_loggers()
\ No newline at end of file
+    loggers = []
+    for name, level, filename, fmt, max_bytes, backup_count in _log_specs():
+        logger = logging.getLogger(name)
+        logger.setLevel(level)
+        logger.propagate = False
+        if not logger.handlers:
+            _file_handlers.append(_file_handler(name, _log_path(filename), logging.Formatter(fmt), max_bytes, backup_count))
+            queue_handler = QueueHandler(None)
+            _queue_handlers.append(queue_handler)
+            logger.addHandler(queue_handler)
+        loggers.append(logger)
+
+    if _log_listener is None and _queue_handlers:
+        _start_log_listener()
+        atexit.register(_stop_log_listener)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(before=_pause_log_listener, after_in_parent=_resume_log_listener, after_in_child=_reinit_after_fork)
+
+    return tuple(loggers)
+
+
+def use_process_log_files(suffix: str):
+    """
+    Switches this process to its own set of log files (`app.<suffix>.log`, ...). Forked server
+    workers call it right after fork: rotating files shared by several processes overwrite each
+    other's records, so every file must have a single writer.
+    """
+    _stop_log_listener()
+    _file_handlers[:] = [
+        _file_handler(name, _log_path(filename, suffix), logging.Formatter(fmt), max_bytes, backup_count)
+        for name, _, filename, fmt, max_bytes, backup_count in _log_specs()
+    ]
+    _start_log_listener()
+
+
+def get_conversation_store() -> ConversationStore:
+    global _conversation_store
+    if _conversation_store is None:
+        # Each store starts a writer thread, so concurrent first calls must not both create one.
+        with _conversation_store_lock:
+            if _conversation_store is None:
+                store = ConversationStore(
+                    Settings.CONVERSATION_STORE_PATH,
+                    batch_size=Settings.CONVERSATION_STORE_BATCH_SIZE,
+                    max_bytes=Settings.CONVERSATION_STORE_MAX_BYTES,
+                )
+                atexit.register(store.close)
+                _conversation_store = store
+    return _conversation_store
+
+
+def shutdown_logging():
+    """Flushes queued conversations and log records; for processes that exit without running atexit hooks."""
+    if _conversation_store is not None:
+        _conversation_store.close()
+    _stop_log_listener()
+
+
+def log_conversation(conversation_id: uuid.UUID, user_query: str, bot_response: str, cache_marker: str = None):
+    get_conversation_store().append(conversation_id, user_query, bot_response, cache_marker)
+
+
+app_logger, cost_logger, rag_logger, trace_logger = setup_loggers()
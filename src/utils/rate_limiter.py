@@ -0,0 +1,26 @@
+import asyncio
+import threading
+import time
+
+
+class AsyncRateLimiter:
+    """
+    Spaces out requests so that at most `requests_per_minute` start in any minute (0 disables the limit).
+    Slots are reserved without awaiting, so a plain threading.Lock suffices; unlike asyncio.Lock it is
+    not bound to an event loop, and one limiter can serve several asyncio.run() calls.
+    """
+
+    def __init__(self, requests_per_minute: int):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
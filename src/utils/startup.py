@@ -0,0 +1,47 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from src.utils.logger import app_logger
+
+
+class StartupProfiler:
+    """
+    Runs startup steps either on a thread pool or inline, recording how long each one took.
+    Model loading, CSV parsing and dictionary loading mostly release the GIL (native code and
+    file I/O), so independent steps overlap well on threads.
+    """
+
+    def __init__(self, parallel: bool = True, max_workers: int = 4):
+        self.timings: Dict[str, float] = {}
+        self._started_at = time.perf_counter()
+        self._pool: Optional[ThreadPoolExecutor] = (
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="startup") if parallel else None
+        )
+
+    def _timed(self, name: str, fn: Callable, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+    def submit(self, name: str, fn: Callable, *args, **kwargs) -> Future:
+        if self._pool is not None:
+            return self._pool.submit(self._timed, name, fn, *args, **kwargs)
+        future = Future()
+        try:
+            future.set_result(self._timed(name, fn, *args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def run(self, name: str, fn: Callable, *args, **kwargs):
+        return self._timed(name, fn, *args, **kwargs)
+
+    def close(self) -> float:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+        total = time.perf_counter() - self._started_at
+        breakdown = ", ".join(f"{name}={seconds:.2f}s" for name, seconds in sorted(self.timings.items(), key=lambda item: -item[1]))
+        app_logger.info(f"Startup finished in {total:.2f}s (parallel: {self._pool is not None}). Breakdown: {breakdown}")
+        return total
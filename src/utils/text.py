@@ -0,0 +1,66 @@
+import os
+import re
+import threading
+import unicodedata
+import jieba
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = "?？!！。.～~ "
+_jieba_lock = threading.Lock()
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a user query used as a cache key (width-folded, lowercased, whitespace-collapsed)."""
+    normalized = unicodedata.normalize("NFKC", query or "")
+    normalized = _WHITESPACE_RE.sub(" ", normalized).strip().lower()
+    return normalized.rstrip(_TRAILING_PUNCTUATION)
+
+
+def load_jieba(dictionary_path: str, cache_dir: str = None):
+    """
+    Loads the jieba dictionary once per process. The parsed prefix dictionary is kept as a
+    marshal cache in `cache_dir` (instead of the system temp dir), so later startups skip
+    re-parsing dict.txt.big. Safe to call from several threads; later calls are no-ops.
+    """
+    with _jieba_lock:
+        if jieba.dt.initialized and jieba.dt.dictionary == os.path.abspath(dictionary_path):
+            return
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            jieba.dt.tmp_dir = cache_dir
+        jieba.set_dictionary(dictionary_path)
+        jieba.initialize()
+
+
+class IncrementalConverter:
+    """
+    Applies an OpenCC converter to streamed text. Text is only converted up to the last
+    punctuation/whitespace boundary so multi-character phrases are never split; a long run
+    without boundaries is flushed except for a `holdback` tail.
+    """
+
+    BOUNDARIES = set("，。！？、；：「」（）\n ,.!?;:()")
+
+    def __init__(self, converter, max_pending: int = 64, holdback: int = 16):
+        self.converter = converter
+        self.max_pending = max_pending
+        self.holdback = holdback
+        self._pending = ""
+
+    def feed(self, text: str) -> str:
+        self._pending += text
+        cut = 0
+        for i in range(len(self._pending) - 1, -1, -1):
+            if self._pending[i] in self.BOUNDARIES:
+                cut = i + 1
+                break
+        if cut == 0 and len(self._pending) > self.max_pending:
+            cut = len(self._pending) - self.holdback
+        if cut <= 0:
+            return ""
+        ready, self._pending = self._pending[:cut], self._pending[cut:]
+        return self.converter.convert(ready)
+
+    def flush(self) -> str:
+        ready, self._pending = self._pending, ""
+        return self.converter.convert(ready) if ready else ""
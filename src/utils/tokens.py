@@ -0,0 +1,74 @@
+import math
+import re
+from typing import Dict, List
+from src.utils.logger import app_logger
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_CJK_RE = re.compile(r"[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+_SENTENCE_END_RE = re.compile(r"(?<=[。！？!?；;\n])")
+# Chat formatting overhead per message and for priming the reply, as in OpenAI's token counting guide.
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence for sentence in _SENTENCE_END_RE.split(text) if sentence]
+
+
+class TokenCounter:
+    """
+    Counts tokens locally with the model's tiktoken encoding. Without tiktoken (or when its
+    encoding files cannot be loaded) it falls back to an estimate of one token per CJK character
+    and one per four other characters, which slightly overcounts for current OpenAI encodings.
+    """
+
+    def __init__(self, model: str, fallback_encoding: str = "o200k_base"):
+        self.encoding = None
+        if tiktoken is None:
+            app_logger.warning("tiktoken is not installed; estimating token counts from character classes.")
+        else:
+            try:
+                try:
+                    self.encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    self.encoding = tiktoken.get_encoding(fallback_encoding)
+            except Exception as e:
+                app_logger.warning(f"Failed to load tiktoken encoding for '{model}' ({e}); estimating token counts.")
+        self.exact = self.encoding is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        cjk = len(_CJK_RE.findall(text))
+        return cjk + math.ceil((len(text) - cjk) / 4)
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        return sum(TOKENS_PER_MESSAGE + self.count(message.get("content") or "") for message in messages) + TOKENS_PER_REPLY
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of whole sentences that fits in `max_tokens` ("" if not even the first does)."""
+        kept, used = [], 0
+        for sentence in split_sentences(text):
+            tokens = self.count(sentence)
+            if used + tokens > max_tokens:
+                break
+            kept.append(sentence)
+            used += tokens
+        return "".join(kept).rstrip()
+
+    def truncate_tokens(self, text: str, max_tokens: int) -> str:
+        """Longest prefix that fits in `max_tokens`, cut anywhere (even mid-sentence)."""
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low]
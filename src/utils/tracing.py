@@ -0,0 +1,212 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, List, Optional, Tuple
+from config import Settings
+from src.utils.logger import trace_logger
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+
+
+def gauges_to_prometheus(prefix: str, rows: List[Tuple[Dict[str, str], Dict]]) -> str:
+    """
+    Renders `(labels, stats)` rows as Prometheus gauges named `<prefix>_<stat>`; samples of the
+    same stat share one TYPE line, and non-numeric stats are skipped.
+    """
+    samples: Dict[str, List[str]] = {}
+    for labels, stats in rows:
+        label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+        for stat, value in stats.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{prefix}_{stat}"
+            samples.setdefault(name, []).append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    lines = []
+    for name, metric_samples in samples.items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(metric_samples)
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    def __init__(self, conversation_id: str):
+        self.conversation_id = conversation_id
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.spans: List[Dict] = []
+
+    def to_dict(self, total_ms: float) -> Dict:
+        return {
+            "conversation_id": self.conversation_id,
+            "started_at": self.started_at,
+            "total_ms": round(total_ms, 3),
+            "spans": self.spans,
+        }
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer: "Tracer", name: str):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        duration = end - self.start
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append({
+                "stage": self.name,
+                "offset_ms": round((self.start - trace._start) * 1000, 3),
+                "duration_ms": round(duration * 1000, 3),
+                "error": exc_type.__name__ if exc_type else None,
+            })
+        self.tracer.observe(self.name, duration)
+        return False
+
+
+class Tracer:
+    """
+    Per-request stage tracing. Each `trace(conversation_id)` block collects one span per
+    `span(stage)` executed inside it and writes the trace as a JSON line; stage latencies
+    also feed rolling windows exported as p50/p95/p99 in Prometheus text and JSON.
+    When disabled, `span()` returns a shared no-op context manager.
+    """
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, settings: Settings):
+        self._windows: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._sums: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._traces_since_export = 0
+        self.configure(settings)
+
+    def configure(self, settings: Settings):
+        """
+        Applies `settings` (TRACING_ENABLED, window size, export interval and paths). The
+        module-level `tracer` starts from the Settings class; the orchestrator calls this with
+        the settings it was built with.
+        """
+        with self._lock:
+            self.settings = settings
+            self.enabled = settings.TRACING_ENABLED
+            for name, window in self._windows.items():
+                if window.maxlen != settings.TRACING_WINDOW_SIZE:
+                    self._windows[name] = deque(window, maxlen=settings.TRACING_WINDOW_SIZE)
+
+    def span(self, name: str):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    @contextmanager
+    def trace(self, conversation_id):
+        if not self.enabled:
+            yield None
+            return
+        trace = Trace(str(conversation_id))
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+            total = time.perf_counter() - trace._start
+            self.observe("total", total)
+            self._write_trace(trace.to_dict(total * 1000))
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            window = self._windows.get(name)
+            if window is None:
+                window = self._windows[name] = deque(maxlen=self.settings.TRACING_WINDOW_SIZE)
+                self._counts[name] = 0
+                self._sums[name] = 0.0
+            window.append(seconds)
+            self._counts[name] += 1
+            self._sums[name] += seconds
+
+    def reset(self):
+        with self._lock:
+            self._windows.clear()
+            self._counts.clear()
+            self._sums.clear()
+            self._traces_since_export = 0
+
+    def _write_trace(self, trace: Dict):
+        trace_logger.info(json.dumps(trace, ensure_ascii=False))
+        with self._lock:
+            self._traces_since_export += 1
+            should_export = self._traces_since_export >= self.settings.TRACING_EXPORT_INTERVAL
+            if should_export:
+                self._traces_since_export = 0
+        if should_export:
+            self.export_metrics()
+
+    @staticmethod
+    def _quantile(sorted_values: List[float], q: float) -> float:
+        if not sorted_values:
+            return 0.0
+        index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+        return sorted_values[index]
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            windows = {name: sorted(window) for name, window in self._windows.items()}
+            counts = dict(self._counts)
+            sums = dict(self._sums)
+        return {
+            name: {
+                "count": counts[name],
+                "sum_seconds": sums[name],
+                **{f"p{int(q * 100)}_ms": self._quantile(values, q) * 1000 for q in self.QUANTILES},
+            }
+            for name, values in windows.items()
+        }
+
+    def to_prometheus(self, snapshot: Optional[Dict] = None) -> str:
+        snapshot = snapshot if snapshot is not None else self.snapshot()
+        metric = "jtcg_rag_stage_latency_seconds"
+        lines = [f"# HELP {metric} Per-stage latency of the RAG pipeline (rolling window).", f"# TYPE {metric} summary"]
+        for stage, stats in sorted(snapshot.items()):
+            for q in self.QUANTILES:
+                lines.append(f'{metric}{{stage="{stage}",quantile="{q}"}} {stats[f"p{int(q * 100)}_ms"] / 1000:.6f}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {stats["sum_seconds"]:.6f}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {stats["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def export_metrics(self):
+        snapshot = self.snapshot()
+        os.makedirs(os.path.dirname(self.settings.METRICS_PROMETHEUS_PATH), exist_ok=True)
+        for path, payload in (
+            (self.settings.METRICS_PROMETHEUS_PATH, self.to_prometheus(snapshot)),
+            (self.settings.METRICS_JSON_PATH, json.dumps(snapshot, indent=2)),
+        ):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+
+
+tracer = Tracer(Settings)
@@ -0,0 +1,174 @@
+import time
+import numpy as np
+import faiss
+from typing import Dict, List, Optional, Sequence
+from config import Settings
+from src.utils.logger import app_logger
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+STORAGE_TYPES = {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8"}
+
+
+def index_spec(settings: Settings) -> str:
+    """Describes the build-time index configuration; search-time knobs (nprobe, efSearch) are excluded."""
+    return (
+        f"type={settings.FAISS_INDEX_TYPE};storage={settings.FAISS_STORAGE};"
+        f"hnsw_m={settings.FAISS_HNSW_M};ef_construction={settings.FAISS_HNSW_EF_CONSTRUCTION};"
+        f"nlist={settings.FAISS_IVF_NLIST};pq={settings.FAISS_PQ_M}x{settings.FAISS_PQ_NBITS}"
+    )
+
+
+def _ivf_nlist(settings: Settings, num_vectors: int) -> int:
+    if settings.FAISS_IVF_NLIST:
+        nlist = settings.FAISS_IVF_NLIST
+    else:
+        nlist = int(4 * np.sqrt(num_vectors))
+    # k-means needs roughly 39 training points per centroid to be meaningful.
+    return max(1, min(nlist, num_vectors // 39))
+
+
+def _pq_shape(settings: Settings, dimension: int, num_vectors: int):
+    m = settings.FAISS_PQ_M
+    while dimension % m:
+        m -= 1
+    nbits = min(settings.FAISS_PQ_NBITS, max(1, int(np.log2(max(num_vectors, 2)))))
+    if (m, nbits) != (settings.FAISS_PQ_M, settings.FAISS_PQ_NBITS):
+        app_logger.warning(f"IVF-PQ adjusted to {m}x{nbits} bits for {num_vectors} vectors of dimension {dimension}.")
+    return m, nbits
+
+
+def factory_string(settings: Settings, dimension: int, num_vectors: int) -> str:
+    index_type = settings.FAISS_INDEX_TYPE
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS_INDEX_TYPE '{index_type}'. Expected one of {INDEX_TYPES}.")
+    if settings.FAISS_STORAGE not in STORAGE_TYPES:
+        raise ValueError(f"Unknown FAISS_STORAGE '{settings.FAISS_STORAGE}'. Expected one of {tuple(STORAGE_TYPES)}.")
+    storage = STORAGE_TYPES[settings.FAISS_STORAGE]
+
+    if index_type == "flat":
+        return storage
+    if index_type == "hnsw":
+        return f"HNSW{settings.FAISS_HNSW_M}" + ("" if storage == "Flat" else f"_{storage}")
+    nlist = _ivf_nlist(settings, num_vectors)
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},{storage}"
+    m, nbits = _pq_shape(settings, dimension, num_vectors)
+    # Product quantization is its own compression, so FAISS_STORAGE does not apply here.
+    return f"IVF{nlist},PQ{m}x{nbits}"
+
+
+def configure_search(index, settings: Settings):
+    """Applies search-time parameters (IVF nprobe, HNSW efSearch) through any IndexIDMap wrapper."""
+    inner = faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+    if hasattr(inner, "nprobe"):
+        inner.nprobe = min(settings.FAISS_IVF_NPROBE, inner.nlist)
+    if hasattr(inner, "hnsw"):
+        inner.hnsw.efSearch = settings.FAISS_HNSW_EF_SEARCH
+    return index
+
+
+def build_index(embeddings: np.ndarray, ids: np.ndarray, settings: Settings):
+    """
+    Builds the configured index (training it first when needed). Flat and HNSW indices are wrapped
+    in an IndexIDMap2; IVF indices store their ids in the inverted lists themselves, and wrapping them
+    would map ids wrongly after remove_ids(), since IndexIDMap compacts its id map but IVF does not
+    compact its labels.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    num_vectors, dimension = embeddings.shape
+    spec = factory_string(settings, dimension, num_vectors)
+    inner = faiss.index_factory(dimension, spec, faiss.METRIC_INNER_PRODUCT)
+    if hasattr(inner, "hnsw"):
+        inner.hnsw.efConstruction = settings.FAISS_HNSW_EF_CONSTRUCTION
+    if not inner.is_trained:
+        sample = embeddings
+        if num_vectors > settings.FAISS_TRAIN_SAMPLE_SIZE:
+            rng = np.random.default_rng(0)
+            sample = embeddings[rng.choice(num_vectors, settings.FAISS_TRAIN_SAMPLE_SIZE, replace=False)]
+        start = time.perf_counter()
+        inner.train(sample)
+        app_logger.info(f"Trained FAISS index '{spec}' on {len(sample)} vectors in {time.perf_counter() - start:.1f}s.")
+    index = inner if hasattr(inner, "invlists") else faiss.IndexIDMap2(inner)
+    index.add_with_ids(embeddings, np.asarray(ids, dtype=np.int64))
+    app_logger.info(f"Built FAISS index '{spec}' with {num_vectors} vectors.")
+    return configure_search(index, settings)
+
+
+def copy_index(index):
+    """
+    Deep copy that owns all of its data, for indices that are about to be modified. clone_index()
+    of an index read with IO_FLAG_MMAP_IFC keeps pointing into the read-only file mapping, so
+    adding to the clone would crash.
+    """
+    return faiss.deserialize_index(faiss.serialize_index(index))
+
+
+def remove_ids(index, ids: np.ndarray, settings: Settings):
+    """
+    Removes `ids` from an index built by build_index() in place. HNSW graphs do not support removal, so for them
+    the remaining vectors are reconstructed from the index and a new index is returned instead.
+    """
+    try:
+        index.remove_ids(np.asarray(ids, dtype=np.int64))
+        return index
+    except RuntimeError:
+        all_ids = faiss.vector_to_array(index.id_map)
+        keep = ~np.isin(all_ids, ids)
+        vectors = index.index.reconstruct_n(0, index.ntotal)[keep]
+        app_logger.info(f"Index type does not support removal; rebuilding from {int(keep.sum())} stored vectors.")
+        return build_index(vectors, all_ids[keep], settings)
+
+
+def recall_report(embeddings: np.ndarray, queries: np.ndarray, settings: Settings, k: int = 10,
+                  configurations: Optional[Sequence[Dict]] = None) -> List[Dict]:
+    """
+    Measures recall@k and per-query latency of approximate index configurations against the
+    exact float32 flat index. Each configuration overrides Settings attributes, e.g.
+    `{"FAISS_INDEX_TYPE": "ivf_pq", "FAISS_IVF_NPROBE": 8}`; the default sweep covers every
+    index type and storage mode with a few nprobe/efSearch values.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    ids = np.arange(len(embeddings), dtype=np.int64)
+    k = min(k, len(embeddings))
+
+    exact = faiss.IndexFlatIP(embeddings.shape[1])
+    exact.add(embeddings)
+    start = time.perf_counter()
+    _, truth = exact.search(queries, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    if configurations is None:
+        configurations = default_sweep()
+    report = [{"index": "exact", "recall": 1.0, "latency_ms": exact_ms, "memory_bytes": len(faiss.serialize_index(exact))}]
+    built = {}
+    for overrides in configurations:
+        config = type("RecallSettings", (settings,), dict(overrides))
+        build_key = index_spec(config)
+        if build_key not in built:
+            start = time.perf_counter()
+            built[build_key] = (build_index(embeddings, ids, config), time.perf_counter() - start)
+        index, build_seconds = built[build_key]
+        configure_search(index, config)
+        start = time.perf_counter()
+        _, found = index.search(queries, k)
+        latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        hits = sum(len(set(row_truth) & set(row_found)) for row_truth, row_found in zip(truth, found))
+        report.append({
+            "index": factory_string(config, embeddings.shape[1], len(embeddings)),
+            "params": dict(overrides),
+            "recall": hits / truth.size,
+            "latency_ms": latency_ms,
+            "build_seconds": build_seconds,
+            "memory_bytes": len(faiss.serialize_index(index)),
+        })
+    return report
+
+
+def default_sweep() -> List[Dict]:
+    sweep = [{"FAISS_INDEX_TYPE": "flat", "FAISS_STORAGE": storage} for storage in STORAGE_TYPES]
+    for storage in STORAGE_TYPES:
+        sweep += [{"FAISS_INDEX_TYPE": "hnsw", "FAISS_STORAGE": storage, "FAISS_HNSW_EF_SEARCH": ef} for ef in (16, 64, 256)]
+        sweep += [{"FAISS_INDEX_TYPE": "ivf_flat", "FAISS_STORAGE": storage, "FAISS_IVF_NPROBE": n} for n in (1, 8, 32)]
+    sweep += [{"FAISS_INDEX_TYPE": "ivf_pq", "FAISS_IVF_NPROBE": n} for n in (1, 8, 32)]
+    return sweep
@@ -0,0 +1,105 @@
+import hashlib
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from config import Settings
+from src import answer_cache
+from src.answer_cache import AnswerCache
+from src.utils.text import normalize_query
+
+DIMENSION = 16
+
+
+def _unit(seed_text):
+    vector = np.random.default_rng(int.from_bytes(hashlib.sha256(seed_text.encode("utf-8")).digest()[:8], "little")).standard_normal(DIMENSION)
+    return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+# Paraphrases share an embedding; everything else gets its own random direction.
+SHARED = {
+    "螢幕臂保固多久": "warranty", "螢幕臂的保固是多久": "warranty",
+    "32 吋螢幕適合哪款": "size", "27 吋螢幕適合哪款": "size", "適合 32 吋螢幕的是哪款": "size",
+}
+
+
+def encode_query(text):
+    return _unit(SHARED.get(text, text))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(answer_cache, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def _cache(**overrides):
+    settings = type("AnswerCacheTestSettings", (Settings,), dict({
+        "ANSWER_CACHE_SIZE": 3,
+        "ANSWER_CACHE_TTL_SECONDS": 60,
+        "ANSWER_CACHE_SIMILARITY_THRESHOLD": 0.95,
+    }, **overrides))
+    return AnswerCache(settings, normalize_query, encode_query, "v1")
+
+
+def test_exact_and_semantic_hits(clock):
+    cache = _cache()
+    cache.store("螢幕臂保固多久", "保固兩年。")
+
+    assert cache.lookup("螢幕臂保固多久？") == ("保固兩年。", "exact", 1.0)
+    hit = cache.lookup("螢幕臂的保固是多久")
+    assert hit.answer == "保固兩年。" and hit.match_type == "semantic" and hit.similarity == pytest.approx(1.0)
+    assert cache.lookup("退貨政策") is None
+
+
+def test_queries_with_different_numbers_do_not_share_answers(clock):
+    cache = _cache()
+    cache.store("32 吋螢幕適合哪款", "推薦 A 款。")
+
+    assert cache.lookup("27 吋螢幕適合哪款") is None
+    assert cache.lookup("適合 32 吋螢幕的是哪款").answer == "推薦 A 款。"
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = _cache()
+    cache.store("螢幕臂保固多久", "保固兩年。")
+
+    clock.now += 59
+    assert cache.lookup("螢幕臂保固多久") is not None
+    clock.now += 2
+    assert cache.lookup("螢幕臂保固多久") is None
+    assert cache.lookup("螢幕臂的保固是多久") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = _cache()
+    for query in ("問題一", "問題二", "問題三"):
+        cache.store(query, f"{query}的答案")
+    cache.lookup("問題一")
+    cache.store("問題四", "問題四的答案")
+
+    assert len(cache) == 3
+    assert cache.lookup("問題二") is None
+    assert [cache.lookup(q).answer for q in ("問題一", "問題三", "問題四")] == ["問題一的答案", "問題三的答案", "問題四的答案"]
+
+
+def test_invalidate_drops_every_entry_and_records_the_new_version(clock):
+    cache = _cache()
+    cache.store("螢幕臂保固多久", "保固兩年。")
+
+    cache.invalidate("v2")
+
+    assert cache.knowledge_version == "v2"
+    assert len(cache) == 0
+    assert cache.lookup("螢幕臂保固多久") is None and cache.lookup("螢幕臂的保固是多久") is None
+    cache.store("螢幕臂保固多久", "保固三年。")
+    assert cache.lookup("螢幕臂的保固是多久").answer == "保固三年。"
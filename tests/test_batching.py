@@ -0,0 +1,49 @@
+import threading
+import time
+from src.batching import MicroBatcher
+
+
+def _double(items):
+    return [item * 2 for item in items]
+
+
+def test_lone_caller_is_not_delayed_by_the_window():
+    batcher = MicroBatcher("test", _double, max_batch_size=64, max_wait_ms=200)
+    try:
+        start = time.monotonic()
+        results = [batcher([i]) for i in range(5)]
+        elapsed = time.monotonic() - start
+    finally:
+        batcher.close()
+
+    assert results == [[i * 2] for i in range(5)]
+    assert elapsed < 0.2
+    stats = batcher.stats()
+    assert stats["batches"] == 5
+    assert stats["avg_queue_wait_ms"] < 50
+
+
+def test_concurrent_callers_share_batches():
+    def slow_double(items):
+        time.sleep(0.05)
+        return _double(items)
+
+    batcher = MicroBatcher("test", slow_double, max_batch_size=64, max_wait_ms=20)
+    results = {}
+
+    def call(i):
+        results[i] = batcher([i, i + 100])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(16)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        batcher.close()
+
+    assert results == {i: [2 * i, 2 * (i + 100)] for i in range(16)}
+    stats = batcher.stats()
+    assert stats["requests"] == 16
+    assert stats["batches"] < 16
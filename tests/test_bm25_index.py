@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from src.bm25_index import SparseBM25
+
+try:
+    import rank_bm25
+except ImportError:
+    rank_bm25 = None
+
+requires_rank_bm25 = pytest.mark.skipif(rank_bm25 is None, reason="rank_bm25 is not installed")
+
+# "保固" and "螢幕" occur in more than half of the documents, so their raw IDF is negative and
+# BM25Okapi replaces it with epsilon * average IDF.
+CORPUS = [
+    ["保固", "多久", "螢幕", "臂"],
+    ["保固", "維修", "流程", "維修"],
+    ["退貨", "七天", "鑑賞期", "保固"],
+    ["螢幕", "臂", "支援", "32", "吋", "螢幕"],
+    ["發票", "開立", "統編"],
+    ["保固", "螢幕", "vesa", "100x100"],
+    ["出貨", "時程", "運費", "保固", "螢幕"],
+    ["壁掛", "螢幕", "支架", "保固", "兩年"],
+]
+QUERIES = [
+    ["保固", "多久"],
+    ["螢幕", "臂", "螢幕"],
+    ["維修"],
+    ["發票", "統編", "運費"],
+    ["不存在"],
+    [],
+]
+
+
+@requires_rank_bm25
+@pytest.mark.parametrize("k1,b,epsilon", [(1.5, 0.75, 0.25), (1.2, 0.5, 0.5)])
+def test_scores_match_rank_bm25(k1, b, epsilon):
+    reference = rank_bm25.BM25Okapi(CORPUS, k1=k1, b=b, epsilon=epsilon)
+    bm25 = SparseBM25(k1=k1, b=b, epsilon=epsilon).fit(CORPUS)
+    for query in QUERIES:
+        np.testing.assert_allclose(bm25.get_scores(query), reference.get_scores(query), rtol=1e-5, atol=1e-6)
+
+
+@requires_rank_bm25
+def test_search_ranks_like_rank_bm25():
+    reference = rank_bm25.BM25Okapi(CORPUS)
+    bm25 = SparseBM25().fit(CORPUS)
+    for query in QUERIES[:4]:
+        expected = np.argsort(-reference.get_scores(query), kind="stable")[:3]
+        result = bm25.search(query, 3)
+        np.testing.assert_array_equal(result.top_indices, expected)
+        np.testing.assert_allclose(result.top_scores, reference.get_scores(query)[expected], rtol=1e-5)
+
+
+def _assert_same_index(actual: SparseBM25, expected: SparseBM25):
+    assert actual.vocabulary.keys() == expected.vocabulary.keys()
+    np.testing.assert_array_equal(actual.doc_len, expected.doc_len)
+    for term, term_id in expected.vocabulary.items():
+        assert actual.doc_freqs[actual.vocabulary[term]] == expected.doc_freqs[term_id]
+    for query in QUERIES + [list(expected.vocabulary)]:
+        np.testing.assert_allclose(actual.get_scores(query), expected.get_scores(query), rtol=1e-6)
+
+
+def test_updated_matches_a_fresh_fit():
+    keep = np.array([True, False, True, True, False, True, True, False])
+    added = [["發票", "抬頭", "統編"], ["保固", "延長", "保固"], ["新", "詞彙"]]
+    original = SparseBM25().fit(CORPUS)
+
+    updated = original.updated(keep, added)
+
+    expected = SparseBM25().fit([tokens for tokens, kept in zip(CORPUS, keep) if kept] + added)
+    _assert_same_index(updated, expected)
+    # Terms of removed documents that no longer occur anywhere are pruned.
+    assert "維修" not in updated.vocabulary and "流程" not in updated.vocabulary
+    # The original keeps serving unchanged.
+    _assert_same_index(original, SparseBM25().fit(CORPUS))
+
+
+def test_updated_with_only_deletes_or_only_adds():
+    original = SparseBM25().fit(CORPUS)
+    keep_all = np.ones(len(CORPUS), dtype=bool)
+    _assert_same_index(original.updated(keep_all, [["新", "文件"]]), SparseBM25().fit(CORPUS + [["新", "文件"]]))
+
+    keep = np.array([False] * 2 + [True] * (len(CORPUS) - 2))
+    _assert_same_index(original.updated(keep, []), SparseBM25().fit(CORPUS[2:]))
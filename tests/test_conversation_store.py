@@ -0,0 +1,49 @@
+import os
+import uuid
+from src.utils.conversation_store import ConversationStore
+
+
+def test_records_are_written_and_found_by_id(tmp_path):
+    store = ConversationStore(str(tmp_path / "conversations.sqlite3"))
+    ids = [uuid.uuid4() for _ in range(20)]
+    try:
+        for i, conversation_id in enumerate(ids):
+            store.append(conversation_id, f"問題 {i}", f"回答 {i}", "exact" if i % 2 else None)
+        store.flush()
+        assert len(store) == 20
+        assert store.get(ids[3]) == {
+            "conversation_id": str(ids[3]), "created_at": store.get(ids[3])["created_at"],
+            "user_query": "問題 3", "bot_response": "回答 3", "cache_marker": "exact",
+        }
+        assert store.get(uuid.uuid4()) is None
+        assert store.segment_paths() == [str(tmp_path / "conversations.000001.sqlite3")]
+    finally:
+        store.close()
+
+
+def test_rolls_over_to_a_new_segment_past_max_bytes(tmp_path):
+    path = str(tmp_path / "conversations.sqlite3")
+    store = ConversationStore(path, batch_size=1, max_bytes=64 * 1024)
+    ids = [uuid.uuid4() for _ in range(60)]
+    try:
+        for conversation_id in ids:
+            store.append(conversation_id, "問題", "回答" * 1000)
+            store.flush()
+        segments = store.segment_paths()
+        assert len(segments) > 1
+        # Each full segment went over the limit by at most one batch.
+        assert all(os.path.getsize(segment) < 2 * 64 * 1024 for segment in segments[:-1])
+        assert len(store) == len(ids)
+        assert all(store.get(conversation_id)["bot_response"] == "回答" * 1000 for conversation_id in ids)
+    finally:
+        store.close()
+
+    # A new store continues in the newest segment instead of starting over.
+    reopened = ConversationStore(path)
+    try:
+        reopened.append(uuid.uuid4(), "問題", "回答")
+        reopened.flush()
+        assert reopened.segment_paths() == segments
+        assert len(reopened) == len(ids) + 1
+    finally:
+        reopened.close()
@@ -0,0 +1,35 @@
+from src.document_store import DocumentStore
+from src.exact_match_index import ExactMatchIndex
+from src.utils.text import normalize_query
+
+# A few characters of OpenCC's s2t table, enough for the titles below.
+_S2T = str.maketrans({"发": "發", "开": "開", "维": "維", "时": "時", "间": "間"})
+
+
+def s2t_normalize(text: str) -> str:
+    return normalize_query(text.translate(_S2T))
+
+
+DOCUMENTS = DocumentStore(
+    "faq",
+    ["提供電子發票，可填統編。", "維修約需七個工作天。", "螢幕臂保固兩年。"],
+    {"id": ["FAQ-1", "FAQ-2", "FAQ-3"], "title": ["发票怎么开立？", "維修時間", "保固多久"]},
+)
+
+
+def test_keys_use_the_same_normalization_as_lookups():
+    index = ExactMatchIndex(DOCUMENTS, {"FAQ-3": ["螢幕臂保固幾年"]}, normalize=s2t_normalize)
+
+    # A simplified-Chinese title and a simplified-Chinese query meet on the same traditional key.
+    assert index.lookup(s2t_normalize("发票怎么开立")) == 0
+    assert index.lookup(s2t_normalize("维修时间")) == 1
+    assert index.lookup(s2t_normalize("維修時間！")) == 1
+    assert index.lookup(s2t_normalize("螢幕臂保固幾年?")) == 2
+    assert index.lookup(s2t_normalize("退貨")) is None
+
+
+def test_default_normalization_is_normalize_query():
+    index = ExactMatchIndex(DOCUMENTS)
+    assert index.lookup(normalize_query(" 保固多久？")) == 2
+    # Without s2t conversion, the simplified title does not match the traditional query.
+    assert index.lookup(normalize_query("發票怎么開立")) is None
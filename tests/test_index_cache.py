@@ -0,0 +1,135 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+from config import Settings
+from src.bm25_index import SparseBM25
+from src.index_cache import IndexCache
+from src.vector_index import build_index, configure_search, copy_index, remove_ids
+
+NUM_VECTORS = 5000
+DIMENSION = 256
+
+
+# Runs in a fresh interpreter: in this one, memory freed by earlier tests would be reused without growing RSS.
+_MEASURE_LOAD = """
+import sys
+from src.index_cache import IndexCache
+
+def anonymous_rss():
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) * 1024 for line in f if line.startswith("RssAnon:"))
+
+before = anonymous_rss()
+index = IndexCache._read_faiss_index(sys.argv[1])
+print(anonymous_rss() - before)
+"""
+
+
+def _anonymous_memory_of_load(index_path: str) -> int:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", _MEASURE_LOAD, index_path], cwd=root, capture_output=True, text=True, check=True)
+    return int(result.stdout.split()[-1])
+
+
+def _settings(tmp_path, **overrides):
+    knowledge_base = tmp_path / "faq.csv"
+    products = tmp_path / "products.csv"
+    jieba_dict = tmp_path / "dict.txt"
+    for path, content in ((knowledge_base, "id,title,content\n1,保固,保固兩年\n"), (products, "name\n螢幕臂\n"), (jieba_dict, "保固 3 n\n")):
+        if not path.exists():
+            path.write_text(content, encoding="utf-8")
+    attributes = {
+        "INDEX_CACHE_DIR": str(tmp_path / "index_cache"),
+        "KNOWLEDGE_BASE_PATH": str(knowledge_base),
+        "PRODUCTS_PATH": str(products),
+        "JIEBA_DICT_PATH": str(jieba_dict),
+        "EMBEDDING_MODEL_PATH": "test-model",
+    }
+    attributes.update(overrides)
+    return type("IndexCacheTestSettings", (Settings,), attributes)
+
+
+def _save(settings, embeddings):
+    tokenized_corpus = [[f"t{i % 50}", f"t{i % 7}"] for i in range(len(embeddings))]
+    faiss_index = build_index(embeddings, np.arange(len(embeddings), dtype=np.int64), settings)
+    cache = IndexCache(settings)
+    cache.save(SparseBM25().fit(tokenized_corpus), faiss_index)
+    return cache, faiss_index
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="needs /proc to measure resident memory")
+@pytest.mark.parametrize("index_type,storage", [
+    ("flat", "float32"), ("flat", "float16"), ("flat", "int8"),
+    ("hnsw", "float32"), ("hnsw", "int8"),
+    ("ivf_flat", "float32"), ("ivf_flat", "int8"),
+])
+def test_cached_faiss_index_is_memory_mapped(tmp_path, index_type, storage):
+    settings = _settings(tmp_path, FAISS_INDEX_TYPE=index_type, FAISS_STORAGE=storage)
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((NUM_VECTORS, DIMENSION)).astype(np.float32)
+    queries = rng.standard_normal((8, DIMENSION)).astype(np.float32)
+    cache, built = _save(settings, embeddings)
+    expected_scores, expected_ids = built.search(queries, 10)
+
+    index_path = os.path.join(cache.path, IndexCache.FAISS_FILE)
+    # Only the id map (8 bytes per vector) and small headers may live in anonymous memory.
+    assert _anonymous_memory_of_load(index_path) < 0.1 * os.path.getsize(index_path)
+
+    loaded = cache.load()["faiss_index"]
+    scores, ids = configure_search(loaded, settings).search(queries, 10)
+    np.testing.assert_array_equal(ids, expected_ids)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+
+def test_ivf_pq_index_loads_from_cache(tmp_path):
+    settings = _settings(tmp_path, FAISS_INDEX_TYPE="ivf_pq", FAISS_PQ_M=8, FAISS_PQ_NBITS=4)
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((NUM_VECTORS, DIMENSION)).astype(np.float32)
+    queries = rng.standard_normal((8, DIMENSION)).astype(np.float32)
+    cache, built = _save(settings, embeddings)
+
+    loaded = configure_search(cache.load()["faiss_index"], settings)
+    np.testing.assert_array_equal(loaded.search(queries, 10)[1], built.search(queries, 10)[1])
+
+
+def test_cache_round_trip_restores_bm25(tmp_path):
+    settings = _settings(tmp_path)
+    embeddings = np.random.default_rng(0).standard_normal((100, 16)).astype(np.float32)
+    tokenized_corpus = [["保固", "兩年"], ["退貨", "七天"], ["保固", "維修", "保固"]] * 10
+    bm25 = SparseBM25().fit(tokenized_corpus)
+    cache = IndexCache(settings)
+    cache.save(bm25, build_index(embeddings[:len(tokenized_corpus)], np.arange(len(tokenized_corpus)), settings))
+
+    assert IndexCache(settings).is_valid(len(tokenized_corpus))
+    artifacts = IndexCache(settings).load()
+    assert set(artifacts) == {"bm25", "faiss_index"}
+    np.testing.assert_array_equal(artifacts["bm25"].get_scores(["保固", "維修"]), bm25.get_scores(["保固", "維修"]))
+    assert artifacts["faiss_index"].ntotal == len(tokenized_corpus)
+
+
+def test_cache_key_only_covers_the_namespace_sources(tmp_path):
+    settings = _settings(tmp_path)
+    key = IndexCache(settings).key
+
+    (tmp_path / "products.csv").write_text("name\n壁掛架\n", encoding="utf-8")
+    assert IndexCache(settings).key == key
+
+    (tmp_path / "faq.csv").write_text("id,title,content\n1,保固,保固三年\n", encoding="utf-8")
+    assert IndexCache(settings).key != key
+
+
+@pytest.mark.parametrize("index_type,storage", [("flat", "float32"), ("flat", "int8"), ("hnsw", "float32"), ("ivf_flat", "float32")])
+def test_memory_mapped_index_can_be_copied_for_updates(tmp_path, index_type, storage):
+    settings = _settings(tmp_path, FAISS_INDEX_TYPE=index_type, FAISS_STORAGE=storage)
+    embeddings = np.random.default_rng(0).standard_normal((1000, 32)).astype(np.float32)
+    cache, _ = _save(settings, embeddings)
+    loaded = configure_search(cache.load()["faiss_index"], settings)
+
+    updated = configure_search(remove_ids(copy_index(loaded), np.arange(10), settings), settings)
+    updated.add_with_ids(embeddings[:5] * 2, np.arange(1000, 1005))
+
+    assert updated.ntotal == 995
+    np.testing.assert_array_equal(updated.search(embeddings[:5] * 2, 1)[1].ravel(), np.arange(1000, 1005))
+    assert loaded.ntotal == 1000
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import numpy as np
+import pytest
+from config import Settings
+from src.intent_classifier import IntentClassifier
+
+EXAMPLES = {
+    "handoff": ["我要找真人客服"],
+    "product_inquiry": ["推薦一款螢幕臂", "雙螢幕支架"],
+    "policy_inquiry": ["保固多久", "退貨政策"],
+}
+# Axis-aligned embeddings make every centroid similarity easy to work out by hand.
+AXES = {"handoff": 0, "product_inquiry": 1, "policy_inquiry": 2}
+VECTORS = {text: np.eye(4, dtype=np.float32)[AXES[intent]] for intent, texts in EXAMPLES.items() for text in texts}
+VECTORS["保固可以延長嗎"] = np.array([0.1, 0.1, 0.98, 0.1], dtype=np.float32)
+VECTORS["請問一下"] = np.array([0.0, 0.6, 0.6, 0.5], dtype=np.float32)  # product and policy tie
+
+
+class FakeLLMHandler:
+    def __init__(self, result=None):
+        self.result = result or {"intent": "policy_inquiry"}
+        self.calls = []
+
+    def classify_intent(self, query):
+        self.calls.append(query)
+        return dict(self.result)
+
+    async def aclassify_intent(self, query):
+        return self.classify_intent(query)
+
+
+@pytest.fixture
+def classifier_factory(tmp_path):
+    examples_path = tmp_path / "intent_examples.json"
+    examples_path.write_text(json.dumps(EXAMPLES, ensure_ascii=False), encoding="utf-8")
+
+    def make(llm_handler, **overrides):
+        settings = type("IntentClassifierTestSettings", (Settings,), dict({"INTENT_EXAMPLES_PATH": str(examples_path)}, **overrides))
+        encode_query = lambda text: VECTORS.get(text, np.full(4, 0.5, dtype=np.float32))
+        return IntentClassifier(settings, llm_handler, encode_query)
+    return make
+
+
+def test_tiers_are_tried_in_order(classifier_factory):
+    llm = FakeLLMHandler({"intent": "product_inquiry"})
+    classifier = classifier_factory(llm)
+
+    assert classifier.classify("可以轉真人嗎？") == {"intent": "handoff", "source": "rule"}
+    assert classifier.classify("JTCG-MA-Single-32 的承重") == {"intent": "product_inquiry", "source": "rule"}
+    centroid = classifier.classify("保固可以延長嗎")
+    assert centroid["intent"] == "policy_inquiry" and centroid["source"] == "centroid"
+    assert llm.calls == []
+
+    # Product and policy centroids are equally close, so the margin check sends the query to the LLM.
+    assert classifier.classify("請問一下") == {"intent": "product_inquiry", "source": "llm"}
+    assert llm.calls == ["請問一下"]
+
+
+def test_results_are_cached_per_normalized_query(classifier_factory):
+    llm = FakeLLMHandler()
+    classifier = classifier_factory(llm)
+
+    assert classifier.needs_llm("請問一下")
+    classifier.classify("請問一下")
+    assert not classifier.needs_llm("請問一下？")
+    assert classifier.classify(" 請問一下？") == {"intent": "policy_inquiry", "source": "llm"}
+    assert llm.calls == ["請問一下"]
+
+    stats = classifier.stats()
+    assert stats["total"] == 2 and stats["cache_hits"] == 1 and stats["llm_hits"] == 1
+
+
+def test_needs_llm_is_false_for_local_tiers(classifier_factory):
+    classifier = classifier_factory(FakeLLMHandler())
+    assert not classifier.needs_llm("轉人工")
+    assert not classifier.needs_llm("保固可以延長嗎")
+    assert classifier.needs_llm("今天天氣如何")
+
+
+def test_llm_fallback_is_not_cached(classifier_factory):
+    llm = FakeLLMHandler({"intent": "policy_inquiry", "fallback": True})
+    classifier = classifier_factory(llm)
+
+    asyncio.run(classifier.aclassify("請問一下"))
+    asyncio.run(classifier.aclassify("請問一下"))
+    assert llm.calls == ["請問一下", "請問一下"]
+
+
+def test_cache_is_bounded(classifier_factory):
+    llm = FakeLLMHandler()
+    classifier = classifier_factory(llm, INTENT_CACHE_SIZE=2)
+    for query in ("問題一", "問題二", "問題三", "問題一"):
+        classifier.classify(query)
+    assert llm.calls == ["問題一", "問題二", "問題三", "問題一"]
+    assert classifier.stats()["cache_size"] == 2
@@ -0,0 +1,56 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from config import Settings
+from src.llm_handler import LLMHandler
+
+MAX_CONCURRENCY = 2
+
+
+class FakeAsyncClient:
+    """Stands in for openai.AsyncAzureOpenAI and records how many requests were in flight at once."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **request):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.005)
+        self.in_flight -= 1
+        content = json.dumps({"intent": "product_inquiry"}) if request.get("response_format") else "答案"
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=2, total_tokens=12)
+        return SimpleNamespace(choices=[SimpleNamespace(finish_reason="stop", message=SimpleNamespace(content=content))], usage=usage)
+
+
+def _handler(requests_per_minute=0):
+    settings = type("LLMHandlerTestSettings", (Settings,), {
+        "API_KEY": "test",
+        "LLM_MAX_CONCURRENCY": MAX_CONCURRENCY,
+        "LLM_REQUESTS_PER_MINUTE": requests_per_minute,
+    })
+    client = FakeAsyncClient()
+    return LLMHandler(settings, client=object(), async_client=client), client
+
+
+async def _run_requests(handler, count):
+    intents = await asyncio.gather(*(handler.aclassify_intent(f"問題 {i}") for i in range(count)))
+    answers = await asyncio.gather(*(handler.agenerate_response("system", f"問題 {i}", f"conv-{i}") for i in range(count)))
+    return intents, answers
+
+
+def test_handler_can_be_driven_by_consecutive_event_loops():
+    # A rate limit of 600k/minute still goes through the limiter's lock without slowing the test down.
+    for requests_per_minute in (0, 600_000):
+        handler, client = _handler(requests_per_minute)
+        for _ in range(2):
+            intents, answers = asyncio.run(_run_requests(handler, 4 * MAX_CONCURRENCY))
+            assert intents == [{"intent": "product_inquiry"}] * (4 * MAX_CONCURRENCY)
+            assert [content for content, _ in answers] == ["答案"] * (4 * MAX_CONCURRENCY)
+
+        assert client.calls == 2 * 2 * 4 * MAX_CONCURRENCY
+        assert client.max_in_flight == MAX_CONCURRENCY
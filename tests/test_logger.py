@@ -0,0 +1,47 @@
+import logging
+import threading
+import time
+from src.utils import logger
+
+
+def test_cost_log_is_never_rotated_by_default():
+    handler = next(h for h in logger._file_handlers if h.filters[0].name == "cost")
+    assert handler.maxBytes == 0
+
+
+def test_file_without_backups_is_never_rotated(tmp_path):
+    handler = logger._file_handler("cost", str(tmp_path / "cost.log"), logging.Formatter(), 10, 0)
+    try:
+        assert handler.maxBytes == 0
+    finally:
+        handler.close()
+
+
+def test_concurrent_first_calls_create_one_conversation_store(monkeypatch):
+    created = []
+    barrier = threading.Barrier(8)
+
+    class SlowStore:
+        def __init__(self, *args, **kwargs):
+            created.append(self)
+            time.sleep(0.05)
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(logger, "ConversationStore", SlowStore)
+    monkeypatch.setattr(logger, "_conversation_store", None)
+    stores = []
+
+    def first_call():
+        barrier.wait()
+        stores.append(logger.get_conversation_store())
+
+    threads = [threading.Thread(target=first_call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1
+    assert all(store is created[0] for store in stores)
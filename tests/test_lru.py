@@ -0,0 +1,36 @@
+from src.utils.lru import LRUCache
+
+
+def test_evicts_the_least_recently_used_entry():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_get_or_compute_only_computes_misses():
+    cache = LRUCache(8)
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        return value * 2
+
+    assert [cache.get_or_compute(k, lambda k=k: compute(k)) for k in (1, 2, 1, 2, 3)] == [2, 4, 2, 4, 6]
+    assert calls == [1, 2, 3]
+    # Falsy values are cached like any other.
+    assert cache.get_or_compute("empty", list) == [] and cache.get_or_compute("empty", lambda: ["recomputed"]) == []
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_zero_capacity_disables_caching():
+    cache = LRUCache(0)
+    assert cache.get_or_compute("a", lambda: 1) == 1
+    assert len(cache) == 0 and cache.get("a") is None
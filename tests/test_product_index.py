@@ -0,0 +1,92 @@
+import hashlib
+import numpy as np
+import pytest
+from config import Settings
+from src.document_store import DocumentStore
+from src.product_index import ProductFilters, ProductIndex
+
+PRODUCTS = [
+    # sku, arm_type, size_max_inch, vesa
+    ("DUAL-32", "dual_gas_spring", 32, ["75x75", "100x100"]),
+    ("SINGLE-27", "single_mechanical", 27, ["75x75", "100x100"]),
+    ("HEAVY-49", "single_heavy_duty", 49, ["100x100", "200x200"]),
+    ("WALL-43", "wall_mount", 43, ["200 x 200", "400x400"]),
+    ("LAPTOP", "accessory_laptop_tray", None, []),
+]
+
+
+def encode(texts):
+    vectors = np.stack([
+        np.random.default_rng(int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")).standard_normal(8)
+        for text in texts
+    ]).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _products(rows):
+    return DocumentStore(
+        "product",
+        [f"{sku} {arm_type}" for sku, arm_type, _, _ in rows],
+        {
+            "sku": [sku for sku, _, _, _ in rows],
+            "arm_type": [arm_type for _, arm_type, _, _ in rows],
+            "size_max_inch": [size for _, _, size, _ in rows],
+            "vesa": [vesa for _, _, _, vesa in rows],
+        },
+    )
+
+
+@pytest.fixture
+def index():
+    return ProductIndex(_products(PRODUCTS), Settings, encode, lambda text: encode([text])[0])
+
+
+def _matching(index, query):
+    return [index.product_docs.column("sku")[i] for i in np.flatnonzero(index._filter_mask(index.parse_filters(query)))]
+
+
+@pytest.mark.parametrize("query,expected", [
+    ("32吋螢幕適合哪款", ProductFilters(32.0, None, [])),
+    ("34.5 inch 曲面螢幕", ProductFilters(34.5, None, [])),
+    ('27" monitor', ProductFilters(27.0, None, [])),
+    ("VESA 100 x 100 可以用嗎", ProductFilters(None, "100x100", [])),
+    ("孔距 75×75", ProductFilters(None, "75x75", [])),
+    ("vesa 200 的雙螢幕支架", ProductFilters(None, "200x200", ["dual"])),
+    ("推薦壁掛架", ProductFilters(None, None, ["wall"])),
+    ("筆電托盤", ProductFilters(None, None, ["accessory"])),
+    ("保固多久", ProductFilters(None, None, [])),
+])
+def test_parse_filters(index, query, expected):
+    assert index.parse_filters(query) == expected
+
+
+def test_size_filter_keeps_products_that_support_the_size(index):
+    assert _matching(index, "34吋螢幕") == ["HEAVY-49", "WALL-43"]
+    assert _matching(index, "27 吋") == ["DUAL-32", "SINGLE-27", "HEAVY-49", "WALL-43"]
+
+
+def test_vesa_filter_matches_normalized_patterns(index):
+    assert _matching(index, "VESA 200x200") == ["HEAVY-49", "WALL-43"]
+    assert _matching(index, "vesa 75") == ["DUAL-32", "SINGLE-27"]
+    assert _matching(index, "VESA 300x300") == []
+
+
+def test_arm_type_filter_matches_substrings_of_the_arm_type(index):
+    assert _matching(index, "雙螢幕支架") == ["DUAL-32"]
+    assert _matching(index, "單臂") == ["SINGLE-27", "HEAVY-49"]
+    assert _matching(index, "重載 單臂 40吋") == ["HEAVY-49"]
+    assert _matching(index, "雙臂或壁掛") == ["DUAL-32", "WALL-43"]
+
+
+def test_search_ranks_filtered_products_and_falls_back_to_all(index):
+    assert {doc["metadata"]["sku"] for doc in index.search("34吋 壁掛", 5)} == {"WALL-43"}
+    assert len(index.search("VESA 300x300", 3)) == 3
+
+
+def test_updated_replaces_and_removes_products(index):
+    updated = index.updated(_products([("SINGLE-27", "single_gas_spring", 34, ["100x100"])]), deletes=["LAPTOP"])
+
+    assert updated.product_docs.column("sku") == ["DUAL-32", "HEAVY-49", "WALL-43", "SINGLE-27"]
+    assert _matching(updated, "34吋 單臂") == ["HEAVY-49", "SINGLE-27"]
+    np.testing.assert_array_equal(updated.embeddings[0], index.embeddings[0])
+    assert _matching(index, "34吋 單臂") == ["HEAVY-49"]
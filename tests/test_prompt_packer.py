@@ -0,0 +1,89 @@
+from config import Settings
+from src.prompt_packer import PromptPacker
+from src.utils.tokens import TokenCounter
+
+BOILERPLATE = "如需協助請聯繫客服專線 0800-000-000，服務時間週一至週五。"
+
+
+class CharTokenCounter(TokenCounter):
+    """One token per character, so budgets in the tests can be worked out by hand."""
+
+    def __init__(self):
+        self.encoding = None
+        self.exact = False
+
+    def count(self, text: str) -> int:
+        return len(text)
+
+
+def _packer(**overrides):
+    settings = type("PromptPackerTestSettings", (Settings,), dict({
+        "PROMPT_CONTEXT_TOKEN_BUDGET": 1000,
+        "PROMPT_MIN_EXCERPT_TOKENS": 10,
+        "PROMPT_BOILERPLATE_MIN_CHARS": 20,
+    }, **overrides))
+    return PromptPacker(settings, CharTokenCounter())
+
+
+def test_line_repeated_within_one_document_is_kept():
+    text = f"保固兩年。\n{BOILERPLATE}\n維修需寄回。\n{BOILERPLATE}"
+    packed = _packer().pack([text])
+    assert packed.items == [(0, text)]
+
+
+def test_lines_sent_with_an_earlier_document_become_back_references():
+    first = f"保固兩年。\n{BOILERPLATE}"
+    second = f"退貨七天內可辦理。\n{BOILERPLATE}\n{BOILERPLATE}"
+    packed = _packer().pack([first, second], label="參考資料")
+    assert packed.items == [(0, first), (1, "退貨七天內可辦理。\n（同參考資料 1）\n（同參考資料 1）")]
+    assert packed.tokens == len(first) + len(packed.items[1][1])
+
+
+def test_top_document_is_cut_mid_sentence_when_its_first_sentence_does_not_fit():
+    text = "螢幕臂的保固期間為購買日起兩年，期間內非人為損壞可免費維修。其餘問題請洽客服。"
+    packed = _packer(PROMPT_CONTEXT_TOKEN_BUDGET=15).pack([text, "第二份文件。"], overheads=[5, 5])
+
+    assert packed.items == [(0, text[:10])]
+    assert packed.tokens == 15 and packed.truncated == 1 and packed.dropped == 1
+
+
+def test_truncate_tokens_returns_the_longest_fitting_prefix():
+    counter = TokenCounter("gpt-4o")
+    text = "螢幕臂的保固期間為購買日起兩年 warranty covers two years of normal use。"
+    for max_tokens in (0, 1, 5, 12, 1000):
+        prefix = counter.truncate_tokens(text, max_tokens)
+        assert text.startswith(prefix)
+        assert counter.count(prefix) <= max_tokens
+        if prefix != text:
+            assert counter.count(text[:len(prefix) + 1]) > max_tokens
+
+
+def test_exact_duplicates_are_skipped():
+    packed = _packer().pack(["保固兩年。", "退貨七天。", "保固兩年。"])
+    assert packed.items == [(0, "保固兩年。"), (1, "退貨七天。")]
+    assert packed.dropped == 0
+
+
+def test_overflowing_document_is_cut_at_a_sentence_boundary_and_the_rest_dropped():
+    first = "一" * 20
+    second = "保固兩年。非人為損壞免費維修。其餘請洽客服。"
+    packed = _packer(PROMPT_CONTEXT_TOKEN_BUDGET=40).pack([first, second, "第三份。"], overheads=[2, 2, 2])
+
+    assert packed.items == [(0, first), (1, "保固兩年。非人為損壞免費維修。")]
+    assert packed.tokens == 22 + 2 + len("保固兩年。非人為損壞免費維修。")
+    assert packed.truncated == 1 and packed.dropped == 1
+
+
+def test_overflowing_document_is_dropped_when_too_little_budget_is_left():
+    packed = _packer(PROMPT_CONTEXT_TOKEN_BUDGET=28, PROMPT_MIN_EXCERPT_TOKENS=10).pack(["一" * 20, "保固兩年。非人為損壞免費維修。"])
+    assert packed.items == [(0, "一" * 20)]
+    assert packed.truncated == 0 and packed.dropped == 1
+
+
+def test_truncate_keeps_whole_sentences():
+    counter = CharTokenCounter()
+    text = "保固兩年。非人為損壞免費維修！其餘請洽客服？"
+    assert counter.truncate(text, 100) == text
+    assert counter.truncate(text, 14) == "保固兩年。"
+    assert counter.truncate(text, 15) == "保固兩年。非人為損壞免費維修！"
+    assert counter.truncate(text, 4) == ""
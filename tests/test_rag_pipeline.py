@@ -0,0 +1,105 @@
+import hashlib
+import os
+import jieba
+import numpy as np
+import pytest
+from config import Settings
+from src.bm25_index import SparseBM25
+from src.document_store import DocumentStore
+from src.rag_pipeline import HybridRetriever
+from src.utils.text import normalize_query
+
+
+class HashEmbeddingModel:
+    """Deterministic stand-in for SentenceTransformer: a unit vector seeded by each text."""
+
+    dimension = 32
+
+    def encode(self, texts, normalize_embeddings=True, show_progress_bar=False):
+        vectors = np.stack([
+            np.random.default_rng(int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")).standard_normal(self.dimension)
+            for text in texts
+        ]).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _faqs(items, titles=None):
+    titles = titles or [""] * len(items)
+    return DocumentStore("faq", [content for _, content in items], {"id": [doc_id for doc_id, _ in items], "title": titles})
+
+
+FAQS = [(f"FAQ-{i}", f"第{i}題：螢幕臂保固與維修說明，型號 JT-{i:03d}") for i in range(40)]
+
+
+@pytest.fixture
+def retriever_factory(tmp_path):
+    def make(index_type, **kwargs):
+        settings = type("RetrieverTestSettings", (Settings,), {
+            "JIEBA_DICT_PATH": os.path.join(os.path.dirname(jieba.__file__), "dict.txt"),
+            "JIEBA_CACHE_DIR": str(tmp_path / "jieba"),
+            "INDEX_CACHE_ENABLED": False,
+            "MICRO_BATCH_ENABLED": False,
+            "FAQ_QUESTION_VARIANTS_PATH": None,
+            "FAISS_INDEX_TYPE": index_type,
+            "FAISS_STORAGE": "float32",
+            "FAISS_IVF_NPROBE": 64,
+        })
+        return HybridRetriever(_faqs(FAQS), settings, embedding_model=HashEmbeddingModel(), **kwargs)
+    return make
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw", "ivf_flat"])
+def test_apply_updates_maps_faiss_ids_to_the_right_documents(retriever_factory, index_type):
+    retriever = retriever_factory(index_type)
+    before = retriever.snapshot
+    upserts = [("FAQ-3", "第3題已更新：保固延長為三年"), ("FAQ-NEW", "新增：壁掛架安裝教學")]
+
+    after = retriever.apply_updates(_faqs(upserts), deletes=["FAQ-0", "FAQ-17"])
+
+    expected_ids = [doc_id for doc_id, _ in FAQS if doc_id not in ("FAQ-0", "FAQ-3", "FAQ-17")] + ["FAQ-3", "FAQ-NEW"]
+    assert after.documents.column("id") == expected_ids
+    assert after.faiss_index.ntotal == len(after.documents)
+    assert np.all(np.diff(after.doc_ids) > 0)
+
+    # Every document's own embedding must lead back to that document through the id mapping.
+    embeddings = retriever.encode_documents(after.documents.contents)
+    _, ids = after.faiss_index.search(embeddings, 1)
+    np.testing.assert_array_equal(after.positions(ids[:, 0]), np.arange(len(after.documents)))
+
+    # The previous snapshot is untouched for queries still in flight.
+    assert before.documents.column("id") == [doc_id for doc_id, _ in FAQS]
+    _, old_ids = before.faiss_index.search(retriever.encode_documents(before.documents.contents), 1)
+    np.testing.assert_array_equal(before.positions(old_ids[:, 0]), np.arange(len(FAQS)))
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw", "ivf_flat"])
+def test_apply_updates_with_only_deletes(retriever_factory, index_type):
+    retriever = retriever_factory(index_type)
+
+    after = retriever.apply_updates(deletes=["FAQ-1", "FAQ-30"])
+
+    assert after.documents.column("id") == [doc_id for doc_id, _ in FAQS if doc_id not in ("FAQ-1", "FAQ-30")]
+    assert set(after.documents.metadata_columns) == {"id", "title"}
+    assert after.faiss_index.ntotal == len(after.documents) == after.bm25.corpus_size
+    _, ids = after.faiss_index.search(retriever.encode_documents(after.documents.contents), 1)
+    np.testing.assert_array_equal(after.positions(ids[:, 0]), np.arange(len(after.documents)))
+
+
+def test_apply_updates_bm25_matches_a_rebuild(retriever_factory):
+    retriever = retriever_factory("flat")
+    after = retriever.apply_updates(_faqs([("FAQ-5", "第5題改為退貨政策"), ("FAQ-NEW", "發票開立方式")]), deletes=["FAQ-9"])
+
+    rebuilt = SparseBM25().fit(retriever._tokenize_documents(after.documents.contents))
+    for query in (["保固"], ["退貨", "政策"], ["發票"], ["JT", "009"]):
+        np.testing.assert_allclose(after.bm25.get_scores(query), rebuilt.get_scores(query), rtol=1e-6)
+    assert retriever.bm25_search("發票開立方式", after).top_index == after.documents.column("id").index("FAQ-NEW")
+
+
+def test_exact_match_keys_use_the_retrievers_normalization(retriever_factory):
+    def normalize(text):
+        return normalize_query(text.replace("发", "發"))
+
+    retriever = retriever_factory("flat", normalize_query=normalize)
+    after = retriever.apply_updates(_faqs([("FAQ-NEW", "電子發票說明")], titles=["发票开立"]), deletes=[])
+
+    assert after.exact.lookup(normalize("發票开立？")) == after.documents.column("id").index("FAQ-NEW")
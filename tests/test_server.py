@@ -0,0 +1,85 @@
+import http.client
+import json
+import socket
+import threading
+from types import SimpleNamespace
+import pytest
+from src.server import _RequestHandler, _WorkerHTTPServer
+
+
+class FakeOrchestrator:
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+
+    def process_query_stream(self, query):
+        yield from self.chunks
+        if self.error is not None:
+            raise self.error
+
+    def process_query(self, query):
+        if self.error is not None:
+            raise self.error
+        return "".join(self.chunks)
+
+
+@pytest.fixture
+def serve():
+    servers, connections = [], []
+
+    def start(orchestrator):
+        worker = SimpleNamespace(orchestrator=orchestrator, draining=False, ready=True, slots=threading.BoundedSemaphore(4))
+        handler = type("Handler", (_RequestHandler,), {"worker": worker, "timeout": 5})
+        httpd = _WorkerHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        servers.append(httpd)
+        connections.append(http.client.HTTPConnection(*httpd.server_address[:2], timeout=5))
+        return connections[-1]
+
+    yield start
+    for connection in connections:
+        connection.close()
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def _post(connection, payload):
+    connection.request("POST", "/query", body=json.dumps(payload), headers={"Content-Type": "application/json"})
+    return connection.getresponse()
+
+
+def test_streamed_answer_is_sent_in_chunks(serve):
+    response = _post(serve(FakeOrchestrator(["保固", "兩年。"])), {"query": "保固多久", "stream": True})
+    assert response.status == 200
+    assert response.getheader("Transfer-Encoding") == "chunked"
+    assert response.read().decode("utf-8") == "保固兩年。"
+
+
+def test_failure_after_streaming_started_cuts_the_body_short(serve):
+    connection = serve(FakeOrchestrator(["保固", "兩年"], error=RuntimeError("LLM stream broke")))
+    body = json.dumps({"query": "保固多久", "stream": True}).encode("utf-8")
+    with socket.create_connection((connection.host, connection.port), timeout=5) as sock:
+        sock.sendall(b"POST /query HTTP/1.1\r\nHost: test\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+        received = b""
+        # The server closes the connection instead of completing the response.
+        while chunk := sock.recv(65536):
+            received += chunk
+
+    head, _, chunked_body = received.partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200")
+    # No second status line or JSON error is spliced into the chunked body, and no terminating chunk marks it complete.
+    assert b"HTTP/1.1" not in chunked_body and b"internal error" not in chunked_body
+    assert not chunked_body.endswith(b"0\r\n\r\n")
+    assert chunked_body.decode("utf-8") == "6\r\n保固\r\n6\r\n兩年\r\n"
+
+
+def test_failure_before_any_output_is_a_500(serve):
+    connection = serve(FakeOrchestrator([], error=RuntimeError("retrieval failed")))
+    response = _post(connection, {"query": "保固多久", "stream": True})
+    assert response.status == 500
+    assert json.loads(response.read()) == {"error": "internal error"}
+
+    response = _post(connection, {"query": "保固多久"})
+    assert response.status == 500
+    assert json.loads(response.read()) == {"error": "internal error"}
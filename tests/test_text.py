@@ -0,0 +1,58 @@
+import random
+import re
+from src.utils.text import IncrementalConverter, normalize_query
+
+
+class PhraseConverter:
+    """
+    A few entries of OpenCC's s2t tables. Like OpenCC it converts the longest matching phrase
+    first, so "头发" (hair) and "发现" (discover) convert differently than "发" alone and a chunk
+    boundary inside a phrase would show up in the output.
+    """
+
+    PHRASES = {"头发": "頭髮", "理发": "理髮", "发现": "發現", "里面": "裡面", "公里": "公里", "发": "發", "头": "頭", "里": "裡", "现": "現"}
+    _PATTERN = re.compile("|".join(sorted(PHRASES, key=len, reverse=True)))
+
+    def convert(self, text):
+        return self._PATTERN.sub(lambda match: self.PHRASES[match.group(0)], text)
+
+
+TEXT = "我发现头发里面有灰尘，理发店在三公里外。请问发票要怎么开？发现问题请回报！头发、公里、里面\n结束"
+
+
+def _stream(converter, chunks):
+    return "".join(converter.feed(chunk) for chunk in chunks) + converter.flush()
+
+
+def test_output_matches_full_string_conversion_for_any_chunking():
+    expected = PhraseConverter().convert(TEXT)
+    # Converting each character on its own gives a different result, so naive chunking would be caught.
+    assert "".join(PhraseConverter().convert(char) for char in TEXT) != expected
+    for size in range(1, len(TEXT) + 1):
+        chunks = [TEXT[i:i + size] for i in range(0, len(TEXT), size)]
+        assert _stream(IncrementalConverter(PhraseConverter()), chunks) == expected
+
+    rng = random.Random(0)
+    for _ in range(200):
+        cuts = sorted(rng.sample(range(1, len(TEXT)), rng.randint(1, 12)))
+        chunks = [TEXT[start:end] for start, end in zip([0] + cuts, cuts + [len(TEXT)])]
+        assert _stream(IncrementalConverter(PhraseConverter()), chunks) == expected
+
+
+def test_text_is_held_back_only_up_to_the_last_boundary():
+    converter = IncrementalConverter(PhraseConverter())
+    assert converter.feed("我发现头") == ""
+    assert converter.feed("发，理") == "我發現頭髮，"
+    assert converter.flush() == "理"
+
+
+def test_long_run_without_boundaries_is_flushed_except_the_holdback():
+    converter = IncrementalConverter(PhraseConverter(), max_pending=8, holdback=3)
+    assert converter.feed("一二三四五六七八") == ""
+    assert converter.feed("九") == "一二三四五六"
+    assert converter.flush() == "七八九"
+
+
+def test_normalize_query():
+    assert normalize_query("  ＪＴＣＧ　螢幕臂\t保固？？ ") == "jtcg 螢幕臂 保固"
+    assert normalize_query(None) == ""
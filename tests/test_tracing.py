@@ -0,0 +1,40 @@
+from config import Settings
+from src.utils.tracing import Tracer, gauges_to_prometheus
+
+
+def test_gauges_share_one_type_line_per_stat():
+    text = gauges_to_prometheus("app_batch", [
+        ({"batcher": "encoder"}, {"batches": 3, "avg_wait_ms": 0.5, "name": "encoder"}),
+        ({"batcher": "reranker"}, {"batches": 1, "avg_wait_ms": 2.0}),
+    ])
+    assert text.splitlines() == [
+        "# TYPE app_batch_batches gauge",
+        'app_batch_batches{batcher="encoder"} 3',
+        'app_batch_batches{batcher="reranker"} 1',
+        "# TYPE app_batch_avg_wait_ms gauge",
+        'app_batch_avg_wait_ms{batcher="encoder"} 0.5',
+        'app_batch_avg_wait_ms{batcher="reranker"} 2.0',
+    ]
+
+
+def test_gauges_without_labels_or_rows():
+    assert gauges_to_prometheus("app", [({}, {"size": 4})]) == "# TYPE app_size gauge\napp_size 4\n"
+    assert gauges_to_prometheus("app", []) == ""
+
+
+def test_tracer_follows_the_settings_it_is_configured_with():
+    tracer = Tracer(type("TracingOff", (Settings,), {"TRACING_ENABLED": False}))
+    with tracer.span("retrieval"):
+        pass
+    assert tracer.snapshot() == {}
+
+    tracer.configure(type("TracingOn", (Settings,), {"TRACING_ENABLED": True, "TRACING_WINDOW_SIZE": 2}))
+    for _ in range(3):
+        with tracer.span("retrieval"):
+            pass
+    assert tracer.enabled
+    assert tracer.snapshot()["retrieval"]["count"] == 3
+    assert len(tracer._windows["retrieval"]) == 2
+
+    tracer.configure(type("SmallerWindow", (Settings,), {"TRACING_ENABLED": True, "TRACING_WINDOW_SIZE": 1}))
+    assert len(tracer._windows["retrieval"]) == 1